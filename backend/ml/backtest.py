@@ -0,0 +1,244 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from xgboost import XGBClassifier
+
+from .model import (
+    DATA_PERIOD, FEATURE_NAMES, MODEL_PARAMS, PREDICTION_THRESHOLD, STOCKS_TO_TRAIN,
+    build_training_dataset,
+)
+
+# --- Configuration ---
+TRAIN_DAYS = 756 # ~3 trading years of history per fit
+TEST_DAYS = 126 # Retrain every ~6 months and predict the next window out of sample
+COST_BPS = 10.0 # Cost per unit of position change (brokerage + slippage), in basis points
+TRADING_DAYS = 252
+
+
+class Panel:
+    """
+    A featurized dataset pivoted into dense (tickers × days) arrays.
+
+    `features` is (tickers, days, features), `close` and `forward_return` are (tickers, days);
+    ticker-days with no row (warm-up, listing gaps) are NaN. `forward_return[:, d]` is the
+    close-to-close return from day d to d+1, i.e. what `create_target` labels.
+    """
+
+    def __init__(self, dataset, feature_names=FEATURE_NAMES):
+        self.tickers = list(dict.fromkeys(dataset['Ticker']))
+        self.dates = np.unique(dataset['Date'].to_numpy())
+        self.feature_names = list(feature_names)
+
+        rows = pd.Categorical(dataset['Ticker'], categories=self.tickers).codes
+        cols = np.searchsorted(self.dates, dataset['Date'].to_numpy())
+        shape = (len(self.tickers), len(self.dates))
+
+        self.features = np.full(shape + (len(self.feature_names),), np.nan)
+        self.features[rows, cols] = dataset[self.feature_names].to_numpy(dtype=np.float64)
+        self.close = np.full(shape, np.nan)
+        self.close[rows, cols] = dataset['Close'].to_numpy(dtype=np.float64)
+
+        self.forward_return = np.full(shape, np.nan)
+        self.forward_return[:, :-1] = self.close[:, 1:] / self.close[:, :-1] - 1
+        # A ticker-day is usable for training/scoring once it has features and a next-day price
+        self.valid = ~np.isnan(self.features).any(axis=2) & ~np.isnan(self.forward_return)
+
+    @property
+    def shape(self):
+        return self.close.shape
+
+
+def walk_forward_folds(n_days, train_days=TRAIN_DAYS, test_days=TEST_DAYS, expanding=False):
+    """Yields (train_slice, test_slice) pairs over the day axis; test windows never overlap."""
+    for test_start in range(train_days, n_days, test_days):
+        train_start = 0 if expanding else test_start - train_days
+        yield slice(train_start, test_start), slice(test_start, min(test_start + test_days, n_days))
+
+
+def walk_forward_probabilities(panel, train_days=TRAIN_DAYS, test_days=TEST_DAYS, expanding=False, model_params=None):
+    """
+    Retrains the classifier on each training window and predicts the following test window.
+
+    Returns a (tickers × days) array of out-of-sample P(up); days that were never in a test
+    window are NaN. Each fold is one fit and one batched predict over the whole panel slice.
+    """
+    params = {**MODEL_PARAMS, **(model_params or {})}
+    prob_up = np.full(panel.shape, np.nan)
+    n_features = len(panel.feature_names)
+
+    for i, (train, test) in enumerate(walk_forward_folds(panel.shape[1], train_days, test_days, expanding)):
+        train_mask = panel.valid[:, train]
+        X = panel.features[:, train][train_mask]
+        y = (panel.forward_return[:, train][train_mask] > 0).astype(int)
+        if len(np.unique(y)) < 2:
+            continue
+
+        model = XGBClassifier(**params)
+        model.fit(pd.DataFrame(X, columns=panel.feature_names), y)
+
+        test_mask = ~np.isnan(panel.features[:, test]).any(axis=2)
+        X_test = panel.features[:, test].reshape(-1, n_features)[test_mask.ravel()]
+        if len(X_test):
+            fold_probs = np.full(test_mask.shape, np.nan)
+            fold_probs[test_mask] = model.predict_proba(pd.DataFrame(X_test, columns=panel.feature_names))[:, 1]
+            prob_up[:, test] = fold_probs
+        print(f"✅ Fold {i + 1}: trained on {len(X)} rows, scored {len(X_test)} ticker-days")
+    return prob_up
+
+
+def signals_from_proba(prob_up, threshold=PREDICTION_THRESHOLD):
+    """Vectorized `/predict` rule: 1 = Buy, -1 = Sell, 0 = Hold (NaN probabilities are Hold)."""
+    signals = np.zeros(prob_up.shape, dtype=np.int8)
+    signals[prob_up > threshold] = 1
+    signals[(1 - prob_up) > threshold] = -1
+    return signals
+
+
+def positions_from_signals(signals, scored, allow_short=False):
+    """
+    Turns daily signals into held positions without a per-day loop.
+
+    Buy goes long, Sell goes flat (or short with `allow_short`), Hold keeps the previous
+    position. Outside the scored (out-of-sample) days the position is forced flat.
+    """
+    target = np.where(signals == 1, 1.0, np.where(signals == -1, -1.0 if allow_short else 0.0, 0.0))
+    # Days that set a position: any Buy/Sell, plus unscored days (flat). Hold carries the last one forward.
+    sets = (signals != 0) | ~scored
+    n_days = signals.shape[1]
+    last_set = np.where(sets, np.arange(n_days), -1)
+    np.maximum.accumulate(last_set, axis=1, out=last_set)
+    positions = np.take_along_axis(target, np.maximum(last_set, 0), axis=1)
+    positions[last_set < 0] = 0.0
+    return positions
+
+
+def _drawdown(equity):
+    peaks = np.maximum.accumulate(equity)
+    return equity / peaks - 1
+
+
+def simulate(prob_up, forward_return, threshold=PREDICTION_THRESHOLD, cost_bps=COST_BPS, allow_short=False, tickers=None):
+    """
+    Simulates the Buy/Sell/Hold strategy over a (tickers × days) panel and returns a report dict.
+
+    Capital is split equally across tickers; each sleeve earns position × next-day return and
+    pays `cost_bps` per unit of position change. Only days with at least one out-of-sample
+    probability are evaluated.
+    """
+    scored = ~np.isnan(prob_up)
+    days = np.flatnonzero(scored.any(axis=0))
+    if len(days) == 0:
+        raise ValueError("No out-of-sample predictions to evaluate; the panel is shorter than one training window.")
+    window = slice(days[0], days[-1] + 1)
+    prob_up, forward_return, scored = prob_up[:, window], forward_return[:, window], scored[:, window]
+
+    signals = signals_from_proba(prob_up, threshold)
+    positions = positions_from_signals(signals, scored, allow_short)
+    returns = np.nan_to_num(forward_return)
+
+    # Entering on day d trades at d's close; the last position is closed at the end of the run
+    changes = np.abs(np.diff(positions, axis=1, prepend=0.0))
+    changes[:, -1] += np.abs(positions[:, -1])
+    sleeve_pnl = positions * returns - changes * cost_bps / 1e4
+    daily = sleeve_pnl.mean(axis=0)
+    equity = np.cumprod(1 + daily)
+    # Benchmark: equal-weight buy-and-hold of the tickers that were scored each day
+    held = scored & ~np.isnan(forward_return)
+    benchmark = np.cumprod(1 + np.where(held, returns, 0).sum(axis=0) / np.maximum(held.sum(axis=0), 1))
+
+    # Hit rate: share of Buy/Sell calls whose direction matched the next day's move
+    calls = (signals != 0) & scored & ~np.isnan(forward_return)
+    hits = calls & (np.sign(forward_return) == signals)
+    n_days = daily.shape[0]
+    volatility = daily.std()
+
+    report = {
+        'threshold': threshold,
+        'costBps': cost_bps,
+        'allowShort': allow_short,
+        'days': int(n_days),
+        'tickers': int(prob_up.shape[0]),
+        'calls': int(calls.sum()),
+        'coverage': round(float(calls.sum() / max(scored.sum(), 1)), 4),
+        'hitRate': round(float(hits.sum() / calls.sum()), 4) if calls.any() else None,
+        'totalReturn': round(float(equity[-1] - 1), 4),
+        'annualizedReturn': round(float(equity[-1] ** (TRADING_DAYS / n_days) - 1), 4),
+        'sharpe': round(float(daily.mean() / volatility * np.sqrt(TRADING_DAYS)), 3) if volatility > 0 else None,
+        'maxDrawdown': round(float(_drawdown(equity).min()), 4),
+        'turnover': round(float(changes.sum() / (prob_up.shape[0] * n_days)), 4), # avg position change per sleeve per day
+        'trades': int(np.count_nonzero(changes)),
+        'exposure': round(float(np.abs(positions).mean()), 4),
+        'benchmarkReturn': round(float(benchmark[-1] - 1), 4),
+        'benchmarkMaxDrawdown': round(float(_drawdown(benchmark).min()), 4),
+    }
+    if tickers is not None:
+        ticker_calls = calls.sum(axis=1)
+        report['perTicker'] = {
+            ticker: {
+                'totalReturn': round(float(np.prod(1 + sleeve_pnl[i]) - 1), 4),
+                'hitRate': round(float(hits[i].sum() / ticker_calls[i]), 4) if ticker_calls[i] else None,
+                'trades': int(np.count_nonzero(changes[i])),
+            }
+            for i, ticker in enumerate(tickers)
+        }
+    return report
+
+
+def run_backtest(tickers=STOCKS_TO_TRAIN, period=DATA_PERIOD, thresholds=(PREDICTION_THRESHOLD,), cost_bps=COST_BPS,
+                 allow_short=False, train_days=TRAIN_DAYS, test_days=TEST_DAYS, expanding=False, dataset=None, workers=None):
+    """
+    Walk-forward backtest of the prediction model over `tickers`.
+
+    Features come from `build_training_dataset` (and its on-disk cache), so a repeat run only
+    pays for the model fits. The out-of-sample probabilities are computed once and every
+    threshold in `thresholds` is simulated from them. Returns a list of report dicts.
+    """
+    if dataset is None:
+        dataset = build_training_dataset(tickers, period, workers=workers)
+    if dataset.empty:
+        print("❌ No data was successfully processed. Aborting backtest.")
+        return []
+
+    start_time = time.perf_counter()
+    panel = Panel(dataset)
+    print(f"✅ Panel of {panel.shape[0]} tickers × {panel.shape[1]} days")
+    prob_up = walk_forward_probabilities(panel, train_days, test_days, expanding)
+    fit_seconds = time.perf_counter() - start_time
+
+    reports = []
+    for threshold in thresholds:
+        start_time = time.perf_counter()
+        report = simulate(prob_up, panel.forward_return, threshold, cost_bps, allow_short, tickers=panel.tickers)
+        report['walkForwardSeconds'] = round(fit_seconds, 2)
+        report['simulationSeconds'] = round(time.perf_counter() - start_time, 4)
+        reports.append(report)
+    return reports
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.backtest [--tickers RELIANCE.NS TCS.NS] [--threshold 0.55 0.6]
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the stock prediction model")
+    parser.add_argument('--tickers', nargs='+', default=STOCKS_TO_TRAIN)
+    parser.add_argument('--period', default=DATA_PERIOD)
+    parser.add_argument('--threshold', type=float, nargs='+', default=[PREDICTION_THRESHOLD])
+    parser.add_argument('--cost-bps', type=float, default=COST_BPS)
+    parser.add_argument('--allow-short', action='store_true', help="Sell signals go short instead of flat")
+    parser.add_argument('--train-days', type=int, default=TRAIN_DAYS)
+    parser.add_argument('--test-days', type=int, default=TEST_DAYS)
+    parser.add_argument('--expanding', action='store_true', help="Train on all history before each test window")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', help="Write the full reports (including per-ticker results) to this JSON file")
+    args = parser.parse_args()
+
+    reports = run_backtest(args.tickers, args.period, args.threshold, args.cost_bps, args.allow_short,
+                           args.train_days, args.test_days, args.expanding, workers=args.workers)
+    for report in reports:
+        summary = {k: v for k, v in report.items() if k != 'perTicker'}
+        print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+        print(f"✅ Reports saved to {args.output}")
@@ -0,0 +1,454 @@
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import tempfile
+import time
+import zlib
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+BASE_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BASE_DIR / "data" / "benchmarks"
+NSE_STOCKS_CSV = BASE_DIR / "nse_stocks.csv"
+DEFAULT_REQUESTS = 200
+DEFAULT_CONCURRENCY = (1, 8)
+WARMUP_REQUESTS = 10
+FIXTURE_YEARS = 7
+FIXTURE_USERS = 50
+SECTORS = ["Technology", "Financial Services", "Energy", "Healthcare", "Consumer Defensive", "Industrials", "Basic Materials"]
+# Metrics where a lower value is better; everything else (throughput) is higher-is-better
+LOWER_IS_BETTER = ("p50Ms", "p90Ms", "p99Ms", "meanMs", "seconds", "bytesPerRequest", "upstreamCallsPerRequest")
+IMAGE_HOST = "img.example.com"
+FIXTURE_IMAGE_SIZE = (1600, 900) # Typical full-size publisher hero image
+
+
+# --- Fixtures ---
+class _FixtureTicker:
+    """The slice of `yf.Ticker` the app uses, served from a FixtureMarket."""
+
+    def __init__(self, market, symbol):
+        self.market = market
+        self.symbol = symbol
+
+    @property
+    def info(self):
+        return self.market.info(self.symbol)
+
+    def history(self, period="1mo", auto_adjust=True):
+        return self.market.recent(self.symbol, period)
+
+    @property
+    def calendar(self):
+        self.market.upstream()
+        # Every seventh symbol has earnings in a few days, so the briefing path has events to report
+        if self.market.seed_for(self.symbol) % 7:
+            return None
+        return pd.DataFrame({"Earnings Date": [pd.Timestamp(date.today()) + pd.Timedelta(days=3)]})
+
+
+class FixtureMarket:
+    """
+    Deterministic stand-in for yfinance: every symbol gets a seeded random-walk price history
+    and a stable `.info` dict, so runs on different machines see identical data. It exposes
+    `Ticker` and `download` so it can replace the `yf` module the app imports, plus
+    `history(ticker, start)` for the OHLCV store and `provider(ticker)` for the screener builder.
+    `latency` (seconds) is slept on every upstream call to model network time.
+    """
+
+    def __init__(self, seed=7, years=FIXTURE_YEARS, latency=0.0):
+        self.seed = seed
+        self.years = years
+        self.latency = latency
+        self.upstream_calls = 0
+        self._bars = {}
+
+    def seed_for(self, symbol):
+        return zlib.crc32(f"{self.seed}:{symbol}".encode())
+
+    def upstream(self):
+        self.upstream_calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def bars(self, symbol):
+        if symbol not in self._bars:
+            rng = np.random.default_rng(self.seed_for(symbol))
+            index = pd.bdate_range(end=pd.Timestamp(date.today()), periods=self.years * 252, name="Date")
+            close = rng.uniform(50, 3000) * np.exp(np.cumsum(rng.normal(0.0003, 0.018, len(index))))
+            spread = np.abs(rng.normal(0, 0.01, len(index)))
+            self._bars[symbol] = pd.DataFrame({
+                "Open": close * (1 + rng.normal(0, 0.005, len(index))),
+                "High": close * (1 + spread),
+                "Low": close * (1 - spread),
+                "Close": close,
+                "Volume": rng.lognormal(13, 0.6, len(index)).round(),
+            }, index=index)
+        return self._bars[symbol]
+
+    def history(self, ticker, start):
+        self.upstream()
+        bars = self.bars(ticker)
+        return bars[bars.index >= pd.Timestamp(start)].copy()
+
+    def recent(self, symbol, period):
+        self.upstream()
+        from .ohlcv_store import period_to_days
+        bars = self.bars(symbol)
+        return bars[bars.index >= bars.index[-1] - pd.Timedelta(days=period_to_days(period))].copy()
+
+    def info(self, symbol):
+        self.upstream()
+        seed = self.seed_for(symbol)
+        price = float(self.bars(symbol)["Close"].iloc[-1])
+        name = symbol.replace(".NS", "")
+        return {
+            "longName": f"{name.title()} Limited",
+            "shortName": name,
+            "sector": SECTORS[seed % len(SECTORS)],
+            "marketCap": int(price * (seed % 5000 + 100) * 1_000_000),
+            "trailingPE": round(5 + seed % 60 + (seed % 100) / 100, 2),
+            "priceToBook": round(0.5 + seed % 12 + (seed % 10) / 10, 2),
+            "dividendYield": (seed % 40) / 1000,
+            "currentPrice": round(price, 2),
+            "regularMarketPrice": round(price, 2),
+        }
+
+    def provider(self, ticker_str):
+        return self.info(ticker_str)
+
+    # --- `yf` module surface ---
+    def Ticker(self, symbol):
+        return _FixtureTicker(self, symbol)
+
+    def download(self, tickers, period="2d", group_by="ticker", progress=False, **kwargs):
+        self.upstream()
+        symbols = tickers.split() if isinstance(tickers, str) else list(tickers)
+        days = max(1, int(period.rstrip("d"))) if period.endswith("d") else 5
+        return pd.concat({symbol: self.bars(symbol).tail(days) for symbol in symbols}, axis=1)
+
+
+class FixtureHTTP:
+    """`httpx.MockTransport` handler answering NewsAPI, Yahoo search and news images with deterministic payloads."""
+
+    def __init__(self, market, symbols, articles=15):
+        self.market = market
+        self.symbols = symbols
+        self.articles = articles
+        self._images = {}
+
+    def __call__(self, request):
+        self.market.upstream()
+        if request.url.host == "newsapi.org":
+            return httpx.Response(200, json={"articles": self._articles(str(request.url))})
+        if request.url.path.endswith("/finance/search"):
+            query = request.url.params.get("q", "").upper()
+            limit = int(request.url.params.get("quotesCount", 10))
+            quotes = [{"symbol": s, "longname": f"{s.replace('.NS', '').title()} Limited", "exchange": "NSI"}
+                      for s in self.symbols if query in s][:limit]
+            return httpx.Response(200, json={"quotes": quotes})
+        if request.url.host == IMAGE_HOST:
+            data = self._image(request.url.path)
+            etag = f'"{zlib.crc32(data):08x}"'
+            if request.headers.get("If-None-Match") == etag:
+                return httpx.Response(304, headers={"ETag": etag})
+            return httpx.Response(200, content=data, headers={"Content-Type": "image/jpeg", "ETag": etag})
+        return httpx.Response(404)
+
+    def _image(self, path):
+        """A noisy (so realistically sized) JPEG per path; random bytes when Pillow isn't installed."""
+        if path not in self._images:
+            from .image_cache import Image
+            rng = np.random.default_rng(zlib.crc32(path.encode()))
+            width, height = FIXTURE_IMAGE_SIZE
+            if Image is not None:
+                import io
+                pixels = rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+                img = Image.fromarray(pixels).resize((width, height))
+                out = io.BytesIO()
+                img.save(out, "JPEG", quality=90)
+                self._images[path] = out.getvalue()
+            else:
+                self._images[path] = rng.integers(0, 256, width * height // 8, dtype=np.uint8).tobytes()
+        return self._images[path]
+
+    def _articles(self, url):
+        stamp = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+        return [{
+            "title": f"Market update {i}",
+            "source": {"name": "Fixture Times"},
+            "url": f"https://news.example.com/{zlib.crc32(url.encode())}/{i}",
+            "urlToImage": f"https://{IMAGE_HOST}/{zlib.crc32(url.encode())}/{i}.jpg",
+            "publishedAt": datetime.fromtimestamp(stamp + i * 3600).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        } for i in range(self.articles)]
+
+
+def fixture_portfolios(market, symbols, users=FIXTURE_USERS):
+    """Seeded portfolios for the in-memory Firestore fake: user-0 .. user-N with 3-10 holdings each."""
+    rng = np.random.default_rng(market.seed)
+    portfolios = {}
+    for i in range(users):
+        picks = rng.choice(symbols, size=int(rng.integers(3, 11)), replace=False)
+        portfolios[f"user-{i}"] = {
+            "cashBalance": 250000.0,
+            "holdings": {str(s): {"quantity": int(rng.integers(1, 200)), "averagePrice": round(float(rng.uniform(50, 3000)), 2)} for s in picks},
+        }
+    return portfolios
+
+
+# --- Measurement ---
+def summarize(latencies, elapsed, errors, concurrency, response_bytes=0):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "bytesPerRequest": round(response_bytes / len(latencies), 1) if latencies else None,
+        "concurrency": concurrency,
+        "errors": errors,
+        "throughputRps": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        "meanMs": round(float(latencies_ms.mean()), 3),
+        "p50Ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p90Ms": round(float(np.percentile(latencies_ms, 90)), 3),
+        "p99Ms": round(float(np.percentile(latencies_ms, 99)), 3),
+        "maxMs": round(float(latencies_ms.max()), 3),
+    }
+
+
+async def run_load(client, make_request, total, concurrency, warmup=WARMUP_REQUESTS):
+    """Issues `total` requests from `concurrency` workers; `make_request(i)` returns (method, url, kwargs)."""
+    for i in range(warmup):
+        method, url, kwargs = make_request(i)
+        await client.request(method, url, **kwargs)
+
+    latencies, errors, response_bytes = [], 0, 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors, response_bytes
+        for i in counter:
+            method, url, kwargs = make_request(warmup + i)
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            response_bytes += response.num_bytes_downloaded # On the wire, i.e. after any compression
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors, concurrency, response_bytes)
+
+
+def compare(results, baseline, tolerance=0.1):
+    """Rows of (scenario, metric, baseline, current, change) plus the ones that regressed beyond `tolerance`."""
+    rows, regressions = [], []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for metric in ("throughputRps", "p50Ms", "p99Ms", "seconds", "bytesPerRequest", "upstreamCallsPerRequest"):
+            if current.get(metric) is None or not previous.get(metric):
+                continue
+            change = current[metric] / previous[metric] - 1
+            row = (name, metric, previous[metric], current[metric], change)
+            rows.append(row)
+            worse = change > tolerance if metric in LOWER_IS_BETTER else change < -tolerance
+            if worse:
+                regressions.append(row)
+    return rows, regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# --- Harness ---
+class BenchmarkHarness:
+    """
+    Runs the FastAPI app in-process against fixtures, with every on-disk store redirected to
+    `workdir`: the OHLCV store, training cache, model registry, screener data, metadata cache,
+    image cache, shared cache and portfolios (in-memory Firestore fake). Auth accepts `Bearer <uid>`.
+    """
+
+    def __init__(self, workdir, seed=7, upstream_latency=0.0, screener_symbols=500, real_rate_limits=False):
+        self.workdir = Path(workdir)
+        self.market = FixtureMarket(seed=seed, latency=upstream_latency)
+        self.screener_symbols = screener_symbols
+        self.real_rate_limits = real_rate_limits
+
+    def install(self):
+        from fastapi import Depends
+        from . import main, model
+        from .http_clients import HTTPClients
+        from .image_cache import ImageCache
+        from .metadata_cache import MetadataCache
+        from .portfolio_service import InMemoryPortfolioRepository
+        from .screener_index import ScreenerIndex
+
+        main.ohlcv_store.root = self.workdir / "ohlcv"
+        main.ohlcv_store.fetcher = self.market.history
+        model.TRAINING_CACHE_DIR = self.workdir / "training"
+        main.model_registry.root = self.workdir / "models"
+        main.shared_cache.root = self.workdir / "shared"
+        main.yf = self.market
+        main.metadata_cache = MetadataCache()
+        main.screener_index = ScreenerIndex(self.workdir / "screener_data.json", self.workdir / "technical_data.json")
+        if not self.real_rate_limits:
+            # Fixtures answer instantly; the production token buckets would only measure themselves
+            main.fetcher.rate_limits = {provider: None for provider in ("yfinance", "newsapi", "ohlcv_store")}
+            main.fetcher._buckets = {}
+
+        self.symbols = sorted({s for symbols in main.INDEX_SYMBOLS.values() for s in symbols} | set(model.STOCKS_TO_TRAIN))
+        for symbol in self.symbols:
+            self.market.bars(symbol) # Build fixtures up front so no scenario pays for generating them
+        main.http_clients = HTTPClients(transport=httpx.MockTransport(FixtureHTTP(self.market, self.symbols)))
+        main.image_cache = ImageCache(self.workdir / "images", get_client=lambda: main.http_clients.get("images"))
+        main.portfolio_service.repository = InMemoryPortfolioRepository(fixture_portfolios(self.market, self.symbols))
+        main.app.dependency_overrides[main.get_current_user] = lambda token=Depends(main.oauth2_scheme): {"uid": token}
+        self.main = main
+        self.model = model
+
+    def run_offline_jobs(self):
+        """Times `train_new_model`, the screener data build and the technical scan on fixtures. Returns scenario results."""
+        from .prepare_screener_data import AdaptiveRateLimiter, ScreenerDataBuilder
+        from .technical_scan import TechnicalScanner
+
+        results = {}
+        start = time.perf_counter()
+        version = self.model.train_new_model(use_cache=False)
+        results["train_new_model"] = {"seconds": round(time.perf_counter() - start, 3), "version": version}
+        self.main.model_server.current = self.main.model_registry.load_current()
+
+        try:
+            symbols = pd.read_csv(NSE_STOCKS_CSV)["SYMBOL"].tolist()[:self.screener_symbols]
+        except FileNotFoundError:
+            symbols = [f"SYM{i}" for i in range(self.screener_symbols)]
+        builder = ScreenerDataBuilder(
+            provider=self.market.provider, workers=8,
+            limiter=AdaptiveRateLimiter(rate=1e6, max_rate=1e6), # The fixture provider never throttles
+            output_path=self.workdir / "screener_data.json",
+            meta_path=self.workdir / "screener_data.meta.json",
+            checkpoint_path=self.workdir / "screener_checkpoint.jsonl",
+        )
+        start = time.perf_counter()
+        report = builder.run(symbols, resume=False)
+        results["gather_data"] = {"seconds": round(time.perf_counter() - start, 3), "symbols": report["symbols"],
+                                  "symbolsPerSecond": report["symbolsPerSecond"]}
+
+        scanner = TechnicalScanner(store=self.main.ohlcv_store, output_path=self.workdir / "technical_data.json",
+                                   limiter=AdaptiveRateLimiter(rate=1e6, max_rate=1e6))
+        report = scanner.run([f"{s}.NS" for s in symbols])
+        results["technical_scan"] = {"seconds": round(report["loadSeconds"] + report["scanSeconds"], 3),
+                                     "refreshSeconds": report["refreshSeconds"], "symbols": report["scanned"]}
+        return results
+
+    def scenarios(self):
+        """{name: make_request(i) -> (method, url, kwargs)} for every benchmarked endpoint."""
+        symbols = self.symbols
+        screener_filters = [{}, {"minMarketCap": 100_000_000_000}, {"maxPeRatio": 25, "minDividendYield": 1}, {"sector": "Technology"},
+                            {"maxRsi": 40, "emaTrend": "bullish"}, {"crossover": "golden", "minVolumeRatio": 1.5}]
+        auth = lambda i: {"Authorization": f"Bearer user-{i % FIXTURE_USERS}"}
+        return {
+            "predict": lambda i: ("POST", "/predict", {"json": {"ticker": symbols[i % len(symbols)]}}),
+            "predict_batch": lambda i: ("POST", "/predict/batch", {"json": {"tickers": [symbols[(i + k) % len(symbols)] for k in range(10)]}}),
+            "screener": lambda i: ("POST", "/screener", {"json": screener_filters[i % len(screener_filters)]}),
+            "screener_columns": lambda i: ("POST", "/screener", {"json": screener_filters[i % len(screener_filters)],
+                                                                  "headers": {"Accept": "application/vnd.stockwise.columns+json"}}),
+            "market_heatmap": lambda i: ("GET", "/market-heatmap", {"params": {"index": "NIFTY 50"}}),
+            "prices_batch": lambda i: ("POST", "/prices/batch", {"json": {"tickers": [symbols[(i + k) % len(symbols)] for k in range(10)]}}),
+            "daily_briefing": lambda i: ("POST", "/daily-briefing", {"json": {"watchlist": [symbols[(i + k) % len(symbols)] for k in range(8)]}, "headers": auth(i)}),
+            "portfolio_insights": lambda i: ("GET", "/portfolio/insights", {"headers": auth(i)}),
+            # A round trip (buy then sell back 1 share of 4 symbols), so balances never run out
+            "portfolio_orders": lambda i: ("POST", "/portfolio/orders", {"json": {"orders": [
+                {"side": side, "symbol": symbols[(i + k) % len(symbols)], "quantity": 1, "price": 100.0}
+                for side in ("buy", "sell") for k in range(4)]}, "headers": auth(i)}),
+            "stock_news": lambda i: ("GET", "/stock-news", {"params": {"ticker": symbols[i % len(symbols)].replace(".NS", "")}}),
+            "search_stocks": lambda i: ("GET", "/search-stocks", {"params": {"query": symbols[i % len(symbols)][:1 + i % 4]}}),
+            # A news page shows 12 article images
+            "image_proxy": lambda i: ("GET", "/image-proxy", {"params": {"url": f"https://{IMAGE_HOST}/news/{i % 12}.jpg"}}),
+        }
+
+    async def run_endpoints(self, names, total, concurrencies):
+        import httpx
+
+        scenarios = self.scenarios()
+        results = {}
+        transport = httpx.ASGITransport(app=self.main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for name in names:
+                for concurrency in concurrencies:
+                    calls = self.market.upstream_calls
+                    result = await run_load(client, scenarios[name], total, concurrency)
+                    # Warmup requests included: they are the ones that pay for cold caches
+                    result["upstreamCallsPerRequest"] = round((self.market.upstream_calls - calls) / (total + WARMUP_REQUESTS), 4)
+                    results[f"{name}@c{concurrency}"] = result
+                    print(f"{name:<20} c={concurrency:<3} {result['throughputRps']:>9} req/s  p50 {result['p50Ms']:>8} ms  "
+                          f"p99 {result['p99Ms']:>8} ms  errors {result['errors']}")
+        return results
+
+
+def run_benchmarks(names=None, total=DEFAULT_REQUESTS, concurrencies=DEFAULT_CONCURRENCY, seed=7, upstream_latency=0.0,
+                   real_rate_limits=False, workdir=None):
+    """Runs the offline jobs and the endpoint scenarios and returns the results document."""
+    import os
+    os.environ.setdefault("NEWS_API_KEY", "fixture")
+
+    with tempfile.TemporaryDirectory(prefix="stockwise-bench-") as tmp:
+        harness = BenchmarkHarness(workdir or tmp, seed=seed, upstream_latency=upstream_latency, real_rate_limits=real_rate_limits)
+        harness.install()
+        scenarios = harness.run_offline_jobs()
+        names = names or list(harness.scenarios())
+        scenarios.update(asyncio.run(harness.run_endpoints(names, total, concurrencies)))
+
+    return {
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "gitRevision": _git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {"requests": total, "concurrency": list(concurrencies), "seed": seed, "upstreamLatency": upstream_latency,
+                   "realRateLimits": real_rate_limits},
+        "scenarios": scenarios,
+    }
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.benchmark [--baseline data/benchmarks/<run>.json]
+    parser = argparse.ArgumentParser(description="Offline benchmark of the ML backend against deterministic fixtures")
+    parser.add_argument('--scenarios', nargs='+', help="Endpoint scenarios to run (default: all)")
+    parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help="Measured requests per scenario and concurrency")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=list(DEFAULT_CONCURRENCY))
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--upstream-latency-ms', type=float, default=0.0, help="Simulated latency of every fixture upstream call")
+    parser.add_argument('--real-rate-limits', action='store_true', help="Keep the production per-provider token buckets")
+    parser.add_argument('--output', help="Results file (default: data/benchmarks/<timestamp>.json)")
+    parser.add_argument('--baseline', help="Previous results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="Relative change that counts as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scenarios, args.requests, args.concurrency, args.seed, args.upstream_latency_ms / 1000, args.real_rate_limits)
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.tolerance)
+        for name, metric, previous, current, change in rows:
+            flag = " ⚠️" if (name, metric, previous, current, change) in regressions else ""
+            print(f"{name:<28} {metric:<14} {previous:>10} -> {current:>10} ({change:+.1%}){flag}")
+        if regressions:
+            print(f"❌ {len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}.")
+            if args.fail_on_regression:
+                raise SystemExit(1)
@@ -0,0 +1,203 @@
+import asyncio
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# --- Configuration ---
+REFRESH_INTERVAL = 15 * 60 # Seconds between background sweeps over every watchlist symbol
+EARNINGS_WINDOW_DAYS = 7
+VOLUME_LOOKBACK = 20 # Sessions in the average that today's volume is compared against
+UNUSUAL_VOLUME_MULTIPLE = 2
+SHARED_BRIEFING = "briefing" # SharedCache entry with the refresher's signals
+
+
+def normalize_symbol(ticker):
+    """
+    Watchlist entries are stored with or without the exchange suffix; briefings use `.NS` symbols.
+    Indices (`^NSEI`) and symbols that already carry a suffix are left as they are.
+    """
+    ticker = ticker.strip().upper()
+    return ticker if "." in ticker or ticker.startswith("^") else f"{ticker}.NS"
+
+
+def volume_panel(histories, lookback=VOLUME_LOOKBACK):
+    """
+    Right-aligns each symbol's last `lookback + 1` volumes into a (symbols × days) array.
+
+    Symbols with a shorter history are padded with NaN on the left, so column -1 is always the
+    symbol's latest session whatever its calendar.
+    """
+    symbols = list(histories)
+    panel = np.full((len(symbols), lookback + 1), np.nan)
+    for row, symbol in enumerate(symbols):
+        volumes = histories[symbol]['Volume'].to_numpy(dtype=np.float64)[-(lookback + 1):]
+        if len(volumes):
+            panel[row, -len(volumes):] = volumes
+    return symbols, panel
+
+
+def unusual_volume(panel, multiple=UNUSUAL_VOLUME_MULTIPLE):
+    """Boolean per row: latest volume above `multiple` × the mean of the sessions before it."""
+    sessions = np.count_nonzero(~np.isnan(panel), axis=1)
+    previous = panel[:, :-1]
+    counts = np.count_nonzero(~np.isnan(previous), axis=1)
+    averages = np.nansum(previous, axis=1) / np.maximum(counts, 1)
+    return (sessions > 2) & (panel[:, -1] > averages * multiple)
+
+
+async def _nothing():
+    return {}
+
+
+class BriefingEngine:
+    """
+    Computes briefing signals per symbol and joins them to watchlists.
+
+    `load_earnings(symbols)` returns {symbol: next earnings date (or None) or Exception} and
+    `load_histories(symbols)` returns {symbol: recent OHLCV frame or Exception}; both are async
+    and batched. `list_watchlist_symbols()` (sync, optional) returns every symbol on any user's
+    watchlist so the background sweep can precompute them. A user's briefing is then a lookup.
+
+    Earnings items are computed once per symbol per day. Volume items are keyed by the date of
+    the symbol's latest bar and recomputed for every tracked symbol on each sweep, so a spike
+    during the trading session is reported within one interval; requests only compute symbols
+    no sweep has covered yet.
+
+    With a `shared` SharedCache only the elected refresher runs the sweep (over its own symbols
+    plus those the other workers declare) and publishes the signals; other workers adopt them.
+    """
+
+    def __init__(self, load_earnings, load_histories, list_watchlist_symbols=None, interval=REFRESH_INTERVAL, shared=None):
+        self.load_earnings = load_earnings
+        self.load_histories = load_histories
+        self.list_watchlist_symbols = list_watchlist_symbols
+        self.interval = interval
+        self.shared = shared
+        self.day = None
+        self._earnings = {} # symbol -> earnings item or None, for `day`
+        self._volume = {} # symbol -> (latest bar date ISO or None, unusual volume item or None)
+        self._known = set() # Symbols seen this process, kept warm by the sweep
+        self._declared = frozenset()
+        self._adopted = None # Generation of the shared signals last merged in
+        self._inflight = None
+        self.computed = 0
+
+    def _roll_day(self):
+        today = date.today()
+        if self.day != today:
+            self.day = today
+            self._earnings = {}
+
+    async def _compute(self, earnings_symbols, volume_symbols):
+        """Computes the earnings items of `earnings_symbols` and the volume items of `volume_symbols`."""
+        earnings, histories = await asyncio.gather(
+            self.load_earnings(earnings_symbols) if earnings_symbols else _nothing(),
+            self.load_histories(volume_symbols) if volume_symbols else _nothing(),
+        )
+        today = self.day
+
+        # 1. Check for upcoming earnings
+        for symbol in earnings_symbols:
+            earnings_date = earnings.get(symbol)
+            item = None
+            if earnings_date is not None and not isinstance(earnings_date, Exception):
+                earnings_date = pd.to_datetime(earnings_date).date()
+                if earnings_date > today and (earnings_date - today).days <= EARNINGS_WINDOW_DAYS:
+                    item = f"Upcoming Event for {symbol.replace('.NS','')}: Earnings scheduled for {earnings_date.strftime('%B %d, %Y')}."
+            self._earnings[symbol] = item
+
+        # 2. Check for unusual volume on each symbol's latest bar, for every symbol at once
+        usable = {s: h for s, h in histories.items() if not isinstance(h, Exception) and h is not None and not h.empty}
+        volume = {symbol: (None, None) for symbol in volume_symbols}
+        if usable:
+            panel_symbols, panel = volume_panel(usable)
+            for symbol, flagged in zip(panel_symbols, unusual_volume(panel)):
+                item = f"Unusual Activity in {symbol.replace('.NS','')}: Today's trading volume is significantly higher than average." if flagged else None
+                volume[symbol] = (usable[symbol].index[-1].date().isoformat(), item)
+        self._volume.update(volume)
+
+        for symbol, error in list(earnings.items()) + list(histories.items()):
+            if isinstance(error, Exception):
+                print(f"⚠️ Could not fetch briefing data for {symbol}: {error}")
+        self.computed += len(set(earnings_symbols) | set(volume_symbols))
+
+    def _missing(self, symbols):
+        return ([s for s in symbols if s not in self._earnings], [s for s in symbols if s not in self._volume])
+
+    async def _sync_shared(self, redeclare=False):
+        """Declares this worker's symbols to the refresher and merges in its published signals."""
+        if redeclare or self._known != self._declared:
+            self._declared = frozenset(self._known)
+            await asyncio.to_thread(self.shared.declare_demand, SHARED_BRIEFING, self._declared)
+        published, snapshot = self.shared.read_json(SHARED_BRIEFING) # A stat unless a new generation was published
+        if snapshot is None or snapshot.generation == self._adopted:
+            return
+        self._adopted = snapshot.generation
+        if published["day"] == self.day.isoformat():
+            self._earnings.update(published["earnings"])
+        for symbol, (bar, item) in published["volume"].items():
+            current = self._volume.get(symbol)
+            if current is None or current[0] is None or (bar is not None and bar >= current[0]):
+                self._volume[symbol] = (bar, item)
+
+    async def ensure(self, symbols):
+        """Computes signals for any of `symbols` that have none yet."""
+        self._roll_day()
+        symbols = list(dict.fromkeys(normalize_symbol(s) for s in symbols))
+        self._known.update(symbols)
+        if self.shared is not None and not self.shared.is_leader:
+            await self._sync_shared()
+        while True:
+            earnings_missing, volume_missing = self._missing(symbols)
+            if not earnings_missing and not volume_missing:
+                return
+            # One computation at a time: concurrent callers wait for it and then pick up what's left
+            if self._inflight is None:
+                self._inflight = asyncio.ensure_future(self._compute(earnings_missing, volume_missing))
+                self._inflight.add_done_callback(lambda _: setattr(self, "_inflight", None))
+            await asyncio.shield(self._inflight)
+
+    async def briefing(self, watchlist):
+        """Briefing items for one watchlist, in watchlist order."""
+        await self.ensure(watchlist)
+        items = []
+        for symbol in dict.fromkeys(normalize_symbol(s) for s in watchlist):
+            items.extend(item for item in (self._earnings.get(symbol), self._volume.get(symbol, (None, None))[1]) if item)
+        return items
+
+    async def refresh_all(self):
+        """
+        Sweeps every symbol on any watchlist (plus those requested before): earnings for symbols
+        not yet checked today, and unusual volume for all of them against their latest bar.
+        """
+        self._roll_day()
+        symbols = set(self._known)
+        if self.list_watchlist_symbols is not None:
+            symbols |= await asyncio.to_thread(self.list_watchlist_symbols)
+        if self.shared is not None:
+            # Followers re-declare every interval, so anything older belongs to a worker that has gone
+            symbols |= await asyncio.to_thread(self.shared.demand, SHARED_BRIEFING, 2 * self.interval)
+        symbols = sorted(symbols)
+        await self._compute(self._missing(symbols)[0], symbols)
+        if self.shared is not None:
+            await asyncio.to_thread(self.shared.publish_json, SHARED_BRIEFING,
+                                    {"day": self.day.isoformat(), "earnings": self._earnings, "volume": self._volume})
+        return len(symbols)
+
+    async def run(self):
+        """Background loop: keeps the signals fresh until cancelled (on the refresher worker only, if shared)."""
+        while True:
+            try:
+                if self.shared is not None and not self.shared.lead():
+                    self._roll_day()
+                    await self._sync_shared(redeclare=True)
+                else:
+                    await self.refresh_all()
+            except Exception as e:
+                print(f"⚠️ Briefing refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self):
+        return {"day": self.day.isoformat() if self.day else None,
+                "symbols": len(self._volume), "computed": self.computed}
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from .indicators import IndicatorEngine
+from .model import FEATURE_NAMES, create_features
+
+# --- Configuration ---
+TOLERANCE = 1e-9 # Largest relative difference accepted between the engine and create_features
+WINDOW = 750 # About 3 years of sessions, like /predict
+
+
+def fixture_history(sessions=1100, seed=7):
+    """A fixed random-walk OHLCV frame, so the check runs offline and gives the same numbers every time."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, sessions)))
+    spread = close * rng.uniform(0.002, 0.02, sessions)
+    index = pd.bdate_range("2021-01-04", periods=sessions, name="Date")
+    return pd.DataFrame({"Open": close, "High": close + spread, "Low": close - spread, "Close": close,
+                         "Volume": rng.integers(100_000, 1_000_000, sessions).astype(float)}, index=index)
+
+
+def _compare(label, engine_row, expected_row):
+    actual, expected = np.asarray(engine_row, dtype=float), np.asarray(expected_row, dtype=float)
+    diff = np.abs(actual - expected) / np.maximum(np.abs(expected), 1e-12)
+    worst = int(np.argmax(diff))
+    assert diff[worst] <= TOLERANCE, (f"{label}: {FEATURE_NAMES[worst]} engine {actual[worst]} "
+                                      f"vs create_features {expected[worst]} (relative diff {diff[worst]:.2e})")
+    return diff[worst]
+
+
+def check_parity(history=None, trailing=10):
+    """The engine's feature rows equal `create_features` on the same window, as requests would see them."""
+    history = fixture_history() if history is None else history
+    engine = IndicatorEngine()
+    worst = 0.0
+
+    # Trailing rows: one request per new session, each folding in a single bar
+    window = history.iloc[:WINDOW]
+    expected = create_features(window)[FEATURE_NAMES]
+    for end in range(WINDOW - trailing + 1, WINDOW + 1):
+        date, row = engine.latest_row("FIXTURE", window.iloc[:end])
+        worst = max(worst, _compare(f"row {date.date()}", row, expected.loc[date]))
+
+    # The window slides: its first bar changes, which create_features starts every indicator from
+    for shift in (1, 5, 50, 200):
+        window = history.iloc[shift:WINDOW + shift]
+        date, row = engine.latest_row("FIXTURE", window)
+        worst = max(worst, _compare(f"window +{shift}", row, create_features(window)[FEATURE_NAMES].iloc[-1]))
+
+    # The in-progress last bar is revised: the engine previews it and must not keep the old close
+    window = history.iloc[200:WINDOW + 200].copy()
+    for factor in (1.02, 0.97):
+        window.iloc[-1, window.columns.get_loc("Close")] *= factor
+        date, row = engine.latest_row("FIXTURE", window)
+        worst = max(worst, _compare(f"revised close x{factor}", row, create_features(window)[FEATURE_NAMES].iloc[-1]))
+
+    # A settled close changes (split/dividend re-adjustment of the whole history)
+    adjusted = window.copy()
+    adjusted[["Open", "High", "Low", "Close"]] *= 0.5
+    date, row = engine.latest_row("FIXTURE", adjusted)
+    worst = max(worst, _compare("re-adjusted history", row, create_features(adjusted)[FEATURE_NAMES].iloc[-1]))
+
+    print(f"✅ IndicatorEngine matches create_features on {trailing} trailing rows, sliding windows, "
+          f"a revised last bar and a re-adjusted history (max relative difference {worst:.1e}).")
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.check_indicators
+    check_parity()
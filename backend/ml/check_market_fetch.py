@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+
+from .market_fetch import FetchLayer
+
+
+class FakeUpstream:
+    """A blocking fetcher that sleeps like a network call, counts its calls and can fail the first few."""
+
+    def __init__(self, latency=0.05, failures=0, error=None):
+        self.latency = latency
+        self.failures = failures
+        self.error = error or RuntimeError("429 Client Error: Too Many Requests")
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, symbol):
+        with self._lock:
+            self.calls.append((symbol, time.monotonic()))
+            failing = self.failures > 0
+            self.failures -= failing
+        time.sleep(self.latency)
+        if failing:
+            raise self.error
+        return {"symbol": symbol, "price": 100.0}
+
+
+async def check_coalescing(viewers=20):
+    """Concurrent identical requests share one upstream call; different keys don't."""
+    layer, upstream = FetchLayer(rate_limits={"fake": None}), FakeUpstream(latency=0.2)
+    results = await asyncio.gather(*(layer.fetch("fake", ("quote", "TCS.NS"), upstream, "TCS.NS") for _ in range(viewers)))
+    assert len(upstream.calls) == 1, f"{viewers} identical requests made {len(upstream.calls)} upstream calls"
+    assert all(result is results[0] for result in results), "Every viewer should get the shared result"
+
+    await layer.fetch_many("fake", "quote", ["TCS.NS", "INFY.NS", "TCS.NS"], upstream)
+    assert len(upstream.calls) == 3, "The finished call must not be reused, and each distinct key needs its own"
+    layer.shutdown()
+    print(f"✅ {viewers} concurrent requests for one symbol made a single upstream call.")
+
+
+async def check_retries():
+    """Throttle errors are retried with backoff; `giveup_on` errors and exhausted retries are raised."""
+    layer = FetchLayer(rate_limits={"fake": None}, retries=2, backoff=0.01)
+
+    upstream = FakeUpstream(latency=0.01, failures=2)
+    result = await layer.fetch("fake", ("quote", "TCS.NS"), upstream, "TCS.NS")
+    assert result["symbol"] == "TCS.NS" and len(upstream.calls) == 3, f"{len(upstream.calls)} calls"
+
+    upstream = FakeUpstream(latency=0.01, failures=5)
+    try:
+        await layer.fetch("fake", ("quote", "TCS.NS"), upstream, "TCS.NS")
+    except RuntimeError:
+        assert len(upstream.calls) == 3, "Expected the first attempt plus 2 retries"
+    else:
+        raise AssertionError("Exhausted retries should raise the upstream error")
+
+    upstream = FakeUpstream(latency=0.01, failures=1, error=ValueError("No data found, symbol may be delisted"))
+    try:
+        await layer.fetch("fake", ("quote", "GONE.NS"), upstream, "GONE.NS")
+    except ValueError:
+        assert len(upstream.calls) == 1, "A no-data answer must not be retried"
+    else:
+        raise AssertionError("Expected the no-data error")
+    layer.shutdown()
+    print("✅ Throttled calls are retried until they succeed; no-data answers and exhausted retries are raised.")
+
+
+async def check_rate_limit(requests=25, rate=20.0, capacity=5):
+    """The token bucket lets a burst of `capacity` through, then holds calls to `rate` per second."""
+    layer, upstream = FetchLayer(max_concurrency=8, rate_limits={"fake": (rate, capacity)}), FakeUpstream(latency=0.0)
+    started = time.monotonic()
+    await layer.fetch_many("fake", "quote", [f"S{i}" for i in range(requests)], upstream)
+    elapsed = time.monotonic() - started
+    layer.shutdown()
+
+    floor = (requests - capacity) / rate
+    assert len(upstream.calls) == requests
+    assert elapsed >= 0.95 * floor, f"{requests} calls took {elapsed:.2f}s, the bucket allows no less than {floor:.2f}s"
+    assert elapsed <= 2 * floor + 0.5, f"{requests} calls took {elapsed:.2f}s, the bucket is throttling too hard"
+    # Over any one-second span, no more than a burst plus a second's worth of tokens went out
+    times = sorted(at for _, at in upstream.calls)
+    busiest = max(sum(1 for t in times if start <= t < start + 1.0) for start in times)
+    assert busiest <= capacity + rate, f"{busiest} calls within one second"
+    print(f"✅ {requests} calls at {rate:g}/s with a burst of {capacity} took {elapsed:.2f}s (floor {floor:.2f}s).")
+
+
+async def check_fetch_layer():
+    await check_coalescing()
+    await check_retries()
+    await check_rate_limit()
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.check_market_fetch
+    asyncio.run(check_fetch_layer())
@@ -0,0 +1,111 @@
+import os
+
+from .portfolio_service import InMemoryPortfolioRepository, PortfolioService, TooMuchContention
+
+
+class ContendedRepository(InMemoryPortfolioRepository):
+    """The in-memory fake with another client committing to the portfolio during every transaction."""
+
+    def commit_orders(self, user_id, batch_id, mutate):
+        def racing_mutate(current):
+            with self._lock:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            return mutate(current)
+        return super().commit_orders(user_id, batch_id, racing_mutate)
+
+
+def _service(repository):
+    return PortfolioService(repository, load_quotes=None, load_rsi=None)
+
+
+def _starting_portfolio():
+    return {'user': {'cashBalance': 10000.0, 'holdings': {'TCS.NS': {'quantity': 5, 'averagePrice': 100.0}}}}
+
+
+def check_rollback():
+    """A batch with one unfillable order changes nothing and writes no ledger entry."""
+    repository = InMemoryPortfolioRepository(_starting_portfolio())
+    service = _service(repository)
+    before = repository.get('user')
+    orders = [{'side': 'buy', 'symbol': 'INFY.NS', 'quantity': 10, 'price': 100.0},
+              {'side': 'sell', 'symbol': 'TCS.NS', 'quantity': 6, 'price': 100.0}]
+    try:
+        service.place_orders('user', orders)
+    except ValueError as e:
+        assert str(e) == "Order 2 (sell 6 TCS.NS): Not enough shares to sell.", e
+    else:
+        raise AssertionError("The batch should have been rejected")
+    assert repository.get('user') == before, "A rejected batch must not change the portfolio"
+    assert repository.ledger('user', 10) == [], "A rejected batch must not be recorded"
+    assert service.get_portfolio('user') == before, "The cached snapshot must not keep the partial batch"
+    print("✅ A batch with an unfillable order is rolled back whole.")
+
+
+def check_idempotent_retry():
+    """Replaying a batchId returns the first result without applying the orders again."""
+    repository = InMemoryPortfolioRepository(_starting_portfolio())
+    service = _service(repository)
+    orders = [{'side': 'sell', 'symbol': 'TCS.NS', 'quantity': 2, 'price': 150.0},
+              {'side': 'buy', 'symbol': 'INFY.NS', 'quantity': 3, 'price': 100.0}]
+    first, entry, applied = service.place_orders('user', orders, batch_id='rebalance-1')
+    assert applied and first['cashBalance'] == 10000.0 + 300.0 - 300.0
+    again, replayed, applied = service.place_orders('user', orders, batch_id='rebalance-1')
+    assert not applied, "A retried batchId must not be applied twice"
+    assert replayed['seq'] == entry['seq'] and again == first == repository.get('user')
+    assert len(repository.ledger('user', 10)) == 1
+    print("✅ Retrying a batchId is a no-op that returns the recorded result.")
+
+
+def check_single_trades():
+    """/portfolio/buy and /sell keep their original error messages."""
+    service = _service(InMemoryPortfolioRepository(_starting_portfolio()))
+    for trade, args, message in [
+        (service.sell, ('nobody', 'TCS.NS', 1, 100.0), "Portfolio not found."),
+        (service.sell, ('user', 'TCS.NS', 6, 100.0), "Not enough shares to sell."),
+        (service.buy, ('user', 'TCS.NS', 1000, 100.0), "Insufficient funds."),
+    ]:
+        try:
+            trade(*args)
+        except ValueError as e:
+            assert str(e) == message, f"{e!r} != {message!r}"
+        else:
+            raise AssertionError(f"Expected {message!r}")
+    assert service.buy('new-user', 'TCS.NS', 1, 100.0) == 1000000 - 100.0, "Buying creates the starting portfolio"
+    print("✅ Single trades keep their original messages.")
+
+
+def check_contention_status():
+    """Transactions that keep conflicting raise TooMuchContention, which the endpoints answer with 409."""
+    service = _service(ContendedRepository(_starting_portfolio(), max_attempts=3))
+    try:
+        service.place_orders('user', [{'side': 'buy', 'symbol': 'INFY.NS', 'quantity': 1, 'price': 100.0}])
+    except TooMuchContention:
+        pass
+    else:
+        raise AssertionError("Expected TooMuchContention")
+
+    os.environ.setdefault("PORTFOLIO_STORE", "memory")
+    from fastapi.testclient import TestClient
+    from . import main
+
+    main.portfolio_service.repository = ContendedRepository(_starting_portfolio(), max_attempts=3)
+    main.portfolio_service.invalidate('user')
+    main.app.dependency_overrides[main.get_current_user] = lambda: {"uid": 'user'}
+    try:
+        client = TestClient(main.app) # No `with`: the app's startup tasks aren't needed
+        order = {'symbol': 'TCS.NS', 'quantity': 1, 'price': 100.0}
+        for path, body in [("/portfolio/orders", {'orders': [{'side': 'sell', **order}]}),
+                           ("/portfolio/buy", order), ("/portfolio/sell", order)]:
+            response = client.post(path, json=body)
+            assert response.status_code == 409, f"{path}: {response.status_code} {response.text}"
+    finally:
+        main.app.dependency_overrides.pop(main.get_current_user, None)
+    print("✅ Exhausted transaction retries become 409 on /portfolio/orders, /buy and /sell.")
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.check_portfolio_orders
+    check_rollback()
+    check_idempotent_retry()
+    check_single_trades()
+    check_contention_status()
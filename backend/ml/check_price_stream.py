@@ -0,0 +1,85 @@
+import asyncio
+
+from .price_stream import PriceStreamHub, SimulatedPriceFeed
+
+# --- Fixture ---
+SYMBOLS = ["TCS.NS", "INFY.NS", "RELIANCE.NS", "HDFCBANK.NS", "ITC.NS"]
+
+
+async def check_fan_out(subscribers=50, ticks=10):
+    """Each tick fetches every watched symbol once, however many clients watch it."""
+    feed = SimulatedPriceFeed(seed=1, change_probability=1.0)
+    hub = PriceStreamHub(feed)
+    subscriptions = [hub.subscribe(SYMBOLS[i % 3:i % 3 + 3]) for i in range(subscribers)]
+    for _ in range(ticks):
+        await hub.tick()
+
+    assert all(feed.calls[symbol] == ticks for symbol in SYMBOLS), f"Upstream calls per symbol: {dict(feed.calls)}"
+    assert hub.upstream_fetches == ticks * len(SYMBOLS)
+    for subscription in subscriptions:
+        received = await subscription.next()
+        assert set(received) == subscription.symbols, "A subscriber must only get the symbols it watches"
+    print(f"✅ {subscribers} subscribers over {len(SYMBOLS)} symbols: {hub.upstream_fetches} upstream fetches in {ticks} ticks.")
+
+
+async def check_unsubscribe():
+    """Dropping the last subscriber of a symbol stops fetching it, even mid-fetch."""
+    feed = SimulatedPriceFeed(seed=2, change_probability=1.0)
+    hub = PriceStreamHub(feed)
+    first, second = hub.subscribe(["TCS.NS", "INFY.NS"]), hub.subscribe(["TCS.NS"])
+    await hub.tick()
+
+    hub.unsubscribe(first)
+    assert hub.symbols == {"TCS.NS"} and hub._refcounts["TCS.NS"] == 1, hub._refcounts
+    assert "INFY.NS" not in hub._quotes, "A symbol nobody watches must not keep its last quote"
+    assert await first.next() is None, "A closed subscription ends its stream"
+    await hub.tick()
+    assert feed.calls == {"TCS.NS": 2, "INFY.NS": 1}, dict(feed.calls)
+
+    # The last watcher leaves while a tick's fetch is still in flight
+    async def slow_feed(symbols):
+        await asyncio.sleep(0.05)
+        return await feed(symbols)
+    hub.fetch_quotes = slow_feed
+    pending = asyncio.ensure_future(hub.tick())
+    await asyncio.sleep(0)
+    hub.unsubscribe(second)
+    assert await pending == {}, "Quotes for a dropped symbol must not be pushed"
+    assert hub.symbols == set() and not hub._refcounts and not hub._quotes
+    calls = sum(feed.calls.values())
+    assert await hub.tick() == {} and sum(feed.calls.values()) == calls, "An idle hub must not call upstream"
+    assert hub.stats()["subscribers"] == 0
+    print("✅ Unsubscribing drops refcounts to zero, and nothing is fetched or pushed for unwatched symbols.")
+
+
+async def check_slow_subscriber(ticks=5):
+    """A client that falls behind gets one merged update with the latest quotes, not a backlog."""
+    feed = SimulatedPriceFeed(seed=3, change_probability=1.0)
+    hub = PriceStreamHub(feed)
+    fast, slow = hub.subscribe(SYMBOLS[:3]), hub.subscribe(SYMBOLS[:3])
+    batches = []
+    for _ in range(ticks):
+        await hub.tick()
+        batches.append(await fast.next())
+
+    merged = await slow.next()
+    assert len(batches) == ticks and merged == batches[-1] == {s: hub._quotes[s] for s in SYMBOLS[:3]}, \
+        "The slow subscriber should get exactly the latest quote of every symbol"
+    try:
+        await asyncio.wait_for(slow.next(), timeout=0.05)
+    except asyncio.TimeoutError:
+        pass
+    else:
+        raise AssertionError("Nothing should be queued after the merged update")
+    print(f"✅ A subscriber that skipped {ticks} ticks received one merged update with the latest quotes.")
+
+
+async def check_price_stream():
+    await check_fan_out()
+    await check_unsubscribe()
+    await check_slow_subscriber()
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.check_price_stream
+    asyncio.run(check_price_stream())
@@ -0,0 +1,89 @@
+import json
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+
+from .prepare_screener_data import AdaptiveRateLimiter, Checkpoint, ScreenerDataBuilder
+
+# --- Fixture ---
+SYMBOLS = [f"STOCK{i:02d}" for i in range(24)] + ["DELISTED", "HOTSTOCK", "NOPRICE"]
+RESUMED = SYMBOLS[:6] # Finished by an "interrupted" earlier run
+THROTTLE_ERROR = "429 Client Error: Too Many Requests for url: https://query2.finance.yahoo.com/v10/finance/quoteSummary"
+
+
+class FakeInfoProvider:
+    """Stands in for `yf.Ticker(...).info`: throttles the first few calls, and fails or lacks data for chosen symbols."""
+
+    def __init__(self, throttles=3):
+        self.throttles = throttles
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, ticker_str):
+        with self._lock:
+            self.calls[ticker_str] += 1
+            throttled = self.throttles > 0
+            self.throttles -= throttled
+        if throttled or ticker_str == "HOTSTOCK.NS": # HOTSTOCK is throttled on every attempt
+            raise RuntimeError(THROTTLE_ERROR)
+        if ticker_str == "DELISTED.NS":
+            raise KeyError("currentPrice")
+        if ticker_str == "NOPRICE.NS":
+            return {"marketCap": 1e9}
+        return {"marketCap": 1e10, "currentPrice": 250.0, "trailingPE": 18.5, "priceToBook": 3.1,
+                "dividendYield": 0.012, "sector": "Technology"}
+
+
+def check_builder():
+    """Throttling backs the limiter off, failures are reported, and a resumed run skips finished symbols."""
+    with tempfile.TemporaryDirectory(prefix="stockwise-screener-") as root:
+        root = Path(root)
+        output, meta, checkpoint = root / "screener_data.json", root / "screener_data.meta.json", root / "checkpoint.jsonl"
+        # A previous build had a row for DELISTED, and an interrupted run already finished RESUMED
+        output.write_text(json.dumps([{"symbol": "DELISTED", "price": 90.0, "marketCap": 5e8}]))
+        meta.write_text(json.dumps({"DELISTED": 1.0}))
+        partial = Checkpoint(checkpoint)
+        for symbol in RESUMED:
+            partial.append({"symbol": symbol, "status": "ok", "updatedAt": 2.0,
+                            "record": {"symbol": symbol, "price": 1.0, "marketCap": 1.0, "sector": "From checkpoint"}})
+        with open(checkpoint, "a") as f:
+            f.write('{"symbol": "STOCK23", "stat') # Torn last line from the crash
+
+        provider = FakeInfoProvider(throttles=3)
+        limiter = AdaptiveRateLimiter(rate=40.0, max_rate=40.0, increase=0.1)
+        throttled_rates = []
+        on_throttle = limiter.on_throttle
+        limiter.on_throttle = lambda: (on_throttle(), throttled_rates.append(limiter.rate))
+        builder = ScreenerDataBuilder(provider=provider, workers=4, limiter=limiter, retries=3,
+                                      output_path=output, meta_path=meta, checkpoint_path=checkpoint)
+        report = builder.run(SYMBOLS)
+
+        records = {r["symbol"]: r for r in json.loads(output.read_text())}
+        written_meta = json.loads(meta.read_text())
+        assert not checkpoint.exists(), "A finished run clears its checkpoint"
+
+    # Resume: finished symbols come from the checkpoint and are never fetched again
+    assert not any(provider.calls[f"{s}.NS"] for s in RESUMED), "Checkpointed symbols were fetched again"
+    assert all(records[s]["sector"] == "From checkpoint" and written_meta[s] == 2.0 for s in RESUMED)
+    assert report["refreshed"] == len(SYMBOLS) - len(RESUMED)
+
+    # Backoff: every throttle halved the rate, and retries gave up on a symbol that kept being throttled
+    assert len(throttled_rates) == 3 + 2, f"Expected 5 throttles with backoff, got {throttled_rates}"
+    assert min(throttled_rates) <= 40.0 / 2 ** 3, f"The rate never backed off far enough: {throttled_rates}"
+    assert limiter.rate < 40.0, "The rate should still be recovering from the throttling"
+    assert provider.calls["HOTSTOCK.NS"] == 3, "A persistently throttled symbol gets `retries` attempts"
+
+    # Failure report: errors per symbol; a failed symbol keeps its previous row, a symbol without a price is skipped
+    assert report["failed"] == 2 and set(report["failures"]) == {"DELISTED", "HOTSTOCK"}, report["failures"]
+    assert "429" in report["failures"]["HOTSTOCK"] and "currentPrice" in report["failures"]["DELISTED"]
+    assert provider.calls["DELISTED.NS"] == 1, "Non-throttle errors are not retried"
+    assert records["DELISTED"]["price"] == 90.0 and "HOTSTOCK" not in records and "NOPRICE" not in records
+    assert report["written"] == len(SYMBOLS) - 2 and len(records) == report["written"]
+    print(f"✅ Resumed past {len(RESUMED)} checkpointed symbols, backed off to {min(throttled_rates):.1f} req/s "
+          f"after {len(throttled_rates)} throttles, and reported {report['failed']} failures.")
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.check_screener_builder
+    check_builder()
@@ -0,0 +1,83 @@
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from .shared_cache import SharedCache
+
+
+def _memory_kb():
+    """(RSS, PSS) of this process in kB; PSS splits shared pages between the processes mapping them."""
+    values = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in ("Rss:", "Pss:"):
+                    values[parts[0][:-1]] = int(parts[1])
+    except FileNotFoundError:
+        pass
+    return values.get("Rss"), values.get("Pss")
+
+
+def _worker(root, shape, results, barrier, generations):
+    shared = SharedCache(root)
+    barrier.wait()
+    leader = shared.lead()
+    rss_before, pss_before = _memory_kb()
+    seen = []
+    for round_ in range(generations):
+        if leader:
+            rng = np.random.default_rng(round_)
+            shared.publish("panel", {"close": rng.random(shape)}, meta={"round": round_})
+        snapshot = None
+        while snapshot is None or snapshot.meta["round"] != round_:
+            time.sleep(0.01)
+            snapshot = shared.read("panel")
+        close = snapshot["close"]
+        digest = hashlib.sha1(close).hexdigest()[:12] # Touches every page, as a real reader would
+        seen.append((snapshot.generation, digest))
+        barrier.wait() # Everyone has read this round before the leader publishes the next
+    rss_after, pss_after = _memory_kb()
+    results.put({"pid": os.getpid(), "leader": leader, "seen": seen,
+                 "rssDeltaMb": None if rss_before is None else round((rss_after - rss_before) / 1024, 1),
+                 "pssDeltaMb": None if pss_before is None else round((pss_after - pss_before) / 1024, 1)})
+
+
+def check_workers(workers=4, shape=(2150, 750), generations=2):
+    """
+    Starts `workers` processes on one cache: exactly one leads, and all read identical generations.
+
+    Each reports its RSS growth (mapped pages count in full) and PSS growth (shared pages are split
+    between the processes mapping them), so followers show the panel costing ~1/workers of its size.
+    """
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="stockwise-shared-") as root:
+        results, barrier = context.Queue(), context.Barrier(workers)
+        processes = [context.Process(target=_worker, args=(root, shape, results, barrier, generations)) for _ in range(workers)]
+        for p in processes:
+            p.start()
+        reports = [results.get(timeout=120) for _ in processes]
+        for p in processes:
+            p.join()
+
+    panel_mb = np.prod(shape) * 8 / 1024 / 1024
+    print(f"Panel {shape[0]} × {shape[1]} float64 = {panel_mb:.1f} MB, {workers} workers, {generations} generations")
+    for r in sorted(reports, key=lambda r: not r["leader"]):
+        print(f"  pid {r['pid']:>7} {'leader  ' if r['leader'] else 'follower'} RSS +{r['rssDeltaMb']} MB  PSS +{r['pssDeltaMb']} MB  "
+              f"{[digest for _, digest in r['seen']]}")
+    leaders = sum(r["leader"] for r in reports)
+    identical = len({tuple(r["seen"]) for r in reports}) == 1
+    assert leaders == 1, f"Expected exactly one refresher, got {leaders}"
+    assert identical, "Workers saw different generations or data"
+    print(f"✅ One refresher; every worker saw the same {generations} generations byte for byte.")
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.check_shared_cache [workers]
+    import sys
+
+    check_workers(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
@@ -0,0 +1,200 @@
+import json
+import time
+
+import numpy as np
+
+# --- Configuration ---
+PARITY_TOLERANCE = 1e-5 # Max |probability difference| against XGBoost before the compiled path is refused
+PARITY_PROBE_ROWS = 512
+
+
+def _sigmoid(margin):
+    return (1.0 / (1.0 + np.exp(-margin))).astype(np.float32)
+
+
+class CompiledForest:
+    """
+    A binary:logistic gbtree booster flattened into NumPy arrays, scored without XGBoost.
+
+    Every node of every tree lives in one set of arrays (feature, threshold, default-left,
+    children, leaf value); leaves point at themselves, so all trees advance one level per step
+    and after `depth` steps every tree sits on its leaf. A batch costs `depth` rounds of vector
+    gathers over all trees instead of a DMatrix build and a predictor call; a single row first
+    resolves every node's next node with one comparison and then needs one gather per level.
+    Splits follow XGBoost: left when `x < threshold` in float32, missing values go the node's
+    default way.
+    """
+
+    def __init__(self, feature, threshold, default_left, children, value, roots, depth, base_margin, num_feature):
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.children = children # (nodes * 2,): left child at 2i, right child at 2i + 1
+        self.left = np.ascontiguousarray(children[0::2])
+        self.right = np.ascontiguousarray(children[1::2])
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.base_margin = np.float32(base_margin)
+        self.num_feature = num_feature
+
+    @classmethod
+    def from_booster(cls, booster):
+        """Builds the forest from an `xgboost.Booster`. Raises ValueError for models it can't represent."""
+        learner = json.loads(booster.save_raw("json"))["learner"]
+        objective = learner["objective"]["name"]
+        booster_type = learner["gradient_booster"]["name"]
+        if objective != "binary:logistic" or booster_type != "gbtree":
+            raise ValueError(f"Only binary:logistic gbtree models can be compiled, not {objective}/{booster_type}.")
+        base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+        num_feature = int(learner["learner_model_param"]["num_feature"])
+
+        features, thresholds, defaults, lefts, rights, values, roots, depth = [], [], [], [], [], [], [], 0
+        offset = 0
+        for tree in learner["gradient_booster"]["model"]["trees"]:
+            left = np.asarray(tree["left_children"], dtype=np.int64)
+            right = np.asarray(tree["right_children"], dtype=np.int64)
+            if any(tree["split_type"]):
+                raise ValueError("Categorical splits are not supported.")
+            if int(tree["tree_param"].get("size_leaf_vector", "1")) > 1:
+                raise ValueError("Vector leaves are not supported.")
+            n = len(left)
+            leaf = left == -1
+            own = np.arange(n) + offset
+            conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+            features.append(np.where(leaf, 0, tree["split_indices"]))
+            thresholds.append(np.where(leaf, np.float32(0), conditions)) # Leaves store their value in split_conditions
+            defaults.append(np.asarray(tree["default_left"], dtype=bool))
+            lefts.append(np.where(leaf, own, left + offset))
+            rights.append(np.where(leaf, own, right + offset))
+            values.append(np.where(leaf, conditions, np.float32(0)))
+            roots.append(offset)
+            depth = max(depth, _tree_depth(left, right))
+            offset += n
+
+        children = np.empty(2 * offset, dtype=np.intp)
+        children[0::2] = np.concatenate(lefts)
+        children[1::2] = np.concatenate(rights)
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float32),
+            default_left=np.concatenate(defaults),
+            children=children,
+            value=np.concatenate(values).astype(np.float32),
+            roots=np.asarray(roots, dtype=np.intp),
+            depth=depth,
+            base_margin=np.log(base_score / (1 - base_score)),
+            num_feature=num_feature,
+        )
+
+    @classmethod
+    def from_classifier(cls, classifier):
+        return cls.from_booster(classifier.get_booster())
+
+    def margin(self, X):
+        """Raw scores (log-odds) for a (rows, features) matrix in training column order."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.num_feature:
+            raise ValueError(f"Expected {self.num_feature} features, got {X.shape[1]}.")
+        has_missing = np.isnan(X).any()
+        if len(X) == 1:
+            return self._margin_row(X[0], has_missing)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            x = X[rows, self.feature[nodes]]
+            go_right = ~(x < self.threshold[nodes]) # NaN compares False, so missing values go right here...
+            if has_missing:
+                go_right &= ~(np.isnan(x) & self.default_left[nodes]) # ...unless the node's default is left
+            nodes = self.children[2 * nodes + go_right]
+        return self.value[nodes].sum(axis=1, dtype=np.float32) + self.base_margin
+
+    def _margin_row(self, row, has_missing):
+        x = row[self.feature]
+        go_left = x < self.threshold
+        if has_missing:
+            go_left |= np.isnan(x) & self.default_left
+        next_node = np.where(go_left, self.left, self.right)
+        nodes = self.roots
+        for _ in range(self.depth):
+            nodes = next_node[nodes]
+        return np.atleast_1d(self.value[nodes].sum(dtype=np.float32) + self.base_margin)
+
+    def predict_proba(self, X):
+        """(rows, 2) array of [P(down), P(up)], like `XGBClassifier.predict_proba`."""
+        prob_up = _sigmoid(self.margin(X))
+        return np.column_stack([1 - prob_up, prob_up])
+
+
+def _tree_depth(left, right):
+    depth, level = 0, [0]
+    while True:
+        level = [child for node in level for child in (left[node], right[node]) if child != -1]
+        if not level:
+            return depth
+        depth += 1
+
+
+def probe_rows(forest, rows=PARITY_PROBE_ROWS, seed=0):
+    """Rows that straddle the model's split thresholds (with some NaNs), exercising both branches of most nodes."""
+    rng = np.random.default_rng(seed)
+    X = np.zeros((rows, forest.num_feature), dtype=np.float32)
+    is_split = forest.left != np.arange(len(forest.feature))
+    for f in range(forest.num_feature):
+        cuts = forest.threshold[is_split & (forest.feature == f)]
+        if len(cuts):
+            X[:, f] = rng.choice(cuts, rows) * rng.uniform(0.98, 1.02, rows)
+    X[rng.random(X.shape) < 0.02] = np.nan
+    return X
+
+
+def check_parity(classifier, forest, X=None):
+    """Largest |probability difference| between `forest` and `classifier.predict_proba` on `X` (default: probe rows)."""
+    X = probe_rows(forest) if X is None else np.asarray(X, dtype=np.float32)
+    expected = classifier.predict_proba(X)[:, 1]
+    return float(np.abs(forest.predict_proba(X)[:, 1] - expected).max())
+
+
+def compile_classifier(classifier, tolerance=PARITY_TOLERANCE):
+    """The compiled forest for `classifier`, or None if it can't be compiled or disagrees with XGBoost."""
+    try:
+        forest = CompiledForest.from_classifier(classifier)
+        error = check_parity(classifier, forest)
+    except Exception as e:
+        print(f"⚠️ Compiled inference unavailable, using XGBoost: {e}")
+        return None
+    if error > tolerance:
+        print(f"⚠️ Compiled inference differs from XGBoost by {error:.2e}, using XGBoost.")
+        return None
+    return forest
+
+
+def benchmark(serving, iterations=2000):
+    """Single-row and small-batch latency of XGBoost vs the compiled forest for a ServingModel."""
+    import pandas as pd
+
+    forest = serving.compiled or CompiledForest.from_classifier(serving.classifier)
+    X = probe_rows(forest)
+    print(f"Parity: max |Δp| = {check_parity(serving.classifier, forest, X):.2e} over {len(X)} rows "
+          f"({len(forest.roots)} trees, depth {forest.depth})")
+    for batch in (1, 10, 100):
+        rows = X[:batch]
+        frame = pd.DataFrame(rows, columns=serving.features)
+        timings = {}
+        for name, fn in (("xgboost", lambda: serving.classifier.predict_proba(frame)), ("compiled", lambda: forest.predict_proba(rows))):
+            runs = max(10, iterations // batch)
+            start = time.perf_counter()
+            for _ in range(runs):
+                fn()
+            timings[name] = (time.perf_counter() - start) / runs * 1e6
+        print(f"batch {batch:>4}: xgboost {timings['xgboost']:>9.1f} µs   compiled {timings['compiled']:>8.1f} µs   "
+              f"({timings['xgboost'] / timings['compiled']:.0f}x)")
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.fast_inference
+    from .model_registry import registry
+
+    benchmark(registry.load_current())
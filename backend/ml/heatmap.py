@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+import numpy as np
+
+# --- Configuration ---
+REFRESH_INTERVAL = 60  # Seconds between background heatmap rebuilds
+
+INDEX_SYMBOLS = {
+    "NIFTY 50": [
+        "RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "ICICIBANK.NS", "INFY.NS", "HINDUNILVR.NS",
+        "BHARTIARTL.NS", "ITC.NS", "SBIN.NS", "LICI.NS", "HCLTECH.NS", "LT.NS",
+        "BAJFINANCE.NS", "KOTAKBANK.NS", "ADANIENT.NS", "ASIANPAINT.NS", "AXISBANK.NS",
+        "MARUTI.NS", "SUNPHARMA.NS", "WIPRO.NS", "TATAMOTORS.NS", "NTPC.NS", "ULTRACEMCO.NS",
+        "ADANIPORTS.NS", "BAJAJFINSV.NS", "POWERGRID.NS", "COALINDIA.NS", "NESTLEIND.NS",
+        "ONGC.NS", "TATASTEEL.NS", "JSWSTEEL.NS", "M&M.NS", "HDFCLIFE.NS", "SBILIFE.NS",
+        "GRASIM.NS", "HINDALCO.NS", "INDUSINDBK.NS", "TECHM.NS", "CIPLA.NS", "DRREDDY.NS",
+        "BRITANNIA.NS", "BAJAJ-AUTO.NS", "EICHERMOT.NS", "APOLLOHOSP.NS", "TITAN.NS",
+        "TATACONSUM.NS", "HEROMOTOCO.NS", "UPL.NS", "DIVISLAB.NS", "BPCL.NS"
+    ],
+    "NIFTY BANK": [
+        "HDFCBANK.NS", "ICICIBANK.NS", "SBIN.NS", "KOTAKBANK.NS", "AXISBANK.NS",
+        "INDUSINDBK.NS", "BANKBARODA.NS", "PNB.NS", "AUBANK.NS", "FEDERALBNK.NS",
+        "IDFCFIRSTB.NS", "BANDHANBNK.NS"
+    ]
+}
+
+
+def _shared_name(index):
+    return "heatmap-" + index.lower().replace(" ", "-")
+
+
+class HeatmapSnapshot:
+    """A pre-encoded heatmap payload plus the validators clients use to revalidate it."""
+
+    def __init__(self, tiles, body=None, last_modified=None):
+        self.tiles = tiles
+        self.body = json.dumps(tiles).encode() if body is None else body
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()}"'
+        # HTTP dates have second resolution
+        self.last_modified = last_modified or datetime.now(timezone.utc).replace(microsecond=0)
+
+    @classmethod
+    def from_shared(cls, snapshot):
+        """Rebuilds a snapshot another worker published, keeping its Last-Modified so validators match across workers."""
+        return cls(None, body=bytes(snapshot["body"]), last_modified=datetime.fromisoformat(snapshot.meta["lastModified"]))
+
+    @property
+    def last_modified_header(self):
+        return format_datetime(self.last_modified, usegmt=True)
+
+    def is_fresh_for(self, if_none_match=None, if_modified_since=None):
+        """True if the client's cached copy (per its conditional headers) is still current."""
+        if if_none_match:
+            return self.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if if_modified_since:
+            try:
+                return self.last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class HeatmapRefresher:
+    """
+    Rebuilds every `INDEX_SYMBOLS` heatmap in the background and serves the last snapshot.
+
+    `fetch_bars(index, symbols)` returns a `yf.download(..., group_by='ticker')` style frame
+    and `fetch_market_caps(symbols)` returns {symbol: {'marketCap': ...} or Exception}. Tiles
+    are only recomputed for symbols whose last bar or market cap changed, and a new snapshot
+    (with a new ETag) is only published when the payload actually differs.
+
+    With a `shared` SharedCache, only the host's elected refresher polls upstream and publishes
+    its snapshots; the other workers serve what it published.
+    """
+
+    def __init__(self, fetch_bars, fetch_market_caps, indexes=None, interval=REFRESH_INTERVAL, shared=None):
+        self.fetch_bars = fetch_bars
+        self.fetch_market_caps = fetch_market_caps
+        self.indexes = INDEX_SYMBOLS if indexes is None else indexes
+        self.interval = interval
+        self.shared = shared
+        self._snapshots = {}
+        self._adopted = {}  # index -> (shared generation, HeatmapSnapshot)
+        self._tiles = {}  # symbol -> (bar key, tile)
+        self._inflight = {}
+
+    def snapshot(self, index):
+        if self.shared is not None and not self.shared.is_leader:
+            published = self.shared.read(_shared_name(index))
+            if published is not None:
+                adopted = self._adopted.get(index)
+                if adopted is None or adopted[0] != published.generation:
+                    adopted = (published.generation, HeatmapSnapshot.from_shared(published))
+                    self._adopted[index] = adopted
+                return adopted[1]
+        return self._snapshots.get(index)
+
+    def _publish(self, index, snapshot):
+        self.shared.publish(_shared_name(index), {"body": np.frombuffer(snapshot.body, dtype=np.uint8)},
+                            meta={"lastModified": snapshot.last_modified.isoformat()})
+
+    async def _build(self, index):
+        symbols = self.indexes[index]
+        data, market_caps = await asyncio.gather(self.fetch_bars(index, symbols), self.fetch_market_caps(symbols))
+
+        tiles = []
+        for symbol in symbols:
+            try:
+                info = market_caps[symbol]
+                if isinstance(info, Exception): raise info
+                market_cap = info.get('marketCap', 0)
+
+                hist = data[symbol].dropna(subset=['Close'])
+                if hist.empty or len(hist) < 2 or not market_cap:
+                    continue
+
+                price = float(hist['Close'].iloc[-1])
+                prev_close = float(hist['Close'].iloc[-2])
+                bar_key = (hist.index[-1], price, prev_close, market_cap)
+                cached = self._tiles.get(symbol)
+                if cached is None or cached[0] != bar_key:
+                    change_percent = ((price - prev_close) / prev_close) * 100
+                    cached = (bar_key, {
+                        'x': symbol.replace('.NS', ''),
+                        'y': market_cap,
+                        'change': round(change_percent, 2)
+                    })
+                    self._tiles[symbol] = cached
+                tiles.append(cached[1])
+            except Exception as e:
+                print(f"⚠️ Could not fetch heatmap data for {symbol}: {e}")
+                continue
+
+        previous = self._snapshots.get(index)
+        if previous is None or previous.tiles != tiles:
+            self._snapshots[index] = HeatmapSnapshot(tiles)
+            if self.shared is not None and self.shared.is_leader:
+                await asyncio.to_thread(self._publish, index, self._snapshots[index])
+        return self._snapshots[index]
+
+    async def refresh(self, index):
+        """Rebuilds one index, sharing the rebuild with any concurrent caller."""
+        task = self._inflight.get(index)
+        if task is None:
+            task = asyncio.ensure_future(self._build(index))
+            self._inflight[index] = task
+            task.add_done_callback(lambda _: self._inflight.pop(index, None))
+        return await asyncio.shield(task)
+
+    async def run(self):
+        """Background loop: keeps every index snapshot fresh until cancelled (on the refresher worker only, if shared)."""
+        while True:
+            if self.shared is not None and not self.shared.lead():
+                await asyncio.sleep(self.interval)
+                continue
+            for index in self.indexes:
+                try:
+                    await self.refresh(index)
+                except Exception as e:
+                    print(f"⚠️ Heatmap refresh failed for {index}: {e}")
+            await asyncio.sleep(self.interval)
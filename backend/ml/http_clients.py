@@ -0,0 +1,85 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import httpx
+
+# --- Configuration ---
+USER_AGENT = "Mozilla/5.0"
+TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30)
+_MISSING = object()
+
+
+class HTTPClients:
+    """
+    One pooled `httpx.AsyncClient` per upstream (NewsAPI, Yahoo search, ...), created on first use.
+
+    Connections are kept alive between requests instead of a fresh TCP/TLS handshake per call.
+    `transport` is passed to every client, so tests and benchmarks can plug in `httpx.MockTransport`.
+    """
+
+    def __init__(self, transport=None, timeout=TIMEOUT, limits=LIMITS):
+        self.transport = transport
+        self.timeout = timeout
+        self.limits = limits
+        self._clients = {}
+
+    def get(self, name):
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                transport=self.transport, timeout=self.timeout, limits=self.limits,
+                headers={"User-Agent": USER_AGENT}, follow_redirects=True,
+            )
+            self._clients[name] = client
+        return client
+
+    async def aclose(self):
+        clients, self._clients = list(self._clients.values()), {}
+        await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+
+class TTLCache:
+    """Small LRU cache whose entries expire after `ttl` seconds; concurrent loads of one key are shared."""
+
+    def __init__(self, ttl, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # key -> (value, stored_at)
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(self, key, loader):
+        """Returns the cached value or awaits `loader()`, caching what it returns (exceptions aren't cached)."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: None if t.cancelled() or t.exception() else self.put(key, t.result()))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None}
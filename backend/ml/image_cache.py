@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+
+import httpx
+
+try:
+    from PIL import Image
+except ImportError: # Pillow is optional: without it images are cached and served at their original size
+    Image = None
+
+from .metrics import COALESCED_CALLS, UPSTREAM_CALLS, stage
+
+# --- Configuration ---
+BASE_DIR = Path(__file__).resolve().parent
+CACHE_DIR = BASE_DIR / "data" / "images"
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+FRESH_FOR = 24 * 60 * 60 # Seconds a cached URL is served before revalidating it with the publisher
+MAX_IMAGE_BYTES = 15 * 1024 * 1024
+MAX_UPSTREAM_FETCHES = 8
+INDEX_SAVE_DELAY = 5 # Seconds index changes are batched before `index.json` is rewritten
+THUMBNAIL_WIDTHS = (320, 480, 640, 960, 1280) # Requested widths snap up to one of these, bounding the variants per image
+DEFAULT_THUMBNAIL_WIDTH = 640 # News cards are ~320 CSS px wide; 640 covers 2x displays
+THUMBNAIL_QUALITY = 80
+RESIZABLE_TYPES = ("image/jpeg", "image/png", "image/webp") # GIFs would lose their animation, SVGs are already small
+
+
+class ImageFetchError(Exception):
+    """The image could not be fetched and no cached copy exists."""
+
+
+class CachedImage:
+    __slots__ = ("path", "content_type", "digest", "size")
+
+    def __init__(self, path, content_type, digest, size):
+        self.path = path
+        self.content_type = content_type
+        self.digest = digest
+        self.size = size
+
+
+def thumbnail_width(width):
+    """Smallest allowed width >= `width` (the largest one if it's bigger than all), or None for the original."""
+    if not width or width <= 0:
+        return None
+    return next((w for w in THUMBNAIL_WIDTHS if w >= width), THUMBNAIL_WIDTHS[-1])
+
+
+def make_thumbnail(data, width, quality=THUMBNAIL_QUALITY):
+    """JPEG bytes of `data` scaled down to `width`, or None if Pillow is missing or it's already that small."""
+    if Image is None:
+        return None
+    with Image.open(BytesIO(data)) as img:
+        if img.width <= width:
+            return None
+        img = img.convert("RGBA") if img.mode in ("P", "LA") else img
+        if img.mode == "RGBA": # JPEG has no alpha: flatten onto white
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[-1])
+            img = background
+        img = img.convert("RGB").resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+        out = BytesIO()
+        img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+class ImageCache:
+    """
+    Content-addressed disk cache for proxied news images, with thumbnails.
+
+    Bytes are stored once per SHA-256 under `root/blobs`, however many URLs point at them, and
+    evicted least-recently-used when the total passes `max_bytes`. `index.json` maps each URL
+    to its blob, content type and validators (changes are batched and written every
+    `save_delay` seconds); after `fresh_for` seconds a URL is revalidated
+    with If-None-Match / If-Modified-Since, so an unchanged image costs a 304, not a download.
+    If the publisher is down, the stale copy is served. Thumbnails are derived from the blob
+    (so shared by every URL with those bytes) on first request and cached like any other blob.
+    Evicting a blob also drops the URLs and thumbnails that point at it.
+
+    `get_client()` returns the pooled `httpx.AsyncClient`; at most `max_concurrent` upstream
+    fetches run at once and concurrent requests for one URL share a fetch.
+    """
+
+    def __init__(self, root=CACHE_DIR, get_client=None, max_bytes=MAX_CACHE_BYTES, fresh_for=FRESH_FOR,
+                 max_concurrent=MAX_UPSTREAM_FETCHES, save_delay=INDEX_SAVE_DELAY):
+        self.root = Path(root)
+        self.get_client = get_client or (lambda: httpx.AsyncClient(follow_redirects=True))
+        self.max_bytes = max_bytes
+        self.fresh_for = fresh_for
+        self.max_concurrent = max_concurrent
+        self.save_delay = save_delay
+        self._semaphore = None
+        self._save_task = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._urls = {} # url -> {"digest", "contentType", "etag", "lastModified", "validatedAt"}
+        self._derived = {} # original digest -> {str(width): thumbnail digest}
+        self._blobs = OrderedDict() # digest -> size, least recently used first
+        self._bytes = 0
+        self._inflight = {}
+        self.counts = dict.fromkeys(("hits", "revalidated", "fetched", "staleServed", "thumbnails", "evictions",
+                                     "bytesServed", "upstreamBytes"), 0)
+
+    # --- Storage ---
+    def _blob_path(self, digest):
+        return self.root / "blobs" / digest[:2] / digest
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with open(self.root / "index.json", "r") as f:
+                    index = json.load(f)
+                self._urls, self._derived = index.get("urls", {}), index.get("derived", {})
+            except (FileNotFoundError, ValueError):
+                self._urls, self._derived = {}, {}
+            blobs = []
+            for path in (self.root / "blobs").glob("*/*"):
+                stat = path.stat()
+                blobs.append((stat.st_mtime, path.name, stat.st_size))
+            for _, digest, size in sorted(blobs): # Oldest access first, as recorded by the mtime touched on hits
+                self._blobs[digest] = size
+            self._bytes = sum(self._blobs.values())
+            self._loaded = True
+
+    def save(self):
+        """Writes `index.json` now (pending changes are otherwise saved after `save_delay`)."""
+        if not self._loaded:
+            return
+        with self._lock:
+            body = json.dumps({"urls": self._urls, "derived": self._derived})
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f"index.json.{os.getpid()}.tmp"
+        tmp.write_text(body)
+        os.replace(tmp, self.root / "index.json")
+
+    async def _save_later(self):
+        await asyncio.sleep(self.save_delay)
+        self._save_task = None
+        await asyncio.to_thread(self.save)
+
+    async def _changed(self):
+        """Evicts down to `max_bytes` and schedules one index save for every change in the next `save_delay`."""
+        if self._bytes > self.max_bytes:
+            await asyncio.to_thread(self._evict)
+        if self._save_task is None:
+            self._save_task = asyncio.ensure_future(self._save_later())
+
+    def _touch(self, digest):
+        with self._lock:
+            if digest not in self._blobs:
+                return False
+            self._blobs.move_to_end(digest)
+        try:
+            os.utime(self._blob_path(digest)) # Persists the LRU order across restarts
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _put_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        with self._lock:
+            known = digest in self._blobs
+        if not known:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{digest}.{os.getpid()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            with self._lock:
+                self._blobs[digest] = len(data)
+                self._bytes += len(data)
+        self._touch(digest)
+        return digest
+
+    def _evict(self):
+        """Drops least-recently-used blobs until the cache fits in `max_bytes`, with the index entries using them."""
+        removed = set()
+        with self._lock:
+            while self._bytes > self.max_bytes and len(self._blobs) > 1:
+                digest, size = self._blobs.popitem(last=False)
+                self._bytes -= size
+                removed.add(digest)
+            if removed:
+                self._urls = {url: entry for url, entry in self._urls.items() if entry["digest"] not in removed}
+                derived = {}
+                for digest, widths in self._derived.items():
+                    widths = {w: d for w, d in widths.items() if d not in removed}
+                    if digest not in removed and widths:
+                        derived[digest] = widths
+                self._derived = derived
+        for digest in removed:
+            self._blob_path(digest).unlink(missing_ok=True)
+        self.counts["evictions"] += len(removed)
+
+    # --- Upstream ---
+    async def _download(self, url, entry):
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("lastModified"):
+                headers["If-Modified-Since"] = entry["lastModified"]
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        async with self._semaphore:
+            with stage("upstream"):
+                async with self.get_client().stream("GET", url, headers=headers) as response:
+                    if response.status_code == 304:
+                        return response, None
+                    response.raise_for_status()
+                    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                    if not content_type.startswith("image/"):
+                        raise ImageFetchError(f"Not an image ({content_type or 'no content type'}).")
+                    chunks, size = [], 0
+                    async for chunk in response.aiter_bytes():
+                        size += len(chunk)
+                        if size > MAX_IMAGE_BYTES:
+                            raise ImageFetchError("Image too large.")
+                        chunks.append(chunk)
+        return response, b"".join(chunks)
+
+    async def _refresh(self, url, entry):
+        """Fetches or revalidates `url` and returns its index entry."""
+        try:
+            response, data = await self._download(url, entry)
+        except (httpx.HTTPError, ImageFetchError) as e:
+            UPSTREAM_CALLS.inc(provider="images", operation="fetch", outcome="error")
+            if entry is not None:
+                self.counts["staleServed"] += 1
+                return entry
+            raise ImageFetchError(str(e)) from e
+
+        if data is None:
+            UPSTREAM_CALLS.inc(provider="images", operation="revalidate", outcome="not_modified")
+            self.counts["revalidated"] += 1
+            entry = dict(entry, validatedAt=time.time())
+        else:
+            UPSTREAM_CALLS.inc(provider="images", operation="fetch", outcome="ok")
+            self.counts["fetched"] += 1
+            self.counts["upstreamBytes"] += len(data)
+            digest = await asyncio.to_thread(self._put_blob, data)
+            entry = {
+                "digest": digest,
+                "contentType": response.headers.get("Content-Type", "").split(";")[0].strip().lower(),
+                "etag": response.headers.get("ETag"),
+                "lastModified": response.headers.get("Last-Modified"),
+                "validatedAt": time.time(),
+            }
+        with self._lock:
+            self._urls[url] = entry
+        await self._changed()
+        return entry
+
+    async def _shared(self, key, make):
+        """Awaits `make()`, sharing one call between concurrent requests for the same `key`."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(make())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            COALESCED_CALLS.inc(provider="images")
+        return await asyncio.shield(task)
+
+    # --- Thumbnails ---
+    def _build_thumbnail(self, digest, width):
+        thumbnail = make_thumbnail(self._blob_path(digest).read_bytes(), width)
+        thumb_digest = self._put_blob(thumbnail) if thumbnail is not None else digest
+        with self._lock:
+            self._derived.setdefault(digest, {})[str(width)] = thumb_digest
+        return thumb_digest
+
+    async def _thumbnail(self, entry, width):
+        digest = entry["digest"]
+        thumb_digest = self._derived.get(digest, {}).get(str(width))
+        if thumb_digest is not None and self._touch(thumb_digest):
+            return thumb_digest
+        try:
+            thumb_digest = await self._shared((digest, width), lambda: asyncio.to_thread(self._build_thumbnail, digest, width))
+        except Exception as e:
+            print(f"⚠️ Could not resize image {digest[:12]}: {e}")
+            return digest
+        await self._changed()
+        self.counts["thumbnails"] += thumb_digest != digest
+        return thumb_digest
+
+    # --- Public API ---
+    async def get(self, url, width=None):
+        """The cached image for `url`, resized to a thumbnail when `width` is given. Raises ImageFetchError."""
+        if not self._loaded:
+            await asyncio.to_thread(self._load)
+        entry = self._urls.get(url)
+        usable = entry is not None and self._touch(entry["digest"])
+        if usable and time.time() - entry["validatedAt"] < self.fresh_for:
+            self.counts["hits"] += 1
+        else:
+            entry = await self._shared(url, lambda: self._refresh(url, entry if usable else None))
+
+        digest, content_type = entry["digest"], entry["contentType"]
+        width = thumbnail_width(width)
+        if width is not None and Image is not None and content_type in RESIZABLE_TYPES:
+            thumb_digest = await self._thumbnail(entry, width)
+            if thumb_digest != digest:
+                digest, content_type = thumb_digest, "image/jpeg"
+        size = self._blobs.get(digest, 0)
+        return CachedImage(self._blob_path(digest), content_type, digest, size)
+
+    def stats(self):
+        return dict(self.counts, urls=len(self._urls), blobs=len(self._blobs), bytes=self._bytes)
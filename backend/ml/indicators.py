@@ -0,0 +1,238 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from .model import FEATURE_NAMES, RSI_PERIOD, EMA_SHORT, EMA_LONG
+
+# --- Indicator parameters (pandas_ta defaults used by create_features) ---
+MACD_FAST, MACD_SLOW = 12, 26
+BB_LENGTH, BB_STD = 20, 2.0
+ATR_LENGTH = 14
+STOCH_K, STOCH_D, STOCH_SMOOTH_K = 14, 3, 3
+_EPSILON = 2.220446049250313e-16  # pandas_ta's non_zero_range nudge
+
+
+class _RMA:
+    """Wilder moving average, matching pandas `ewm(alpha=1/n, min_periods=n, adjust=True)`."""
+
+    def __init__(self, length):
+        self.decay = 1.0 - 1.0 / length
+        self.length = length
+        self.numerator = 0.0
+        self.denominator = 0.0
+        self.count = 0
+
+    def update(self, x):
+        self.numerator = x + self.decay * self.numerator
+        self.denominator = 1.0 + self.decay * self.denominator
+        self.count += 1
+        return self.value
+
+    @property
+    def value(self):
+        return self.numerator / self.denominator if self.count >= self.length else math.nan
+
+
+class _EMA:
+    """SMA-seeded exponential moving average, matching `pandas_ta.ema` (adjust=False)."""
+
+    def __init__(self, length):
+        self.alpha = 2.0 / (length + 1)
+        self.length = length
+        self.seed_sum = 0.0
+        self.count = 0
+        self.value = math.nan
+
+    def update(self, x):
+        self.count += 1
+        if self.count < self.length:
+            self.seed_sum += x
+        elif self.count == self.length:
+            self.value = (self.seed_sum + x) / self.length
+        else:
+            self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+
+class _SMA:
+    """Simple moving average over a ring buffer."""
+
+    def __init__(self, length):
+        self.window = deque(maxlen=length)
+
+    def update(self, x):
+        self.window.append(x)
+        return self.value
+
+    @property
+    def value(self):
+        if len(self.window) < self.window.maxlen:
+            return math.nan
+        return sum(self.window) / len(self.window)
+
+    def copy(self):
+        clone = _SMA(self.window.maxlen)
+        clone.window.extend(self.window)
+        return clone
+
+
+class IndicatorState:
+    """
+    Running state for every indicator in `create_features`.
+
+    Each `update` consumes one daily bar in O(1) and returns the feature values for that bar
+    in `FEATURE_NAMES` order (NaN while an indicator is still warming up).
+    """
+
+    def __init__(self):
+        self.first_date = None
+        self.last_date = None
+        self.last_close = None
+        self.bar_count = 0
+        # Momentum
+        self.rsi_gain = _RMA(RSI_PERIOD)
+        self.rsi_loss = _RMA(RSI_PERIOD)
+        self.ema_fast = _EMA(MACD_FAST)
+        self.ema_slow = _EMA(MACD_SLOW)
+        self.stoch_high = deque(maxlen=STOCH_K)
+        self.stoch_low = deque(maxlen=STOCH_K)
+        self.stoch_k = _SMA(STOCH_SMOOTH_K)
+        self.stoch_d = _SMA(STOCH_D)
+        # Volatility
+        self.bb_window = deque(maxlen=BB_LENGTH)
+        self.atr = _RMA(ATR_LENGTH)
+        # Trend
+        self.ema_short = _EMA(EMA_SHORT)
+        self.ema_long = _EMA(EMA_LONG)
+        # Volume
+        self.obv = 0.0
+
+    def update(self, date, high, low, close, volume):
+        prev_close = self.last_close
+        self.bar_count += 1
+        if self.first_date is None:
+            self.first_date = date
+
+        # --- Momentum Indicators ---
+        rsi = math.nan
+        if prev_close is not None:
+            change = close - prev_close
+            gain = self.rsi_gain.update(max(change, 0.0))
+            loss = self.rsi_loss.update(max(-change, 0.0))
+            if not math.isnan(gain) and gain + loss > 0:
+                rsi = 100.0 * gain / (gain + loss)
+        macd = self.ema_fast.update(close) - self.ema_slow.update(close)
+
+        self.stoch_high.append(high)
+        self.stoch_low.append(low)
+        stoch_k = stoch_d = math.nan
+        if len(self.stoch_high) == STOCH_K:
+            lowest, highest = min(self.stoch_low), max(self.stoch_high)
+            span = (highest - lowest) or _EPSILON
+            stoch_k = self.stoch_k.update(100.0 * (close - lowest) / span)
+            if not math.isnan(stoch_k):
+                stoch_d = self.stoch_d.update(stoch_k)
+
+        # --- Volatility Indicators ---
+        self.bb_window.append(close)
+        bbl = bbm = bbu = math.nan
+        if len(self.bb_window) == BB_LENGTH:
+            bbm = sum(self.bb_window) / BB_LENGTH
+            std = math.sqrt(sum((x - bbm) ** 2 for x in self.bb_window) / BB_LENGTH)
+            bbl, bbu = bbm - BB_STD * std, bbm + BB_STD * std
+
+        atr = math.nan
+        if prev_close is not None:
+            true_range = max(high - low, abs(high - prev_close), abs(prev_close - low))
+            atr = self.atr.update(true_range)
+
+        # --- Trend Indicators ---
+        ema_short = self.ema_short.update(close)
+        ema_long = self.ema_long.update(close)
+
+        # --- Volume Indicators ---
+        if prev_close is None or close > prev_close:
+            self.obv += volume
+        elif close < prev_close:
+            self.obv -= volume
+
+        self.last_date = date
+        self.last_close = close
+        return (rsi, ema_short, ema_long, macd, bbl, bbm, bbu, atr, stoch_k, stoch_d, self.obv)
+
+    def copy(self):
+        """Cheap independent copy (a few small buffers), used to preview an unsettled bar."""
+        clone = IndicatorState.__new__(IndicatorState)
+        for name, value in vars(self).items():
+            if isinstance(value, (deque, _SMA)):
+                value = value.copy()
+            elif isinstance(value, (_RMA, _EMA)):
+                value = _copy_scalar_state(value)
+            setattr(clone, name, value)
+        return clone
+
+
+def _copy_scalar_state(indicator):
+    clone = indicator.__class__.__new__(indicator.__class__)
+    clone.__dict__.update(indicator.__dict__)
+    return clone
+
+
+class IndicatorEngine:
+    """
+    Keeps an `IndicatorState` per ticker so each request only folds in the bars it hasn't seen.
+
+    The state is only advanced through settled bars; the newest bar (which may still be an
+    in-progress session) is applied to a throwaway copy, so a revised bar never corrupts it.
+    If a previously seen close changes (split/dividend re-adjustment) the state is rebuilt. It is
+    also rebuilt when the window's first bar moves on (once a session): `create_features` starts
+    every indicator at the window's first bar, and OBV and the EMA seeds never forget it.
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def latest_row(self, ticker, df):
+        """Returns `(date, values)` for the last bar of `df`, values in `FEATURE_NAMES` order."""
+        if df.empty:
+            raise ValueError(f"Could not fetch historical data for '{ticker}'.")
+        highs, lows = df["High"].to_numpy(), df["Low"].to_numpy()
+        closes, volumes = df["Close"].to_numpy(), df["Volume"].to_numpy()
+        dates = df.index
+
+        with self._lock:
+            state = self._states.get(ticker)
+            start = 0
+            if state is not None:
+                pos = dates.searchsorted(state.last_date)
+                if (pos < len(dates) - 1 and dates[pos] == state.last_date and closes[pos] == state.last_close
+                        and dates[0] == state.first_date):
+                    start = pos + 1
+                else:
+                    state = None
+            if state is None:
+                state = IndicatorState()
+            for i in range(start, len(dates) - 1):
+                state.update(dates[i], highs[i], lows[i], closes[i], volumes[i])
+            self._states[ticker] = state
+            preview = state.copy()
+
+        row = preview.update(dates[-1], highs[-1], lows[-1], closes[-1], volumes[-1])
+        missing = [name for name, value in zip(FEATURE_NAMES, row) if math.isnan(value)]
+        if missing:
+            raise ValueError(f"Could not calculate all required indicators. Missing: {missing}")
+        return dates[-1], row
+
+    def latest_features(self, ticker, df):
+        """Returns a one-row DataFrame of `FEATURE_NAMES` for the last bar of `df`."""
+        date, row = self.latest_row(ticker, df)
+        return pd.DataFrame(np.array([row]), columns=FEATURE_NAMES, index=pd.DatetimeIndex([date], name="Date"))
+
+
+# Shared engine used by the prediction endpoints
+engine = IndicatorEngine()
+
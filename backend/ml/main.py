@@ -1,38 +1,101 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 import yfinance as yf
 import pandas_ta as ta
-import requests
-from .model import load_model, RSI_PERIOD, EMA_SHORT, EMA_LONG
+import httpx
+from .model import load_model, FEATURE_NAMES
+from .model_registry import ModelServer, registry as model_registry
+from .ohlcv_store import store as ohlcv_store
+from .indicators import engine as indicator_engine
+from .market_fetch import fetcher
+from .metadata_cache import metadata_cache
+from .heatmap import INDEX_SYMBOLS, HeatmapRefresher
+from .screener_index import screener_index
+from .http_clients import HTTPClients, TTLCache
+from .symbol_search import PrefixSearchCache, SymbolAutocomplete
+from .image_cache import DEFAULT_THUMBNAIL_WIDTH, ImageCache, ImageFetchError
+from .briefing import BriefingEngine, normalize_symbol
+from .price_stream import PriceStreamHub, SharedQuoteFeed, SimulatedPriceFeed, quote_from_history
+from .shared_cache import cache as shared_cache
+from .portfolio_service import PortfolioService, FirestorePortfolioRepository, InMemoryPortfolioRepository, TooMuchContention
+from . import metrics
+from .metrics import stage
+from .responses import negotiated_response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from typing import List, Optional
 import os
 from dotenv import load_dotenv
 from datetime import datetime
 import json
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from datetime import date, timedelta
+import asyncio
+import time
+from contextlib import asynccontextmanager
 
 # --- NEW: Firebase Admin Imports ---
 import firebase_admin
 from firebase_admin import credentials, firestore, auth
 from fastapi.security import OAuth2PasswordBearer
 
-app = FastAPI(title="StockWise.AI ML Backend")
 load_dotenv()
+db = None
+model_server = ModelServer(model_registry) # Hot-swaps the serving model when a new version is promoted
+model_status = {"state": "loading", "error": None}
 
 # --- NEW: Initialize Firebase Admin SDK ---
-try:
-    cred_path = Path(__file__).resolve().parent / "serviceAccountKey.json"
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
-    db = firestore.client()
-    print("✅ Firebase Admin SDK initialized successfully.")
-except Exception as e:
-    print(f"❌ ERROR: Firebase Admin SDK initialization failed. Make sure serviceAccountKey.json is in the /ml folder. {e}")
-    db = None
+def init_firebase():
+    global db
+    try:
+        cred_path = Path(__file__).resolve().parent / "serviceAccountKey.json"
+        if not firebase_admin._apps: # The app may already exist if the lifespan runs again (e.g. in tests)
+            firebase_admin.initialize_app(credentials.Certificate(cred_path))
+        db = firestore.client()
+        if portfolio_service.repository is None:
+            portfolio_service.repository = FirestorePortfolioRepository(db)
+        print("✅ Firebase Admin SDK initialized successfully.")
+    except Exception as e:
+        print(f"❌ ERROR: Firebase Admin SDK initialization failed. Make sure serviceAccountKey.json is in the /ml folder. {e}")
+        db = None
+
+async def load_model_in_background():
+    """Loads the model (training one first if there is none) without holding up startup."""
+    if model_registry.current_version() is None:
+        model_status["state"] = "training"
+    try:
+        model_server.current = await asyncio.to_thread(load_model)
+        model_status.update(state="ready", error=None)
+    except Exception as e:
+        print(f"❌ ERROR: Model loading failed: {e}")
+        model_status.update(state="failed", error=str(e))
+
+# --- App lifecycle: the server accepts requests right away; slow work runs in background tasks ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(init_firebase)
+    metadata_cache.seed_from_screener()
+    await asyncio.to_thread(symbol_index.data) # Build the autocomplete index before the first keystroke
+    background_tasks = [
+        asyncio.create_task(load_model_in_background()),
+        asyncio.create_task(model_server.watch()),
+        asyncio.create_task(heatmap_refresher.run()),
+        asyncio.create_task(price_hub.run()),
+        asyncio.create_task(briefing_engine.run()),
+        # One worker per host is elected to poll upstream and publish to the shared cache; the others read it
+        asyncio.create_task(quote_feed.run()),
+        asyncio.create_task(screener_index.run()),
+    ]
+    yield
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.to_thread(image_cache.save)
+    await http_clients.aclose()
+    fetcher.shutdown()
+
+app = FastAPI(title="StockWise.AI ML Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,7 +103,38 @@ app.add_middleware(
     allow_credentials=True, allow_methods=["*"], allow_headers=["*"],
 )
 
-model = load_model()
+# --- Request metrics: per-route latency, stage breakdown (Server-Timing) and opt-in profiling ---
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    stages = metrics.begin_request()
+    profiler = None
+    if metrics.PROFILING_ENABLED and (request.headers.get("x-profile") == "1" or request.query_params.get("profile") == "1"):
+        profiler = metrics.SamplingProfiler().start()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        duration = time.perf_counter() - start
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        metrics.REQUEST_LATENCY.observe(duration, method=request.method, route=route_path, status=status)
+        if profiler is not None:
+            # Joining the sampler thread waits up to one interval; keep that off the event loop
+            profile_id = metrics.profiles.add(route_path, duration, await asyncio.to_thread(profiler.stop))
+    response.headers["Server-Timing"] = metrics.server_timing(stages, duration)
+    if profiler is not None:
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
+def require_model():
+    """Returns the serving model, or a 503 while it is still loading or training."""
+    serving_model = model_server.current
+    if serving_model is None:
+        detail = f"Prediction model is not ready yet ({model_status['state']}). Please retry shortly."
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "5"})
+    return serving_model
 
 # --- Pydantic Models ---
 class StockData(BaseModel): ticker: str
@@ -55,7 +149,8 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     if not db: raise HTTPException(status_code=500, detail="Firebase is not initialized on the server.")
     try:
-        decoded_token = auth.verify_id_token(token)
+        with stage("auth"):
+            decoded_token = auth.verify_id_token(token)
         return decoded_token
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid authentication credentials: {e}")
@@ -65,194 +160,152 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
 class StockData(BaseModel): ticker: str
 class Tickers(BaseModel): tickers: List[str]
 class TradeOrder(BaseModel): symbol: str; quantity: int; price: float
+class Order(BaseModel): side: str; symbol: str; quantity: int; price: float
+class OrderBatch(BaseModel):
+    orders: List[Order]
+    batchId: Optional[str] = None # Client-chosen id: retrying with the same id never applies the orders twice
 class BriefingRequest(BaseModel): # <-- NEW: Model for the briefing request
     watchlist: List[str]
 
 # ... (keep all your existing code, including Firebase Admin setup, auth, other endpoints)
 
-# --- ADD THIS NEW ENDPOINT FOR THE DAILY BRIEFING ---
-@app.post("/daily-briefing")
-async def get_daily_briefing(request: BriefingRequest, current_user: dict = Depends(get_current_user)):
-    user_id = current_user['uid']
-    watchlist = request.watchlist
-    briefing_items = []
+# --- Blocking market-data helpers (run through the shared fetch layer) ---
+def fetch_ticker_info(symbol: str):
+    return yf.Ticker(symbol).info
+
+async def get_ticker_metadata(symbols, fields):
+    """Returns {symbol: {field: value} or Exception}, calling `.info` only for cache misses."""
+    results = {symbol: metadata_cache.lookup(symbol, fields) for symbol in dict.fromkeys(symbols)}
+    missing = [symbol for symbol, cached in results.items() if cached is None]
+    fetched = await fetcher.fetch_many("yfinance", "info", missing, fetch_ticker_info)
+    infos = {symbol: info for symbol, info in fetched.items() if not isinstance(info, Exception)}
+    if infos:
+        # One SQLite transaction for the whole batch, off the event loop
+        await asyncio.to_thread(metadata_cache.put_many, infos)
+    for symbol, info in fetched.items():
+        if not isinstance(info, Exception):
+            info = {field: info[field] for field in fields if info.get(field) is not None}
+        results[symbol] = info
+    return results
 
-    if not watchlist:
-        return {"items": []}
+def fetch_recent_history(symbol: str):
+    return yf.Ticker(symbol).history(period="5d", auto_adjust=True)
 
-    print(f"Generating daily briefing for user {user_id}...")
+def fetch_earnings_date(symbol: str):
+    """Next earnings date from `.calendar` (a DataFrame in older yfinance, a dict in newer), or None."""
+    calendar = yf.Ticker(symbol).calendar
+    if calendar is not None and isinstance(calendar, pd.DataFrame) and not calendar.empty:
+        return calendar.iloc[0,0]
+    if isinstance(calendar, dict) and calendar.get('Earnings Date'):
+        return calendar['Earnings Date'][0]
+    return None
 
-    for symbol in watchlist:
-        try:
-            stock = yf.Ticker(symbol)
-            
-            # 1. Check for upcoming earnings
-            calendar = stock.calendar
-            if calendar is not None and isinstance(calendar, pd.DataFrame) and not calendar.empty:
-                earnings_date = calendar.iloc[0,0]
-                if pd.to_datetime(earnings_date).date() > datetime.now().date() and (pd.to_datetime(earnings_date).date() - datetime.now().date()).days <= 7:
-                    briefing_items.append(f"Upcoming Event for {symbol.replace('.NS','')}: Earnings scheduled for {pd.to_datetime(earnings_date).strftime('%B %d, %Y')}.")
-
-            # 2. Check for unusual volume
-            hist = stock.history(period="1mo")
-            if not hist.empty and len(hist) > 2:
-                avg_volume = hist['Volume'].iloc[-21:-1].mean()
-                latest_volume = hist['Volume'].iloc[-1]
-                if latest_volume > avg_volume * 2:
-                    briefing_items.append(f"Unusual Activity in {symbol.replace('.NS','')}: Today's trading volume is significantly higher than average.")
+async def load_briefing_earnings(symbols):
+    return await fetcher.fetch_many("yfinance", "calendar", symbols, fetch_earnings_date)
 
-        except Exception as e:
-            print(f"⚠️ Could not fetch briefing data for {symbol}: {e}")
-            continue
+async def load_briefing_histories(symbols):
+    return await fetcher.fetch_many("ohlcv_store", "history_1mo", symbols, lambda symbol: ohlcv_store.get_history(symbol, period="1mo"))
+
+def list_watchlist_symbols():
+    """Every symbol on any user's Firestore watchlist (`users/{uid}/watchlist` docs)."""
+    if not db:
+        return set()
+    with stage("firestore"):
+        docs = db.collection_group("watchlist").select(["ticker"]).stream()
+        return {normalize_symbol(doc.get("ticker")) for doc in docs if doc.get("ticker")}
+
+# Signals are computed per symbol (earnings daily, volume every sweep) and shared by every user's briefing
+briefing_engine = BriefingEngine(load_briefing_earnings, load_briefing_histories, list_watchlist_symbols, shared=shared_cache)
 
-    return {"items": briefing_items}
+# --- ADD THIS NEW ENDPOINT FOR THE DAILY BRIEFING ---
+@app.post("/daily-briefing")
+async def get_daily_briefing(request: BriefingRequest, current_user: dict = Depends(get_current_user)):
+    if not request.watchlist:
+        return {"items": []}
+    return {"items": await briefing_engine.briefing(request.watchlist)}
 
 
 # (The rest of your endpoints remain unchanged)
 # ...
 
 # --- NEW: Portfolio Management Endpoints ---
-@app.get("/portfolio")
-async def get_portfolio(current_user: dict = Depends(get_current_user)):
-    user_id = current_user['uid']
-    portfolio_ref = db.collection('portfolios').document(user_id)
-    portfolio_doc = portfolio_ref.get()
-
-    if not portfolio_doc.exists:
-        print(f"Creating new portfolio for user {user_id}")
-        portfolio_data = {'cashBalance': 1000000, 'holdings': {}} # Start with ₹10 Lakh
-        portfolio_ref.set(portfolio_data)
-        return portfolio_data
-    return portfolio_doc.to_dict()
+async def load_portfolio_quotes(symbols):
+    return await get_ticker_metadata(symbols, ['currentPrice', 'sector'])
 
-@app.post("/portfolio/buy")
-def buy_stock(order: TradeOrder, current_user: dict = Depends(get_current_user)):
-    user_id = current_user['uid']
-    portfolio_ref = db.collection('portfolios').document(user_id)
-    
-    @firestore.transactional
-    def update_in_transaction(transaction, portfolio_ref, order):
-        snapshot = portfolio_ref.get(transaction=transaction)
-        if not snapshot.exists: portfolio_ref.set({'cashBalance': 1000000, 'holdings': {}}, transaction=transaction); snapshot = portfolio_ref.get(transaction=transaction)
+def compute_rsi(symbol):
+    hist = ohlcv_store.get_history(symbol, period="3mo")
+    with stage("indicators"):
+        return float(ta.rsi(hist['Close'], length=14).iloc[-1])
 
-        portfolio_data = snapshot.to_dict()
-        cost = order.quantity * order.price
+async def load_portfolio_rsi(symbols):
+    return await fetcher.fetch_many("ohlcv_store", "rsi_14", symbols, compute_rsi)
 
-        if portfolio_data.get('cashBalance', 0) < cost:
-            raise ValueError("Insufficient funds.")
+# PORTFOLIO_STORE=memory keeps portfolios in process (offline runs); otherwise Firestore once it's initialized
+portfolio_service = PortfolioService(
+    InMemoryPortfolioRepository() if os.getenv("PORTFOLIO_STORE") == "memory" else None,
+    load_portfolio_quotes, load_portfolio_rsi, shared=shared_cache,
+)
 
-        new_cash = portfolio_data['cashBalance'] - cost
-        holdings = portfolio_data.get('holdings', {})
-        
-        if order.symbol in holdings:
-            old_qty = holdings[order.symbol]['quantity']
-            old_avg = holdings[order.symbol]['averagePrice']
-            new_qty = old_qty + order.quantity
-            new_avg = ((old_qty * old_avg) + cost) / new_qty
-            holdings[order.symbol].update({'quantity': new_qty, 'averagePrice': new_avg})
-        else:
-            holdings[order.symbol] = {'quantity': order.quantity, 'averagePrice': order.price}
-        
-        transaction.update(portfolio_ref, {'cashBalance': new_cash, 'holdings': holdings})
-        return new_cash
+@app.get("/portfolio")
+def get_portfolio(current_user: dict = Depends(get_current_user)):
+    return portfolio_service.get_portfolio(current_user['uid'])
 
+@app.post("/portfolio/buy")
+def buy_stock(order: TradeOrder, current_user: dict = Depends(get_current_user)):
     try:
-        transaction = db.transaction()
-        new_cash_balance = update_in_transaction(transaction, portfolio_ref, order)
+        new_cash_balance = portfolio_service.buy(current_user['uid'], order.symbol, order.quantity, order.price)
         return {"message": "Purchase successful", "newCashBalance": new_cash_balance}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except TooMuchContention as e:
+        raise HTTPException(status_code=409, detail=f"Portfolio is busy, please retry: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
 
 
 @app.post("/portfolio/sell")
 def sell_stock(order: TradeOrder, current_user: dict = Depends(get_current_user)):
-    user_id = current_user['uid']
-    portfolio_ref = db.collection('portfolios').document(user_id)
-    
-    @firestore.transactional
-    def update_in_transaction(transaction, portfolio_ref, order):
-        snapshot = portfolio_ref.get(transaction=transaction)
-        if not snapshot.exists: raise ValueError("Portfolio not found.")
-        
-        portfolio_data = snapshot.to_dict()
-        holdings = portfolio_data.get('holdings', {})
-
-        if order.symbol not in holdings or holdings[order.symbol]['quantity'] < order.quantity:
-            raise ValueError("Not enough shares to sell.")
-
-        revenue = order.quantity * order.price
-        new_cash = portfolio_data['cashBalance'] + revenue
-        
-        holdings[order.symbol]['quantity'] -= order.quantity
-        if holdings[order.symbol]['quantity'] == 0:
-            del holdings[order.symbol]
-
-        transaction.update(portfolio_ref, {'cashBalance': new_cash, 'holdings': holdings})
-        return new_cash
-        
     try:
-        transaction = db.transaction()
-        new_cash_balance = update_in_transaction(transaction, portfolio_ref, order)
+        new_cash_balance = portfolio_service.sell(current_user['uid'], order.symbol, order.quantity, order.price)
         return {"message": "Sale successful", "newCashBalance": new_cash_balance}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except TooMuchContention as e:
+        raise HTTPException(status_code=409, detail=f"Portfolio is busy, please retry: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
-    
-    # ... (keep all your existing imports and code from the top)
+
+@app.post("/portfolio/orders")
+def place_orders(batch: OrderBatch, current_user: dict = Depends(get_current_user)):
+    """Applies a list of buys and sells atomically (all or none) in one transaction, e.g. a rebalance."""
+    try:
+        portfolio, entry, applied = portfolio_service.place_orders(
+            current_user['uid'], [order.model_dump() for order in batch.orders], batch.batchId)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TooMuchContention as e:
+        raise HTTPException(status_code=409, detail=f"Portfolio is busy, please retry: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {e}")
+    return {
+        "message": "Orders executed" if applied else "Orders already executed",
+        "batchId": entry['batchId'],
+        "seq": entry['seq'],
+        "newCashBalance": portfolio['cashBalance'],
+        "holdings": {symbol: portfolio['holdings'].get(symbol) for symbol in dict.fromkeys(entry['symbols'])},
+    }
+
+@app.get("/portfolio/ledger")
+def get_portfolio_ledger(limit: int = 50, current_user: dict = Depends(get_current_user)):
+    """The user's most recent order batches, newest first."""
+    return portfolio_service.ledger(current_user['uid'], max(1, min(limit, 500)))
 
 # --- ADD THIS NEW ENDPOINT FOR PORTFOLIO ANALYSIS ---
 @app.get("/portfolio/insights")
 async def get_portfolio_insights(current_user: dict = Depends(get_current_user)):
-    user_id = current_user['uid']
-    portfolio_ref = db.collection('portfolios').document(user_id)
-    portfolio_doc = portfolio_ref.get()
-
-    if not portfolio_doc.exists or not portfolio_doc.to_dict().get('holdings'):
-        return {"insights": []} # Return empty if no portfolio or holdings
-
-    portfolio_data = portfolio_doc.to_dict()
-    holdings = portfolio_data.get('holdings', {})
-    
-    insights = []
-    sector_concentration = {}
-    total_portfolio_value = 0
-
-    # First pass: Get info and calculate total value for concentration analysis
-    for symbol, holding_data in holdings.items():
-        try:
-            stock_info = yf.Ticker(symbol).info
-            current_price = stock_info.get('currentPrice', holding_data['averagePrice'])
-            holding_value = holding_data['quantity'] * current_price
-            sector = stock_info.get('sector', 'Other')
-            
-            total_portfolio_value += holding_value
-            sector_concentration[sector] = sector_concentration.get(sector, 0) + holding_value
-        except Exception:
-            continue
-    
-    # Generate Sector Concentration Insight
-    if total_portfolio_value > 0:
-        for sector, value in sector_concentration.items():
-            concentration = (value / total_portfolio_value) * 100
-            if concentration > 40: # If more than 40% is in one sector
-                insights.append(f"High concentration risk: {concentration:.0f}% of your portfolio is in the {sector} sector.")
-
-    # Second pass: Generate individual stock insights
-    for symbol, holding_data in holdings.items():
-        try:
-            hist = yf.Ticker(symbol).history(period="3mo")
-            rsi = ta.rsi(hist['Close'], length=14).iloc[-1]
-            if rsi > 70:
-                insights.append(f"Potential risk for {symbol.replace('.NS','')}: RSI is {rsi:.0f}, indicating it may be overbought.")
-            elif rsi < 30:
-                insights.append(f"Potential opportunity for {symbol.replace('.NS','')}: RSI is {rsi:.0f}, indicating it may be oversold.")
-        except Exception:
-            continue
-            
-    return {"insights": insights}
+    # One (usually cached) portfolio read; valuation and RSI are batched and shared across users
+    portfolio = await asyncio.to_thread(portfolio_service.get_portfolio, current_user['uid'], False)
+    return {"insights": await portfolio_service.insights(portfolio)}
 
 
 # (The rest of your endpoints like /portfolio, /screener, etc., remain unchanged)
@@ -260,41 +313,33 @@ async def get_portfolio_insights(current_user: dict = Depends(get_current_user))
 
 
 # (All your other endpoints remain below)
-def get_latest_stock_data(ticker: str):
-    stock = yf.Ticker(ticker); df = stock.history(period="3y", auto_adjust=True)
+def get_latest_feature_row(ticker: str):
+    """The latest bar's features as a plain array in `FEATURE_NAMES` order."""
+    with stage("upstream"):
+        df = ohlcv_store.get_history(ticker, period="3y")
     if df.empty: raise ValueError(f"Could not fetch historical data for '{ticker}'.")
-    df.ta.rsi(length=14, append=True); df.ta.ema(length=50, append=True); df.ta.ema(length=200, append=True); df.ta.macd(append=True); df.ta.bbands(length=20, append=True); df.ta.atr(length=14, append=True); df.ta.stoch(length=14, append=True); df.ta.obv(append=True)
-    return df.dropna().iloc[-1:]
+    # Indicator state is kept per ticker, so only bars not seen before are folded in
+    with stage("indicators"):
+        return indicator_engine.latest_row(ticker, df)[1]
+
+def recommendation_from_proba(prob_down, prob_up, threshold):
+    """Maps class probabilities to Buy/Sell/Hold. A probability above the threshold implies the predicted class."""
+    if prob_up > threshold: recommendation = "Buy"
+    elif prob_down > threshold: recommendation = "Sell"
+    else: recommendation = "Hold"
+    return recommendation, max(prob_up, prob_down) * 100
 
 @app.post("/predict")
 # ... (rest of file is unchanged)
 def predict_stock(data: StockData):
+    serving_model = require_model()
     try:
-        latest_data = get_latest_stock_data(data.ticker)
-        
-        # This list of features MUST EXACTLY MATCH the list in your model.py
-        feature_names = [
-            f'RSI_{RSI_PERIOD}', f'EMA_{EMA_SHORT}', f'EMA_{EMA_LONG}', 'MACD_12_26_9',
-            'BBL_20_2.0', 'BBM_20_2.0', 'BBU_20_2.0', 'ATRr_14',
-            'STOCHk_14_3_3', 'STOCHd_14_3_3', 'OBV'
-        ]
-
-        # Ensure all required columns are present before predicting
-        if not all(feature in latest_data.columns for feature in feature_names):
-            missing = [f for f in feature_names if f not in latest_data.columns]
-            raise ValueError(f"Could not calculate all required indicators. Missing: {missing}")
+        row = get_latest_feature_row(data.ticker)
         
-        features_df = latest_data[feature_names]
-        
-        prediction_raw = model.predict(features_df)
-        prediction_proba = model.predict_proba(features_df)
-        prob_down, prob_up = prediction_proba[0][0], prediction_proba[0][1]
-
-        if prediction_raw[0] == 1 and prob_up > 0.55: recommendation = "Buy"
-        elif prediction_raw[0] == 0 and prob_down > 0.55: recommendation = "Sell"
-        else: recommendation = "Hold"
-        
-        confidence = max(prob_up, prob_down) * 100
+        # A single row skips the DataFrame and XGBoost's DMatrix entirely (see fast_inference)
+        with stage("inference"):
+            prediction_proba = serving_model.predict_proba_rows([row], FEATURE_NAMES)
+        recommendation, confidence = recommendation_from_proba(prediction_proba[0][0], prediction_proba[0][1], serving_model.threshold)
         
         return {
             "ticker": data.ticker,
@@ -305,86 +350,132 @@ def predict_stock(data: StockData):
         print(f"⚠️ Prediction failed for {data.ticker}: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/predict/batch")
+def predict_batch(data: Tickers):
+    """Scores a whole watchlist with a single predict_proba call over one feature matrix."""
+    serving_model = require_model()
+    tickers = list(dict.fromkeys(data.tickers))
+    results = {}
+    scored_tickers, rows = [], []
+
+    for ticker in tickers:
+        try:
+            rows.append(get_latest_feature_row(ticker))
+            scored_tickers.append(ticker)
+        except Exception as e:
+            print(f"⚠️ Prediction failed for {ticker}: {e}")
+            results[ticker] = {"ticker": ticker, "error": str(e)}
+
+    if rows:
+        try:
+            with stage("inference"):
+                probabilities = serving_model.predict_proba_rows(np.array(rows), FEATURE_NAMES)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Batch inference failed: {e}")
+        for ticker, (prob_down, prob_up) in zip(scored_tickers, probabilities):
+            recommendation, confidence = recommendation_from_proba(prob_down, prob_up, serving_model.threshold)
+            results[ticker] = {
+                "ticker": ticker,
+                "recommendation": recommendation,
+                "confidence_score": f"{confidence:.2f}%"
+            }
+
+    return [results[ticker] for ticker in tickers]
+
 # --- (The rest of your endpoints remain unchanged) ---
 
-INDEX_SYMBOLS = {
-    "NIFTY 50": [
-        "RELIANCE.NS", "TCS.NS", "HDFCBANK.NS", "ICICIBANK.NS", "INFY.NS", "HINDUNILVR.NS",
-        "BHARTIARTL.NS", "ITC.NS", "SBIN.NS", "LICI.NS", "HCLTECH.NS", "LT.NS",
-        "BAJFINANCE.NS", "KOTAKBANK.NS", "ADANIENT.NS", "ASIANPAINT.NS", "AXISBANK.NS",
-        "MARUTI.NS", "SUNPHARMA.NS", "WIPRO.NS", "TATAMOTORS.NS", "NTPC.NS", "ULTRACEMCO.NS",
-        "ADANIPORTS.NS", "BAJAJFINSV.NS", "POWERGRID.NS", "COALINDIA.NS", "NESTLEIND.NS",
-        "ONGC.NS", "TATASTEEL.NS", "JSWSTEEL.NS", "M&M.NS", "HDFCLIFE.NS", "SBILIFE.NS",
-        "GRASIM.NS", "HINDALCO.NS", "INDUSINDBK.NS", "TECHM.NS", "CIPLA.NS", "DRREDDY.NS",
-        "BRITANNIA.NS", "BAJAJ-AUTO.NS", "EICHERMOT.NS", "APOLLOHOSP.NS", "TITAN.NS",
-        "TATACONSUM.NS", "HEROMOTOCO.NS", "UPL.NS", "DIVISLAB.NS", "BPCL.NS"
-    ],
-    "NIFTY BANK": [
-        "HDFCBANK.NS", "ICICIBANK.NS", "SBIN.NS", "KOTAKBANK.NS", "AXISBANK.NS", 
-        "INDUSINDBK.NS", "BANKBARODA.NS", "PNB.NS", "AUBANK.NS", "FEDERALBNK.NS", 
-        "IDFCFIRSTB.NS", "BANDHANBNK.NS"
-    ]
-}
+async def fetch_index_bars(index, symbols):
+    tickers_str = " ".join(symbols)
+    return await fetcher.fetch("yfinance", ("download_2d", index), yf.download, tickers=tickers_str, period="2d", group_by='ticker', progress=False)
+
+heatmap_refresher = HeatmapRefresher(fetch_index_bars, lambda symbols: get_ticker_metadata(symbols, ['marketCap']), shared=shared_cache)
 
 @app.get("/market-heatmap")
-async def get_market_heatmap_data(index: Optional[str] = "NIFTY 50"):
-    symbols_to_fetch = INDEX_SYMBOLS.get(index)
-    if not symbols_to_fetch:
+async def get_market_heatmap_data(request: Request, index: Optional[str] = "NIFTY 50"):
+    if index not in INDEX_SYMBOLS:
         raise HTTPException(status_code=404, detail="Index not found.")
-    
-    heatmap_data = []
-    print(f"Fetching data for {index} heatmap...")
-    tickers_str = " ".join(symbols_to_fetch)
-    data = yf.download(tickers=tickers_str, period="2d", group_by='ticker', progress=False)
 
-    for symbol in symbols_to_fetch:
-        try:
-            info = yf.Ticker(symbol).info
-            market_cap = info.get('marketCap', 0)
-            
-            hist = data[symbol]
-            if hist.empty or len(hist) < 2 or market_cap == 0:
-                continue
-
-            price = hist['Close'].iloc[-1]
-            prev_close = hist['Close'].iloc[-2]
-            change_percent = ((price - prev_close) / prev_close) * 100
-            
-            heatmap_data.append({
-                'x': symbol.replace('.NS', ''),
-                'y': market_cap,
-                'change': round(change_percent, 2)
-            })
-        except Exception as e:
-            print(f"⚠️ Could not fetch heatmap data for {symbol}: {e}")
-            continue
-            
-    return heatmap_data
+    # Every viewer gets the same answer, so serve the background-built snapshot from memory
+    snapshot = heatmap_refresher.snapshot(index) or await heatmap_refresher.refresh(index)
+    headers = {"Last-Modified": snapshot.last_modified_header, "Cache-Control": "no-cache"}
+    # If-None-Match (checked per format/encoding variant below) takes precedence over If-Modified-Since
+    if not request.headers.get("if-none-match") and snapshot.is_fresh_for(if_modified_since=request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+    # Encoded and compressed variants are cached per snapshot ETag
+    return await negotiated_response(request, body=snapshot.body, etag=snapshot.etag, headers=headers)
 
 @app.post("/screener")
-async def run_screener(filters: dict):
+async def run_screener(request: Request, filters: dict):
     try:
-        screener_file = Path(__file__).resolve().parent / "screener_data.json"
-        with open(screener_file, 'r') as f:
-            data = json.load(f)
-        df = pd.DataFrame(data)
-        if filters.get('minMarketCap'):
-            df = df[df['marketCap'] >= int(filters['minMarketCap'])]
-        if filters.get('maxPeRatio'):
-            df = df[(df['peRatio'].notna()) & (df['peRatio'] > 0) & (df['peRatio'] <= int(filters['maxPeRatio']))]
-        if filters.get('minDividendYield'):
-            df = df[df['dividendYield'] >= float(filters['minDividendYield'])]
-        if filters.get('sector'):
-            df = df[df['sector'] == filters['sector']]
-        results = df.sort_values(by='marketCap', ascending=False).head(100)
-        return json.loads(results.to_json(orient='records'))
+        # Columns are loaded once and hot-reloaded when screener_data.json changes; rows are stored JSON-encoded
+        with stage("screener"):
+            body = screener_index.query_json(filters)
+        return await negotiated_response(request, body=body)
     except FileNotFoundError:
         raise HTTPException(status_code=500, detail="Screener data file not found on server.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred in the screener: {str(e)}")
 
+NEWS_API_URL = "https://newsapi.org/v2/everything"
+YAHOO_SEARCH_URL = "https://query1.finance.yahoo.com/v1/finance/search"
+NEWS_TTL = 15 * 60 # Seconds a ticker's news stays cached; each miss costs NewsAPI quota
+SEARCH_RESULTS = 7
+SEARCH_QUOTES_REQUESTED = 10
+SEARCH_YAHOO_FALLBACK = os.getenv("SEARCH_YAHOO_FALLBACK", "1") != "0" # Ask Yahoo only when the local index finds nothing
+
+http_clients = HTTPClients() # Keep-alive pools for NewsAPI and Yahoo search
+news_cache = TTLCache(ttl=NEWS_TTL, max_entries=2000)
+search_cache = PrefixSearchCache()
+IMAGE_CLIENT_MAX_AGE = 7 * 24 * 60 * 60 # Browsers keep proxied images for a week
+image_cache = ImageCache(get_client=lambda: http_clients.get("images"))
+symbol_index = SymbolAutocomplete()
+
+async def fetch_stock_news(ticker, api_key):
+    # 1. Get the full company name for a better search query
+    company_name = ticker
+    info = (await get_ticker_metadata([f"{ticker}.NS"], ['longName']))[f"{ticker}.NS"]
+    # If yfinance fails, just use the ticker symbol
+    if not isinstance(info, Exception) and info.get('longName'):
+        company_name = info['longName'].replace("Limited", "").replace("Ltd", "").strip()
+
+    # 2. Focus the search on major Indian financial news domains
+    domains = "economictimes.indiatimes.com,timesofindia.indiatimes.com,thehindu.com,business-standard.com,livemint.com,moneycontrol.com"
+
+    # 3. Create a more specific search query
+    search_query = f'"{company_name}" OR "{ticker}"'
+    params = {"q": search_query, "domains": domains, "sortBy": "publishedAt", "apiKey": api_key, "language": "en"}
+
+    with stage("upstream"):
+        response = await http_clients.get("newsapi").get(NEWS_API_URL, params=params)
+    response.raise_for_status() # Raise an exception for bad responses (4xx or 5xx)
+    articles = response.json().get('articles', [])
+
+    # 4. Format the response to match the structure your frontend expects
+    formatted_news = []
+    for article in articles[:12]: # Limit to the top 8 articles
+        if not all(k in article for k in ['title', 'source', 'url', 'publishedAt']) or not article.get('source', {}).get('name'):
+            continue
+
+        published_at_str = article.get('publishedAt')
+        if not published_at_str: continue
+
+        try:
+            # Convert date string to a Unix timestamp
+            timestamp = int(datetime.fromisoformat(article['publishedAt'].replace('Z', '')).timestamp())
+            formatted_news.append({
+                "uuid": article['url'],
+                "title": article['title'],
+                "publisher": article['source']['name'],
+                "link": article['url'],
+                "providerPublishTime": timestamp,
+                "imageUrl": article.get('urlToImage')
+            })
+        except (ValueError, TypeError):
+            continue
+    return formatted_news
+
 @app.get("/stock-news")
-def get_stock_news(ticker: str):
+async def get_stock_news(ticker: str):
     if not ticker:
         raise HTTPException(status_code=400, detail="Ticker symbol is required.")
 
@@ -392,126 +483,194 @@ def get_stock_news(ticker: str):
     if not NEWS_API_KEY:
         raise HTTPException(status_code=500, detail="NewsAPI key is not configured on the server.")
 
-    print(f"Fetching news for {ticker} from NewsAPI.org...")
-    
     try:
-        # 1. Get the full company name for a better search query
-        company_name = ticker
-        try:
-            info = yf.Ticker(f"{ticker}.NS").info
-            if 'longName' in info and info['longName']:
-                company_name = info['longName'].replace("Limited", "").replace("Ltd", "").strip()
-        except Exception:
-            # If yfinance fails, just use the ticker symbol
-            pass
-
-        # 2. Focus the search on major Indian financial news domains
-        domains = "economictimes.indiatimes.com,timesofindia.indiatimes.com,thehindu.com,business-standard.com,livemint.com,moneycontrol.com"
-        
-        # 3. Create a more specific search query
-        search_query = f'"{company_name}" OR "{ticker}"'
-        
-        url = f"https://newsapi.org/v2/everything?q={search_query}&domains={domains}&sortBy=publishedAt&apiKey={NEWS_API_KEY}&language=en"
-        
-        response = requests.get(url)
-        response.raise_for_status() # Raise an exception for bad responses (4xx or 5xx)
-        articles = response.json().get('articles', [])
-        
-        if not articles:
-            raise HTTPException(status_code=404, detail=f"No news found for {ticker} via NewsAPI.")
-
-        # 4. Format the response to match the structure your frontend expects
-        formatted_news = []
-        for article in articles[:12]: # Limit to the top 8 articles
-            if not all(k in article for k in ['title', 'source', 'url', 'publishedAt']) or not article.get('source', {}).get('name'):
-                continue
-            
-            published_at_str = article.get('publishedAt')
-            if not published_at_str: continue
-
-            try:
-                # Convert date string to a Unix timestamp
-                timestamp = int(datetime.fromisoformat(article['publishedAt'].replace('Z', '')).timestamp())
-                formatted_news.append({
-                    "uuid": article['url'],
-                    "title": article['title'],
-                    "publisher": article['source']['name'],
-                    "link": article['url'],
-                    "providerPublishTime": timestamp,
-                    "imageUrl": article.get('urlToImage')
-                })
-            except (ValueError, TypeError):
-                continue
-        
-        return formatted_news
-        
-    except requests.exceptions.HTTPError as e:
+        # Cached per ticker, and concurrent requests for the same ticker share one NewsAPI call
+        formatted_news = await news_cache.get_or_load(ticker.upper(), lambda: fetch_stock_news(ticker, NEWS_API_KEY))
+    except httpx.HTTPStatusError as e:
         if e.response.status_code == 401:
             raise HTTPException(status_code=500, detail="NewsAPI key is invalid or unauthorized.")
         raise HTTPException(status_code=503, detail=f"News service failed with status code {e.response.status_code}")
     except Exception as e:
         print(f"⚠️ NewsAPI fetch failed for {ticker}: {e}")
         raise HTTPException(status_code=500, detail="An internal error occurred while fetching news.")
+
+    if not formatted_news:
+        raise HTTPException(status_code=404, detail=f"No news found for {ticker} via NewsAPI.")
+    return formatted_news
     
 @app.get("/image-proxy")
-def image_proxy(url: str):
+async def image_proxy(request: Request, url: str, w: int = DEFAULT_THUMBNAIL_WIDTH):
+    """Cached, resized copy of a news image. `w` is the display width in pixels (0 for the original)."""
     if not url:
         raise HTTPException(status_code=400, detail="URL parameter is required.")
+    if not url.startswith(("http://", "https://")):
+        raise HTTPException(status_code=400, detail="Only http(s) image URLs can be proxied.")
     try:
-        with requests.Session() as s:
-            response = s.get(url, stream=True, headers={'User-Agent': 'Mozilla/5.0'})
-            response.raise_for_status()
-            return StreamingResponse(response.iter_content(chunk_size=16384), media_type=response.headers.get('Content-Type'))
-    except requests.exceptions.RequestException as e:
+        image = await image_cache.get(url, width=w)
+    except ImageFetchError as e:
         print(f"⚠️ Image proxy failed for URL {url}: {e}")
         raise HTTPException(status_code=502, detail="Failed to fetch image from source.")
+    headers = {"Cache-Control": f"public, max-age={IMAGE_CLIENT_MAX_AGE}", "ETag": f'"{image.digest}"'}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    # One read into memory: thumbnails are small, and streaming a file costs a thread hop per 64 KB chunk
+    try:
+        content = await asyncio.to_thread(image.path.read_bytes)
+    except FileNotFoundError: # Evicted between the lookup and the read
+        raise HTTPException(status_code=503, detail="Image cache busy, please retry.")
+    image_cache.counts["bytesServed"] += len(content)
+    return Response(content=content, media_type=image.content_type, headers=headers)
 
 @app.get("/search-stocks")
-def search_stocks(query: str):
-    if not query or len(query) < 1: return []
-    url = f"https://query1.finance.yahoo.com/v1/finance/search?q={query}"; headers = {'User-Agent': 'Mozilla/5.0'}
+async def search_stocks(query: str):
+    query = query.strip()
+    if not query: return []
+    # Every NSE symbol is indexed in-process, so a keystroke costs microseconds, not a round trip
+    with stage("search"):
+        results = symbol_index.search(query, limit=SEARCH_RESULTS)
+    if results or not SEARCH_YAHOO_FALLBACK: return results
+    # Repeat queries, and extensions of a query whose full result set we already have, skip the network
+    cached = search_cache.lookup(query)
+    if cached is not None: return cached[:SEARCH_RESULTS]
     try:
-        r = requests.get(url, headers=headers); r.raise_for_status(); data = r.json()
-        results = [{"symbol": i.get('symbol'), "name": i.get('longname', i.get('shortname', ''))} for i in data.get('quotes', []) if i.get('exchange') in ['NSI', 'BSE']]
-        return results[:7]
-    except requests.exceptions.RequestException as e: raise HTTPException(status_code=503, detail="Failed to connect to search service.")
+        with stage("upstream"):
+            r = await http_clients.get("yahoo").get(YAHOO_SEARCH_URL, params={"q": query, "quotesCount": SEARCH_QUOTES_REQUESTED, "newsCount": 0})
+        r.raise_for_status(); quotes = r.json().get('quotes', [])
+        results = [{"symbol": i.get('symbol'), "name": i.get('longname', i.get('shortname', ''))} for i in quotes if i.get('exchange') in ['NSI', 'BSE']]
+        search_cache.store(query, results, complete=len(quotes) < SEARCH_QUOTES_REQUESTED)
+        return results[:SEARCH_RESULTS]
+    except (httpx.HTTPError, ValueError):
+        raise HTTPException(status_code=503, detail="Failed to connect to search service.")
+
+async def fetch_quotes(symbols):
+    """{symbol: quote or Exception}, one upstream history fetch per symbol."""
+    # Fetch last 5 days just to be safe
+    histories = await fetcher.fetch_many("yfinance", "history_5d", symbols, fetch_recent_history)
+    quotes = {}
+    for symbol, hist in histories.items():
+        try:
+            if isinstance(hist, Exception): raise hist
+            quotes[symbol] = quote_from_history(hist)
+        except Exception as e:
+            quotes[symbol] = e
+    return quotes
+
+# PRICE_FEED=simulated streams a random walk instead of Yahoo (for offline frontend work)
+quote_feed = SharedQuoteFeed(SimulatedPriceFeed() if os.getenv("PRICE_FEED") == "simulated" else fetch_quotes, shared_cache)
+price_hub = PriceStreamHub(quote_feed)
 
 @app.post("/prices/batch")
-async def get_batch_prices(data: Tickers):
-    print(data)
+async def get_batch_prices(request: Request, data: Tickers):
     results = {}
-
+    quotes = await price_hub.fetch_quotes(data.tickers)
     for ticker_str in data.tickers:
+        quote = quotes.get(ticker_str)
+        if isinstance(quote, Exception):
+            print(f"⚠ Could not fetch price for {ticker_str}: {quote}")
+        elif quote is not None:
+            results[ticker_str] = quote
+    return await negotiated_response(request, results, key_field="symbol")
+
+@app.websocket("/ws/prices")
+async def stream_prices(websocket: WebSocket, symbols: Optional[str] = None):
+    """
+    Live prices over a WebSocket. Clients send {"subscribe": [...]} / {"unsubscribe": [...]}
+    (or pass ?symbols=A.NS,B.NS) and receive {"type": "prices", "data": {symbol: quote}} with
+    only the symbols whose quote changed.
+    """
+    await websocket.accept()
+    subscription = price_hub.subscribe([s for s in (symbols or "").split(",") if s])
+
+    async def receive_commands():
         try:
-            # Fetch last 5 days just to be safe
-            hist = yf.Ticker(ticker_str).history(period="5d", auto_adjust=True)
-            print("HISTORY:", hist)
-
-            if not hist.empty:
-                # Always take the last 2 available closes
-                last_two = hist['Close'].tail(2).tolist()
-
-                if len(last_two) == 2:
-                    prev_close, price = last_two
-                else:
-                    price = last_two[-1]
-                    prev_close = price
-
-                change = price - prev_close
-                percent_change = ((change / prev_close) * 100) if prev_close != 0 else 0
-
-                results[ticker_str] = {
-                    "price": round(price, 2),
-                    "change": round(change, 2),
-                    "percent_change": round(percent_change, 2)
-                }
-
-        except Exception as e:
-            print(f"⚠ Could not fetch price for {ticker_str}: {e}")
-            continue
+            while True:
+                message = await websocket.receive_json()
+                price_hub.update(subscription, add=message.get("subscribe", []), remove=message.get("unsubscribe", []))
+        except (WebSocketDisconnect, ValueError, AttributeError):
+            pass
+        finally:
+            subscription.close()
 
-    print(results)
-    return results
+    receiver = asyncio.create_task(receive_commands())
+    try:
+        while (changes := await subscription.next()) is not None:
+            await websocket.send_json({"type": "prices", "data": changes})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        price_hub.unsubscribe(subscription)
+
+@app.get("/prices/stream/stats")
+def get_price_stream_stats(): return price_hub.stats()
+
+metrics.registry.register_collector(
+    "stockwise_metadata_cache", "Ticker metadata cache counters.", metadata_cache.stats,
+    ("hits", "misses", "upstreamCalls", "evictions"))
+metrics.registry.register_collector(
+    "stockwise_portfolio_cache", "Portfolio snapshot and RSI memo counters.", portfolio_service.stats,
+    ("snapshotHits", "snapshotMisses", "rsiHits", "rsiMisses"))
+metrics.registry.register_collector(
+    "stockwise_price_stream", "Live price stream subscribers, watched symbols and upstream fetches.", price_hub.stats,
+    ("subscribers", "symbols", "ticks", "upstreamFetches"), metric_type="gauge")
+
+metrics.registry.register_collector(
+    "stockwise_shared_quotes", "Quotes served from the shared panel, fetched directly, and refreshed for all workers.",
+    quote_feed.stats, ("sharedHits", "directFetches", "refreshed"))
+metrics.registry.register_collector(
+    "stockwise_shared_cache", "Shared cache generations this worker published and mapped.", shared_cache.stats,
+    ("publishes", "loads"))
+metrics.registry.register_collector(
+    "stockwise_shared_cache_state", "Whether this worker is the shared cache refresher, and entries it maps.", shared_cache.stats,
+    ("leader", "mapped"), metric_type="gauge")
+
+metrics.registry.register_collector(
+    "stockwise_briefing", "Symbols with briefing signals and total computed.", briefing_engine.stats,
+    ("symbols", "computed"), metric_type="gauge")
+
+metrics.registry.register_collector(
+    "stockwise_news_cache", "NewsAPI response cache counters.", news_cache.stats, ("hits", "misses"))
+metrics.registry.register_collector(
+    "stockwise_search_cache", "Symbol search cache counters.", search_cache.stats, ("hits", "prefixHits", "misses"))
+metrics.registry.register_collector(
+    "stockwise_image_cache", "Image proxy cache counters.", lambda: image_cache.stats(),
+    ("hits", "revalidated", "fetched", "staleServed", "thumbnails", "evictions", "bytesServed", "upstreamBytes"))
+metrics.registry.register_collector(
+    "stockwise_image_cache_size", "Image proxy cache contents.", lambda: image_cache.stats(), ("urls", "blobs", "bytes"),
+    metric_type="gauge")
+
+@app.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of request latency, stage timings, upstream calls and cache counters."""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/debug/profiles")
+def list_profiles():
+    if not metrics.PROFILING_ENABLED: raise HTTPException(status_code=404, detail="Profiling is disabled (set ENABLE_PROFILING=1).")
+    return metrics.profiles.list()
+
+@app.get("/debug/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    """Folded stacks (flamegraph input) for a request made with `X-Profile: 1` or `?profile=1`."""
+    profile = metrics.profiles.get(profile_id) if metrics.PROFILING_ENABLED else None
+    if profile is None: raise HTTPException(status_code=404, detail="Profile not found.")
+    return PlainTextResponse(profile["folded"])
+
+@app.get("/metadata-cache/stats")
+def get_metadata_cache_stats(): return metadata_cache.stats()
+
+@app.get("/health")
+def health(): return {"status": "ok"}
+
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 200 once the model is loaded and Firebase is initialized, 503 before that."""
+    status = {"model": model_status["state"], "firebase": "ready" if db else "unavailable"}
+    if model_server.current: status["modelVersion"] = model_server.current.version
+    if model_status["error"]: status["error"] = model_status["error"]
+    if model_server.current is None or not db:
+        return JSONResponse(status_code=503, content=status)
+    return status
 
 @app.get("/")
 def read_root(): return {"message": "Welcome to the StockWise.AI Prediction API"}
@@ -0,0 +1,131 @@
+import asyncio
+import contextvars
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .metrics import COALESCED_CALLS, UPSTREAM_CALLS, stage
+
+# --- Configuration ---
+MAX_CONCURRENCY = 8
+MAX_RETRIES = 2
+BACKOFF_SECONDS = 0.5
+# Requests per second and burst size for each upstream provider
+# (None means bounded by concurrency only, e.g. reads from the local OHLCV store)
+RATE_LIMITS = {
+    "yfinance": (8.0, 16),
+    "newsapi": (2.0, 4),
+    "ohlcv_store": None,
+}
+DEFAULT_RATE_LIMIT = (5.0, 10)
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class FetchLayer:
+    """
+    Runs blocking market-data calls (yfinance, requests) off the event loop.
+
+    Calls go through a bounded thread pool, a per-provider token bucket and retry with
+    exponential backoff. Identical in-flight requests (same provider and key) are coalesced,
+    so concurrent viewers of the same symbol share one upstream call. Errors listed in
+    `giveup_on` are treated as "no data" answers and are not retried.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, rate_limits=None, retries=MAX_RETRIES,
+                 backoff=BACKOFF_SECONDS, giveup_on=(ValueError, KeyError)):
+        self.max_concurrency = max_concurrency
+        self.rate_limits = dict(RATE_LIMITS if rate_limits is None else rate_limits)
+        self.retries = retries
+        self.backoff = backoff
+        self.giveup_on = giveup_on
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="market-fetch")
+        self._semaphore = None
+        self._buckets = {}
+        self._inflight = {}
+
+    def _bucket(self, provider):
+        if provider not in self._buckets:
+            limit = self.rate_limits.get(provider, DEFAULT_RATE_LIMIT)
+            self._buckets[provider] = TokenBucket(*limit) if limit else None
+        return self._buckets[provider]
+
+    async def _call(self, provider, operation, fn):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            async with self._semaphore:
+                bucket = self._bucket(provider)
+                if bucket is not None:
+                    await bucket.acquire()
+                try:
+                    with stage("upstream"):
+                        # In the caller's context, so stages inside `fn` nest under this one
+                        result = await loop.run_in_executor(self._executor, contextvars.copy_context().run, fn)
+                    UPSTREAM_CALLS.inc(provider=provider, operation=operation, outcome="ok")
+                    return result
+                except self.giveup_on:
+                    UPSTREAM_CALLS.inc(provider=provider, operation=operation, outcome="no_data")
+                    raise
+                except Exception:
+                    final = attempt == self.retries
+                    UPSTREAM_CALLS.inc(provider=provider, operation=operation, outcome="error" if final else "retry")
+                    if final:
+                        raise
+            await asyncio.sleep(self.backoff * (2 ** attempt) * (1 + random.random() * 0.25))
+
+    async def fetch(self, provider, key, fn, *args, **kwargs):
+        """
+        Runs `fn(*args, **kwargs)`, joining an identical call that is already in flight.
+
+        `key` identifies the call, e.g. ("history_5d", "TCS.NS"), and must differ between operations.
+        """
+        inflight_key = (provider, key)
+        task = self._inflight.get(inflight_key)
+        if task is None:
+            operation = key[0] if isinstance(key, tuple) else str(key)
+            task = asyncio.ensure_future(self._call(provider, operation, partial(fn, *args, **kwargs)))
+            self._inflight[inflight_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(inflight_key, None))
+        else:
+            COALESCED_CALLS.inc(provider=provider)
+        # Shield so one cancelled caller doesn't cancel the call for everyone sharing it
+        return await asyncio.shield(task)
+
+    async def fetch_many(self, provider, operation, keys, fn):
+        """Runs `fn(key)` for every key concurrently. Returns {key: result or Exception}."""
+        keys = list(dict.fromkeys(keys))
+        results = await asyncio.gather(
+            *(self.fetch(provider, (operation, key), fn, key) for key in keys), return_exceptions=True
+        )
+        return dict(zip(keys, results))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared fetch layer used by the API endpoints
+fetcher = FetchLayer()
@@ -0,0 +1,180 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+# --- Configuration ---
+BASE_DIR = Path(__file__).resolve().parent
+SCREENER_JSON_PATH = BASE_DIR / "screener_data.json"
+SCREENER_META_PATH = BASE_DIR / "screener_data.meta.json" # symbol -> refresh time, written by prepare_screener_data
+CACHE_DB_PATH = BASE_DIR / "data" / "metadata_cache.sqlite3"
+MAX_ENTRIES = 5000
+DAY = 24 * 60 * 60
+DB_TIMEOUT = 30 # Seconds a write waits for another process's lock before sqlite3 raises "database is locked"
+# How long each `.info` field stays fresh. Fields not listed here are not cached.
+FIELD_TTLS = {
+    "longName": 7 * DAY,
+    "shortName": 7 * DAY,
+    "sector": 7 * DAY,
+    "industry": 7 * DAY,
+    "marketCap": DAY,
+    "trailingPE": DAY,
+    "priceToBook": DAY,
+    "dividendYield": DAY,
+    "currentPrice": 60,
+    "regularMarketPrice": 60,
+}
+
+
+class MetadataCache:
+    """
+    Per-symbol cache of `yf.Ticker(...).info` fields with a TTL per field and LRU eviction.
+
+    When `db_path` is set, entries are written through to SQLite so a restart starts warm.
+    Fields the provider didn't return are cached as missing, so a symbol without e.g. a
+    market cap isn't re-fetched on every request.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, field_ttls=None, db_path=None):
+        self.max_entries = max_entries
+        self.field_ttls = dict(FIELD_TTLS if field_ttls is None else field_ttls)
+        self._entries = OrderedDict()  # symbol -> {field: (value, fetched_at)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.evictions = 0
+        self._db = None
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), timeout=DB_TIMEOUT, check_same_thread=False)
+            # WAL lets readers (this process's lookups, other workers) carry on while a batch is written
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "symbol TEXT NOT NULL, field TEXT NOT NULL, value TEXT, fetched_at REAL NOT NULL, "
+                "PRIMARY KEY (symbol, field))"
+            )
+            self._db.commit()
+
+    # --- Storage ---
+    def _load_from_disk(self, symbol):
+        if self._db is None:
+            return None
+        rows = self._db.execute("SELECT field, value, fetched_at FROM metadata WHERE symbol = ?", (symbol,)).fetchall()
+        if not rows:
+            return None
+        return {field: (json.loads(value), fetched_at) for field, value, fetched_at in rows}
+
+    def _insert(self, symbol, entry):
+        self._entries[symbol] = entry
+        self._entries.move_to_end(symbol)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _store(self, infos, fetched_at):
+        """Caches the tracked fields of each {symbol: info}, written to SQLite in one transaction."""
+        rows = []
+        for symbol, info in infos.items():
+            fields = {field: (info.get(field), fetched_at) for field in self.field_ttls}
+            entry = self._entries.get(symbol) or self._load_from_disk(symbol) or {}
+            entry.update(fields)
+            self._insert(symbol, entry)
+            rows.extend((symbol, field, json.dumps(value), fetched_at) for field, (value, _) in fields.items())
+        if self._db is not None and rows:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO metadata (symbol, field, value, fetched_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.commit()
+
+    # --- Public API ---
+    def lookup(self, symbol, fields):
+        """Returns {field: value} if every requested field is cached and fresh, otherwise None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is None:
+                entry = self._load_from_disk(symbol)
+                if entry is not None:
+                    self._insert(symbol, entry)
+            else:
+                self._entries.move_to_end(symbol)
+            if entry is None or any(
+                field not in entry or now - entry[field][1] > self.field_ttls.get(field, 0) for field in fields
+            ):
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Drop missing fields so callers can keep using `info.get(field, default)`
+            return {field: entry[field][0] for field in fields if entry[field][0] is not None}
+
+    def put(self, symbol, info, fetched_at=None):
+        """Caches every tracked field of a freshly fetched `.info` dict."""
+        self.put_many({symbol: info}, fetched_at)
+
+    def put_many(self, infos, fetched_at=None):
+        """Caches several freshly fetched `.info` dicts ({symbol: info}) with a single SQLite commit."""
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._lock:
+            self.upstream_calls += len(infos)
+            self._store(infos, fetched_at)
+
+    def get(self, symbol, fields, loader):
+        """Returns the requested fields for `symbol`, calling `loader(symbol)` for `.info` on a miss."""
+        cached = self.lookup(symbol, fields)
+        if cached is not None:
+            return cached
+        info = loader(symbol)
+        self.put(symbol, info)
+        return {field: info[field] for field in fields if info.get(field) is not None}
+
+    def seed_from_screener(self, path=SCREENER_JSON_PATH, meta_path=SCREENER_META_PATH, suffix=".NS"):
+        """
+        Pre-populates sector and market cap from `screener_data.json`, without overriding cached data.
+
+        Seeded fields are dated when the builder fetched them (its meta file, else the JSON's
+        mtime), so an old screener file doesn't pass for fresh data.
+        """
+        try:
+            with open(path, "r") as f:
+                records = json.load(f)
+            file_time = Path(path).stat().st_mtime
+        except FileNotFoundError:
+            return 0
+        try:
+            with open(meta_path, "r") as f:
+                updated_at = json.load(f)
+        except (FileNotFoundError, ValueError):
+            updated_at = {}
+        seeded = 0
+        with self._lock:
+            for record in records:
+                symbol = f"{record['symbol']}{suffix}"
+                if symbol in self._entries or self._load_from_disk(symbol) is not None:
+                    continue
+                fetched_at = min(updated_at.get(record["symbol"], file_time), file_time)
+                fields = {"marketCap": (record.get("marketCap"), fetched_at)}
+                if record.get("sector") and record["sector"] != "N/A":
+                    fields["sector"] = (record["sector"], fetched_at)
+                self._insert(symbol, fields)
+                seeded += 1
+        return seeded
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None,
+                "upstreamCalls": self.upstream_calls,
+                "evictions": self.evictions,
+            }
+
+
+# Shared cache used by the API endpoints
+metadata_cache = MetadataCache(db_path=CACHE_DB_PATH)
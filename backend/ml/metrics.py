@@ -0,0 +1,255 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as _Tally, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# --- Configuration ---
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROFILING_ENABLED = os.getenv("ENABLE_PROFILING") == "1" # Opt-in: lets clients request a per-request profile
+PROFILE_SAMPLE_INTERVAL = 0.005 # Seconds between stack samples
+MAX_STORED_PROFILES = 20
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in the Prometheus text format."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}_total", tuple(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in the Prometheus text format."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {} # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            labels = tuple(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, state):
+                yield f"{self.name}_bucket", labels + (("le", repr(float(bound))),), count
+            yield f"{self.name}_bucket", labels + (("le", "+Inf"),), state[-1]
+            yield f"{self.name}_sum", labels, state[-2]
+            yield f"{self.name}_count", labels, state[-1]
+
+
+class Registry:
+    """Holds the app's metrics plus collectors that read counters other components already keep."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, name, documentation, stats, fields, metric_type="counter"):
+        """Exposes numeric `stats()[field]` values as `{name}{field="..."}` at scrape time."""
+        self._collectors.append((name, documentation, stats, fields, metric_type))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(labels)} {value}")
+        for name, documentation, stats, fields, metric_type in self._collectors:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            values = stats()
+            for field in fields:
+                if values.get(field) is not None:
+                    lines.append(f'{name}{{field="{field}"}} {values[field]}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "stockwise_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+STAGE_LATENCY = registry.histogram(
+    "stockwise_stage_duration_seconds", "Time spent in upstream calls, indicators, inference and Firestore.", ("stage",))
+UPSTREAM_CALLS = registry.counter(
+    "stockwise_upstream_calls", "Calls to upstream providers by outcome.", ("provider", "operation", "outcome"))
+COALESCED_CALLS = registry.counter(
+    "stockwise_coalesced_calls", "Requests served by joining an identical in-flight upstream call.", ("provider",))
+
+# Per-request stage totals, filled by `stage()` and reported by the middleware as Server-Timing
+_request_stages = ContextVar("request_stages", default=None)
+# The innermost running stage: [time spent in its nested stages]
+_current_stage = ContextVar("current_stage", default=None)
+_nesting_lock = threading.Lock()
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a block as one of the request stages (upstream, indicators, inference, firestore, ...).
+
+    Time is attributed to the innermost stage only: a stage nested in another (e.g. indicators
+    computed inside an upstream fetch) is subtracted from the outer one, so sequential stages
+    add up to no more than the request. Concurrent children can still overlap each other.
+    """
+    parent = _current_stage.get()
+    nested = [0.0]
+    token = _current_stage.set(nested)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_stage.reset(token)
+        if parent is not None:
+            with _nesting_lock:
+                parent[0] += elapsed
+        exclusive = max(elapsed - nested[0], 0.0)
+        STAGE_LATENCY.observe(exclusive, stage=name)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + exclusive
+
+
+def begin_request():
+    """Starts collecting stage timings for the current request; returns the dict they land in."""
+    stages = {}
+    _request_stages.set(stages)
+    return stages
+
+
+def server_timing(stages, total):
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in sorted(stages.items())]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+# --- Opt-in sampling profiler ---
+_IDLE_MODULES = ("threading.py", "selectors.py", "queue.py", "thread.py")
+
+
+class SamplingProfiler:
+    """
+    Samples every thread's Python stack while a request runs and counts folded stacks.
+
+    Samples are process-wide, so concurrent requests show up too; idle threads (waiting on
+    locks, queues or the event loop selector) are skipped. The output is the folded format
+    `frame;frame;frame count` that flamegraph tools read.
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = _Tally()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_filename.endswith(_IDLE_MODULES):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """The most recent request profiles, kept in memory for `/debug/profiles`."""
+
+    def __init__(self, max_profiles=MAX_STORED_PROFILES):
+        self._profiles = deque(maxlen=max_profiles)
+
+    def add(self, route, duration, profiler):
+        profile_id = uuid.uuid4().hex[:12]
+        self._profiles.append({
+            "id": profile_id, "route": route, "durationMs": round(duration * 1000, 1),
+            "samples": profiler.samples, "folded": profiler.folded(),
+        })
+        return profile_id
+
+    def list(self):
+        return [{k: v for k, v in p.items() if k != "folded"} for p in reversed(self._profiles)]
+
+    def get(self, profile_id):
+        return next((p for p in self._profiles if p["id"] == profile_id), None)
+
+
+profiles = ProfileStore()
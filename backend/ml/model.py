@@ -1,13 +1,21 @@
 import pandas as pd
-import yfinance as yf
 import pandas_ta as ta
 from xgboost import XGBClassifier
 import joblib
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
 from pathlib import Path
+from .ohlcv_store import store as ohlcv_store, period_to_days
+from .model_registry import registry as model_registry
 
 # --- Configuration ---
 BASE_DIR = Path(__file__).resolve().parent
-MODEL_FILE_PATH = BASE_DIR / "stock_predictor.joblib"
+MODEL_FILE_PATH = BASE_DIR / "stock_predictor.joblib" # Legacy single-file model, imported into the registry once
+TRAINING_CACHE_DIR = BASE_DIR / "data" / "training"
 
 # A more diverse list of NIFTY 50 and other large-cap stocks for a more robust model
 STOCKS_TO_TRAIN = [
@@ -20,6 +28,23 @@ DATA_PERIOD = "7y" # Using 7 years of data to capture more market cycles
 RSI_PERIOD = 14
 EMA_SHORT = 50
 EMA_LONG = 200
+PREDICTION_THRESHOLD = 0.55 # Minimum class probability before we call a Buy or Sell
+FEATURE_NAMES = [
+    f'RSI_{RSI_PERIOD}', f'EMA_{EMA_SHORT}', f'EMA_{EMA_LONG}', 'MACD_12_26_9',
+    'BBL_20_2.0', 'BBM_20_2.0', 'BBU_20_2.0', 'ATRr_14',
+    'STOCHk_14_3_3', 'STOCHd_14_3_3', 'OBV'
+]
+MODEL_PARAMS = dict(
+    use_label_encoder=False,
+    eval_metric='logloss',
+    random_state=42,
+    n_estimators=150, # More estimators can help learn complex patterns
+    learning_rate=0.1,
+    max_depth=5
+)
+FETCH_WORKERS = 4 # Concurrent OHLCV store refreshes while assembling the training set
+# Bump when create_features/create_target change, so cached training data is rebuilt
+FEATURE_CONFIG_VERSION = 1
 
 def create_features(df):
     """
@@ -54,44 +79,115 @@ def create_target(df):
     df['target'] = (df['Close'].shift(-1) > df['Close']).astype(int)
     return df
 
-def train_new_model():
-    """Fetches data, engineers features, and trains a new XGBoost model."""
-    print("--- Starting New Model Training with Enhanced Features ---")
-    all_stocks_df = pd.DataFrame()
-
-    print(f"Fetching {DATA_PERIOD} of data for {len(STOCKS_TO_TRAIN)} stocks...")
-    for ticker in STOCKS_TO_TRAIN:
-        try:
-            stock_df = yf.download(ticker, period=DATA_PERIOD, progress=False, auto_adjust=True)
-
-            # --- FIX: Handle the MultiIndex column issue from yfinance ---
-            if isinstance(stock_df.columns, pd.MultiIndex):
-                stock_df.columns = stock_df.columns.get_level_values(0)
-
-            if stock_df.empty or len(stock_df) < EMA_LONG:
-                print(f"⏭️ Not enough data for {ticker}. Skipping...")
-                continue
+def _training_cache_path(ticker, period, first_bar, last_bar):
+    """
+    Cache file for one ticker's featurized rows.
 
-            stock_df = create_features(stock_df)
-            stock_df = create_target(stock_df)
-            stock_df.dropna(subset=['target'], inplace=True)
-            
-            all_stocks_df = pd.concat([all_stocks_df, stock_df], ignore_index=True)
-            print(f"✅ Processed {ticker}")
+    The name carries the first and last bar of the window, so the file stays valid until a new
+    session is stored (not just for the calendar day); the digest covers the feature config.
+    """
+    key = json.dumps({
+        'ticker': ticker, 'period': period, 'features': FEATURE_NAMES, 'version': FEATURE_CONFIG_VERSION,
+    }, sort_keys=True)
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return TRAINING_CACHE_DIR / f"{ticker.replace(os.sep, '_')}-{digest}-{first_bar:%Y%m%d}-{last_bar:%Y%m%d}.pkl"
+
+def _load_history(ticker, period):
+    """The ticker's OHLCV history from the store, or the exception that fetching it raised."""
+    try:
+        return ohlcv_store.get_history(ticker, period=period)
+    except Exception as e:
+        return e
+
+def _write_training_cache(ticker, cache_path, stock_df):
+    """Writes the featurized frame and deletes this ticker's superseded cache files."""
+    TRAINING_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    stock_df.to_pickle(tmp_path)
+    os.replace(tmp_path, cache_path)
+    for old in TRAINING_CACHE_DIR.glob(f"{ticker.replace(os.sep, '_')}-*.pkl"):
+        if old != cache_path:
+            old.unlink(missing_ok=True)
+
+def _featurize(ticker, stock_df):
+    """Process-pool worker: the labelled feature frame for one ticker's OHLCV history."""
+    stock_df = create_features(stock_df)
+    stock_df = create_target(stock_df)
+    stock_df.dropna(subset=['target'], inplace=True)
+    stock_df['Ticker'] = ticker
+    return stock_df.reset_index()
+
+def training_window(period=DATA_PERIOD):
+    end = date.today()
+    return end - timedelta(days=period_to_days(period)), end
+
+def build_manifest(**extra):
+    """Manifest stored with every registered model version."""
+    return {
+        'features': FEATURE_NAMES,
+        'featureConfigVersion': FEATURE_CONFIG_VERSION,
+        'thresholds': {'decision': PREDICTION_THRESHOLD},
+        **extra,
+    }
+
+def build_training_dataset(tickers=STOCKS_TO_TRAIN, period=DATA_PERIOD, workers=None, use_cache=True):
+    """
+    Loads `tickers` from the OHLCV store, featurizes them in a process pool and concatenates
+    the frames once.
 
-        except Exception as e:
-            print(f"⚠️ Failed to process {ticker}: {e}")
+    Each ticker's featurized frame is cached on disk until its history gains a new bar, so
+    retraining with the same universe and feature config only tops up the OHLCV store and
+    skips indicator computation. Pool workers are spawned rather than forked (safe from the
+    threaded API server too) and only get the price frames, so they need no store or network.
+    """
+    print(f"Loading {period} of data for {len(tickers)} stocks...")
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        histories = dict(zip(tickers, pool.map(lambda ticker: _load_history(ticker, period), tickers)))
+
+    frames, pending = {}, {}
+    for ticker, stock_df in histories.items():
+        if isinstance(stock_df, Exception):
+            print(f"⚠️ Failed to process {ticker}: {stock_df}")
+        elif stock_df.empty or len(stock_df) < EMA_LONG:
+            print(f"⏭️ Not enough data for {ticker}. Skipping...")
+        else:
+            cache_path = _training_cache_path(ticker, period, stock_df.index[0], stock_df.index[-1])
+            if use_cache and cache_path.exists():
+                frames[ticker] = pd.read_pickle(cache_path)
+                print(f"♻️ Using cached features for {ticker}")
+            else:
+                pending[ticker] = (stock_df, cache_path)
+
+    if pending:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {ticker: pool.submit(_featurize, ticker, stock_df) for ticker, (stock_df, _) in pending.items()}
+            for ticker, future in futures.items():
+                try:
+                    stock_df = future.result()
+                except Exception as e:
+                    print(f"⚠️ Failed to process {ticker}: {e}")
+                    continue
+                _write_training_cache(ticker, pending[ticker][1], stock_df)
+                frames[ticker] = stock_df
+                print(f"✅ Processed {ticker}")
+
+    ordered = [frames[ticker] for ticker in tickers if ticker in frames]
+    if not ordered:
+        return pd.DataFrame()
+    # A single concat instead of growing the frame per ticker
+    return pd.concat(ordered, ignore_index=True)
+
+def train_new_model(tickers=STOCKS_TO_TRAIN, workers=None, use_cache=True, promote=True):
+    """Fetches data, engineers features, trains a new XGBoost model and registers it. Returns the version."""
+    print("--- Starting New Model Training with Enhanced Features ---")
+    all_stocks_df = build_training_dataset(tickers, DATA_PERIOD, workers=workers, use_cache=use_cache)
 
     if all_stocks_df.empty:
         print("❌ No data was successfully processed. Aborting model training.")
         return
 
-    # --- NEW: Updated list of all features for the model to learn from ---
-    feature_names = [
-        f'RSI_{RSI_PERIOD}', f'EMA_{EMA_SHORT}', f'EMA_{EMA_LONG}', 'MACD_12_26_9',
-        'BBL_20_2.0', 'BBM_20_2.0', 'BBU_20_2.0', 'ATRr_14',
-        'STOCHk_14_3_3', 'STOCHd_14_3_3', 'OBV'
-    ]
+    feature_names = FEATURE_NAMES
 
     try:
         X = all_stocks_df[feature_names]
@@ -103,29 +199,42 @@ def train_new_model():
     print(f"\n✅ Training on a final dataset of {len(X)} rows with {len(feature_names)} features.")
     
     # Initialize and train the XGBoost model
-    model = XGBClassifier(
-        use_label_encoder=False, 
-        eval_metric='logloss', 
-        random_state=42,
-        n_estimators=150, # More estimators can help learn complex patterns
-        learning_rate=0.1,
-        max_depth=5
-    )
+    model = XGBClassifier(**MODEL_PARAMS)
     model.fit(X, y)
 
-    print(f"\n💾 Saving new, smarter model to: {MODEL_FILE_PATH}")
-    joblib.dump(model, MODEL_FILE_PATH)
+    start, end = training_window(DATA_PERIOD)
+    version = model_registry.register(model, build_manifest(
+        trainingWindow={'start': start.isoformat(), 'end': end.isoformat(), 'period': DATA_PERIOD},
+        tickers=list(tickers),
+        rows=len(X),
+        params=model.get_xgb_params(),
+    ))
+    if promote:
+        model_registry.promote(version)
     print("✅ Model training complete and saved!")
+    return version
+
+def import_legacy_model(path=MODEL_FILE_PATH):
+    """Re-saves the old joblib-pickled classifier as a native registry version and promotes it."""
+    print(f"📦 Importing legacy model from {path}")
+    version = model_registry.register(joblib.load(path), build_manifest(legacyFile=path.name))
+    model_registry.promote(version)
+    return version
 
 def load_model():
-    """Loads the pre-trained model, or trains a new one if it doesn't exist."""
-    if not MODEL_FILE_PATH.exists():
-        print("⚠️ Model file not found. Training a new model. This may take a few minutes...")
-        train_new_model()
-    
-    print(f"🧠 Loading model from {MODEL_FILE_PATH}")
-    return joblib.load(MODEL_FILE_PATH)
+    """Loads the promoted model version, importing the legacy file or training a new one if there is none."""
+    if model_registry.current_version() is None:
+        if MODEL_FILE_PATH.exists():
+            import_legacy_model()
+        else:
+            print("⚠️ No model found. Training a new model. This may take a few minutes...")
+            train_new_model()
+
+    serving = model_registry.load_current()
+    print(f"🧠 Loaded model version {serving.version}")
+    return serving
 
 if __name__ == '__main__':
+    # Run from /backend with: python -m ml.model
     train_new_model()
 
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from xgboost import XGBClassifier
+
+from .fast_inference import compile_classifier
+
+# --- Configuration ---
+BASE_DIR = Path(__file__).resolve().parent
+REGISTRY_DIR = BASE_DIR / "data" / "models"
+MODEL_FILENAME = "model.ubj" # XGBoost's native binary JSON format
+MANIFEST_FILENAME = "manifest.json"
+CURRENT_POINTER = "CURRENT"
+WATCH_INTERVAL = 10 # Seconds between checks for a newly promoted version
+
+
+class ServingModel:
+    """
+    A loaded model version: the classifier plus the manifest it was trained with.
+
+    Predictions use the booster compiled to NumPy arrays (`fast_inference`) when it matches
+    XGBoost on a parity check at load time, and the XGBoost classifier otherwise.
+    """
+
+    def __init__(self, version, classifier, manifest):
+        self.version = version
+        self.classifier = classifier
+        self.manifest = manifest
+        self.compiled = compile_classifier(classifier)
+
+    @property
+    def features(self):
+        return self.manifest["features"]
+
+    @property
+    def threshold(self):
+        return self.manifest["thresholds"]["decision"]
+
+    def predict_proba(self, features_df):
+        # Column order must match training, whatever order the caller built the frame in
+        return self.predict_proba_rows(features_df[self.features].to_numpy(dtype=np.float32))
+
+    def predict_proba_rows(self, rows, columns=None):
+        """[P(down), P(up)] per row of a plain array whose columns are `columns` (default: training order)."""
+        rows = np.asarray(rows, dtype=np.float32)
+        if columns is not None and list(columns) != self.features:
+            rows = rows[:, [list(columns).index(name) for name in self.features]]
+        if self.compiled is not None:
+            return self.compiled.predict_proba(rows)
+        return self.classifier.predict_proba(rows)
+
+
+class ModelRegistry:
+    """
+    Versioned on-disk model store.
+
+    Each version is a directory holding the booster in native UBJ format and a manifest
+    (feature list, decision thresholds, training window). `CURRENT` names the promoted
+    version; promotion rewrites it atomically, so every worker watching it swaps together.
+    """
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = Path(root)
+
+    def versions(self):
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if (p / MANIFEST_FILENAME).exists())
+
+    def current_version(self):
+        try:
+            return (self.root / CURRENT_POINTER).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def register(self, classifier, manifest):
+        """Saves a trained classifier as a new version and returns the version id."""
+        version = f"{datetime.now(timezone.utc):%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        manifest = {**manifest, "version": version, "createdAt": datetime.now(timezone.utc).isoformat(), "format": "ubj"}
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Build the version in a temp dir and rename it, so a half-written version is never visible
+        tmp_dir = self.root / f".{version}.tmp"
+        tmp_dir.mkdir()
+        try:
+            classifier.save_model(str(tmp_dir / MODEL_FILENAME))
+            with open(tmp_dir / MANIFEST_FILENAME, "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.rename(tmp_dir, self.root / version)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        print(f"💾 Registered model version {version}")
+        return version
+
+    def promote(self, version):
+        """Atomically points `CURRENT` at `version`."""
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version '{version}'.")
+        pointer = self.root / CURRENT_POINTER
+        tmp_pointer = pointer.with_name(f"{CURRENT_POINTER}.{os.getpid()}.tmp")
+        tmp_pointer.write_text(version)
+        os.replace(tmp_pointer, pointer)
+        print(f"🚀 Promoted model version {version}")
+
+    def load(self, version):
+        version_dir = self.root / version
+        with open(version_dir / MANIFEST_FILENAME, "r") as f:
+            manifest = json.load(f)
+        classifier = XGBClassifier()
+        classifier.load_model(str(version_dir / MODEL_FILENAME))
+        return ServingModel(version, classifier, manifest)
+
+    def load_current(self):
+        version = self.current_version()
+        if version is None:
+            raise FileNotFoundError("No model version has been promoted yet.")
+        return self.load(version)
+
+
+class ModelServer:
+    """
+    Holds the model that is currently serving and hot-swaps it when a new version is promoted.
+
+    Requests take a reference to `current` once and use it to the end, so a swap never
+    affects a prediction that is already in flight.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.current = None
+
+    def refresh(self):
+        """Loads the promoted version if it differs from the one serving. Returns True on a swap."""
+        version = self.registry.current_version()
+        if version is None or (self.current is not None and self.current.version == version):
+            return False
+        serving = self.registry.load(version)
+        previous = self.current.version if self.current else None
+        self.current = serving
+        print(f"🧠 Serving model version {version}" + (f" (was {previous})" if previous else ""))
+        return True
+
+    async def watch(self, interval=WATCH_INTERVAL):
+        """Background loop: picks up promotions made by other processes until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"⚠️ Model refresh failed: {e}")
+
+
+# Shared registry used by training and the API
+registry = ModelRegistry()
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.model_registry [list | promote <version>]
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "promote" and len(sys.argv) == 3:
+        registry.promote(sys.argv[2])
+    else:
+        current = registry.current_version()
+        for version in registry.versions():
+            print(f"{'*' if version == current else ' '} {version}")
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+# --- Configuration ---
+BASE_DIR = Path(__file__).resolve().parent
+STORE_DIR = BASE_DIR / "data" / "ohlcv"
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+BAR_DTYPE = np.dtype([("date", "datetime64[D]")] + [(col, "f8") for col in OHLCV_COLUMNS])
+REFRESH_INTERVAL = 300  # Seconds before a ticker is checked upstream again
+ADJUSTMENT_TOLERANCE = 1e-4  # Relative close mismatch that signals a split/dividend re-adjustment
+
+_PERIOD_UNITS = {"d": 1, "wk": 7, "mo": 31, "y": 366}
+
+
+def period_to_days(period):
+    """Converts a yfinance style period ("5d", "3mo", "7y") into a number of calendar days."""
+    for unit in sorted(_PERIOD_UNITS, key=len, reverse=True):
+        if period.endswith(unit) and period[:-len(unit)].isdigit():
+            return int(period[:-len(unit)]) * _PERIOD_UNITS[unit]
+    raise ValueError(f"Unsupported period '{period}'.")
+
+
+def yfinance_fetcher(ticker, start):
+    """Default fetcher: daily adjusted bars for `ticker` from `start` (inclusive) up to today."""
+    return yf.Ticker(ticker).history(start=start.isoformat(), auto_adjust=True)
+
+
+def frame_to_bars(df):
+    """Converts a provider DataFrame (DatetimeIndex + OHLCV columns) into a structured bar array."""
+    if df is None or df.empty:
+        return np.empty(0, dtype=BAR_DTYPE)
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    index = pd.DatetimeIndex(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    bars = np.empty(len(df), dtype=BAR_DTYPE)
+    bars["date"] = index.normalize().values.astype("datetime64[D]")
+    for col in OHLCV_COLUMNS:
+        bars[col] = df[col].to_numpy(dtype="f8")
+    # Keep the last row for any duplicated date, sorted ascending
+    _, last_idx = np.unique(bars["date"][::-1], return_index=True)
+    return bars[len(bars) - 1 - last_idx]
+
+
+def bars_to_frame(bars):
+    """Converts a structured bar array into the OHLCV DataFrame shape the indicators expect."""
+    index = pd.DatetimeIndex(bars["date"].astype("datetime64[ns]"), name="Date")
+    return pd.DataFrame({col: np.asarray(bars[col]) for col in OHLCV_COLUMNS}, index=index)
+
+
+class OHLCVStore:
+    """
+    Persistent per-ticker daily OHLCV store.
+
+    Each ticker lives in a memory-mapped `.npy` file of structured bars plus a small JSON
+    sidecar recording how far back the history was requested. On read, only the bars
+    missing since the last stored date are fetched and appended. The fetcher is any
+    callable `fetcher(ticker, start_date) -> DataFrame`, so the store can run offline
+    against a fake provider.
+    """
+
+    def __init__(self, root=STORE_DIR, fetcher=yfinance_fetcher, refresh_interval=REFRESH_INTERVAL):
+        self.root = Path(root)
+        self.fetcher = fetcher
+        self.refresh_interval = refresh_interval
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._last_refresh = {}
+
+    # --- File layout ---
+    def _paths(self, ticker):
+        name = ticker.upper().replace(os.sep, "_")
+        return self.root / f"{name}.npy", self.root / f"{name}.json"
+
+    def _lock(self, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault(ticker.upper(), threading.Lock())
+
+    def load(self, ticker):
+        """Returns the stored bars for `ticker` (memory-mapped, read-only) and the covered-from date."""
+        bars_path, meta_path = self._paths(ticker)
+        if not bars_path.exists() or not meta_path.exists():
+            return None, None
+        with open(meta_path, "r") as f:
+            covered_from = date.fromisoformat(json.load(f)["covered_from"])
+        return np.load(bars_path, mmap_mode="r"), covered_from
+
+    def _write(self, ticker, bars, covered_from):
+        bars_path, meta_path = self._paths(ticker)
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_bars = bars_path.with_name(f"{bars_path.name}.{os.getpid()}.tmp")
+        with open(tmp_bars, "wb") as f:
+            np.save(f, np.ascontiguousarray(bars, dtype=BAR_DTYPE))
+        tmp_meta = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp")
+        with open(tmp_meta, "w") as f:
+            json.dump({"covered_from": covered_from.isoformat()}, f)
+        os.replace(tmp_bars, bars_path)
+        os.replace(tmp_meta, meta_path)
+
+    # --- Sync with the provider ---
+    def refresh(self, ticker, start):
+        """Makes sure the stored history for `ticker` covers `start` onwards and is up to date."""
+        with self._lock(ticker):
+            bars, covered_from = self.load(ticker)
+            key = ticker.upper()
+
+            if bars is None or covered_from > start:
+                # Nothing stored yet, or the caller wants more history than we have.
+                bars = frame_to_bars(self.fetcher(ticker, start))
+                self._write(ticker, bars, start)
+                self._last_refresh[key] = time.monotonic()
+                return bars
+
+            last_checked = self._last_refresh.get(key)
+            if last_checked is not None and time.monotonic() - last_checked < self.refresh_interval:
+                return bars
+            if len(bars) == 0:
+                new_bars = frame_to_bars(self.fetcher(ticker, covered_from))
+                self._write(ticker, new_bars, covered_from)
+                self._last_refresh[key] = time.monotonic()
+                return new_bars
+
+            # Re-fetch from the second-to-last stored bar: the last one may be an in-progress session
+            # that needs overwriting, and the one before it is a settled close we can compare against.
+            anchor = bars["date"][-2] if len(bars) > 1 else bars["date"][-1]
+            new_bars = frame_to_bars(self.fetcher(ticker, anchor.astype(object)))
+            self._last_refresh[key] = time.monotonic()
+            if len(new_bars) == 0:
+                return bars
+
+            if len(bars) > 1:
+                settled = new_bars[new_bars["date"] == anchor]
+                stored_close = bars["Close"][-2]
+                if len(settled) and stored_close and abs(settled["Close"][0] / stored_close - 1) > ADJUSTMENT_TOLERANCE:
+                    # Auto-adjusted history shifts after a split or dividend, so the stored bars are stale.
+                    print(f"♻️ Price adjustment detected for {ticker}. Re-fetching full history.")
+                    bars = frame_to_bars(self.fetcher(ticker, covered_from))
+                    self._write(ticker, bars, covered_from)
+                    return bars
+
+            merged = np.concatenate([np.asarray(bars[bars["date"] < new_bars["date"][0]]), new_bars])
+            self._write(ticker, merged, covered_from)
+            return merged
+
+    def get_history(self, ticker, period="3y"):
+        """Returns the last `period` of daily bars for `ticker` as an OHLCV DataFrame."""
+        start = date.today() - timedelta(days=period_to_days(period))
+        bars = self.refresh(ticker, start)
+        return bars_to_frame(bars[bars["date"] >= np.datetime64(start, "D")])
+
+
+# Shared store used by the API and the training pipeline
+store = OHLCVStore()
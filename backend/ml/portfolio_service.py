@@ -0,0 +1,509 @@
+import copy
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date
+
+from .metrics import stage
+
+# --- Configuration ---
+STARTING_CASH = 1000000 # Start with ₹10 Lakh
+SNAPSHOT_TTL = 60 # Seconds a cached portfolio is trusted at most (bounds staleness from writes on other hosts)
+MAX_CACHED_PORTFOLIOS = 10000
+RSI_OVERBOUGHT = 70
+RSI_OVERSOLD = 30
+SECTOR_CONCENTRATION_LIMIT = 40 # Percent of portfolio value in one sector before we warn
+MAX_ORDERS_PER_BATCH = 50
+LEDGER_COLLECTION = 'ledger' # Subcollection of each portfolio: one append-only entry per committed batch
+MAX_TRANSACTION_ATTEMPTS = 5 # Same as the Firestore client's default
+FIRESTORE_EXHAUSTED = "Failed to commit transaction in" # ValueError text of @firestore.transactional giving up
+
+
+class TooMuchContention(Exception):
+    """A transaction kept conflicting with concurrent writes and gave up."""
+
+
+class OrderError(ValueError):
+    """An order in a batch is invalid or can't be filled; `reason` is the message without the order prefix."""
+
+    def __init__(self, prefix, reason):
+        super().__init__(f"{prefix}: {reason}")
+        self.reason = reason
+
+
+def new_portfolio():
+    return {'cashBalance': STARTING_CASH, 'holdings': {}}
+
+
+# --- Trade rules (pure functions over a portfolio dict) ---
+def _buy(portfolio, symbol, quantity, price):
+    """Buys into `portfolio` in place, or raises ValueError for insufficient funds."""
+    cost = quantity * price
+
+    if portfolio.get('cashBalance', 0) < cost:
+        raise ValueError("Insufficient funds.")
+
+    portfolio['cashBalance'] = portfolio['cashBalance'] - cost
+    holdings = portfolio.setdefault('holdings', {})
+
+    if symbol in holdings:
+        old_qty = holdings[symbol]['quantity']
+        old_avg = holdings[symbol]['averagePrice']
+        new_qty = old_qty + quantity
+        new_avg = ((old_qty * old_avg) + cost) / new_qty
+        holdings[symbol].update({'quantity': new_qty, 'averagePrice': new_avg})
+    else:
+        holdings[symbol] = {'quantity': quantity, 'averagePrice': price}
+
+
+def _sell(portfolio, symbol, quantity, price):
+    """Sells from `portfolio` in place, or raises ValueError if the holding is too small."""
+    holdings = portfolio.get('holdings', {})
+
+    if symbol not in holdings or holdings[symbol]['quantity'] < quantity:
+        raise ValueError("Not enough shares to sell.")
+
+    portfolio['cashBalance'] = portfolio['cashBalance'] + quantity * price
+    holdings[symbol]['quantity'] -= quantity
+    if holdings[symbol]['quantity'] == 0:
+        del holdings[symbol]
+
+
+def validate_orders(orders):
+    """Normalized copies of `orders` ({'side', 'symbol', 'quantity', 'price'} each), or raises ValueError."""
+    if not orders:
+        raise ValueError("No orders given.")
+    if len(orders) > MAX_ORDERS_PER_BATCH:
+        raise ValueError(f"At most {MAX_ORDERS_PER_BATCH} orders per batch.")
+    normalized = []
+    for i, order in enumerate(orders, start=1):
+        side, symbol = str(order.get('side', '')).lower(), str(order.get('symbol', '')).strip()
+        quantity, price = order.get('quantity'), order.get('price')
+        if side not in ('buy', 'sell'):
+            raise OrderError(f"Order {i}", "side must be 'buy' or 'sell'.")
+        if not symbol:
+            raise OrderError(f"Order {i}", "symbol is required.")
+        if not isinstance(quantity, int) or quantity <= 0:
+            raise OrderError(f"Order {i}", "quantity must be a positive whole number.")
+        if not isinstance(price, (int, float)) or not price > 0:
+            raise OrderError(f"Order {i}", "price must be positive.")
+        normalized.append({'side': side, 'symbol': symbol, 'quantity': quantity, 'price': float(price)})
+    return normalized
+
+
+def apply_orders(portfolio, orders):
+    """
+    Returns the portfolio after applying validated `orders` in list order, or raises ValueError
+    naming the first order that can't be filled (then nothing is applied). Put sells before
+    buys to spend their proceeds. `portfolio` may be None (new user).
+    """
+    portfolio = copy.deepcopy(portfolio) if portfolio is not None else new_portfolio()
+    for i, order in enumerate(orders, start=1):
+        trade = _buy if order['side'] == 'buy' else _sell
+        try:
+            trade(portfolio, order['symbol'], order['quantity'], order['price'])
+        except ValueError as e:
+            raise OrderError(f"Order {i} ({order['side']} {order['quantity']} {order['symbol']})", str(e)) from None
+    return portfolio
+
+
+def ledger_entry(batch_id, seq, orders, cash_balance):
+    """A compact ledger record of one batch: the orders as parallel arrays (Firestore can't nest arrays)."""
+    return {
+        'batchId': batch_id,
+        'seq': seq,
+        'sides': "".join('B' if o['side'] == 'buy' else 'S' for o in orders),
+        'symbols': [o['symbol'] for o in orders],
+        'quantities': [o['quantity'] for o in orders],
+        'prices': [o['price'] for o in orders],
+        'cashBalance': cash_balance,
+    }
+
+
+# --- Repositories ---
+class FirestorePortfolioRepository:
+    """
+    Portfolios stored as `portfolios/{uid}` documents, with each committed batch of orders
+    appended to `portfolios/{uid}/ledger/{batchId}`. The portfolio document only holds the
+    current state, so it stays the same size however many trades are made.
+
+    Works unchanged against the Firestore emulator: the client picks up FIRESTORE_EMULATOR_HOST.
+    """
+
+    def __init__(self, db, collection='portfolios', ledger_collection=LEDGER_COLLECTION):
+        self.db = db
+        self.collection = collection
+        self.ledger_collection = ledger_collection
+
+    def _ref(self, user_id):
+        return self.db.collection(self.collection).document(user_id)
+
+    def get(self, user_id):
+        with stage("firestore"):
+            doc = self._ref(user_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def create(self, user_id, portfolio):
+        with stage("firestore"):
+            self._ref(user_id).set(portfolio)
+
+    def commit_orders(self, user_id, batch_id, mutate):
+        """
+        Runs `mutate(current or None) -> (portfolio, ledger entry)` in one transaction that writes
+        both. Returns (portfolio, entry, applied); if the ledger already has `batch_id` (a retried
+        request) nothing is written and the current portfolio and recorded entry are returned.
+        """
+        from firebase_admin import firestore
+
+        portfolio_ref = self._ref(user_id)
+        entry_ref = portfolio_ref.collection(self.ledger_collection).document(batch_id)
+
+        @firestore.transactional
+        def commit_in_transaction(transaction):
+            # Both reads in one round trip
+            snapshots = {s.reference.path: s for s in transaction.get_all([portfolio_ref, entry_ref])}
+            snapshot, existing = snapshots[portfolio_ref.path], snapshots[entry_ref.path]
+            current = snapshot.to_dict() if snapshot.exists else None
+            if existing.exists:
+                return current, existing.to_dict(), False
+            portfolio, entry = mutate(current)
+            transaction.set(portfolio_ref, portfolio)
+            transaction.create(entry_ref, {**entry, 'at': firestore.SERVER_TIMESTAMP})
+            return portfolio, entry, True
+
+        with stage("firestore"):
+            try:
+                return commit_in_transaction(self.db.transaction())
+            except ValueError as e:
+                # Retries exhausted by conflicting writes: the same outcome the in-memory fake reports
+                if str(e).startswith(FIRESTORE_EXHAUSTED):
+                    raise TooMuchContention(str(e)) from e
+                raise
+
+    def ledger(self, user_id, limit):
+        """The user's `limit` most recent ledger entries, newest first."""
+        from firebase_admin import firestore
+
+        query = (self._ref(user_id).collection(self.ledger_collection)
+                 .order_by('seq', direction=firestore.Query.DESCENDING).limit(limit))
+        with stage("firestore"):
+            return [doc.to_dict() for doc in query.stream()]
+
+
+class InMemoryPortfolioRepository:
+    """
+    Process-local fake with the same interface, for tests and offline runs.
+
+    Transactions are optimistic like Firestore's: read a version, run the mutation, and commit
+    only if no one else committed to that portfolio in between, else back off (jittered,
+    doubling) and retry, up to `max_attempts`. `latency` (seconds per read and per commit)
+    simulates the database round trips, which is what makes concurrent transactions on one
+    document collide.
+    """
+
+    def __init__(self, portfolios=None, latency=0.0, max_attempts=MAX_TRANSACTION_ATTEMPTS):
+        self._portfolios = copy.deepcopy(portfolios or {})
+        self._versions = {}
+        self._ledgers = {} # user_id -> {batch_id: entry}, in commit order
+        self._lock = threading.Lock()
+        self.latency = latency
+        self.max_attempts = max_attempts
+        self.reads = 0
+        self.writes = 0
+        self.transactions = 0
+        self.conflicts = 0
+
+    def get(self, user_id):
+        with self._lock:
+            self.reads += 1
+            return copy.deepcopy(self._portfolios.get(user_id))
+
+    def create(self, user_id, portfolio):
+        with self._lock:
+            self.writes += 1
+            self._portfolios[user_id] = copy.deepcopy(portfolio)
+
+    def commit_orders(self, user_id, batch_id, mutate):
+        for attempt in range(self.max_attempts):
+            if attempt and self.latency:
+                time.sleep(random.uniform(0, self.latency * 2 ** attempt))
+            self.transactions += 1
+            with self._lock:
+                self.reads += 1
+                version = self._versions.get(user_id, 0)
+                current = copy.deepcopy(self._portfolios.get(user_id))
+                existing = self._ledgers.get(user_id, {}).get(batch_id)
+            if existing is not None:
+                return current, copy.deepcopy(existing), False
+            if self.latency:
+                time.sleep(self.latency)
+            portfolio, entry = mutate(current)
+            if self.latency:
+                time.sleep(self.latency)
+            with self._lock:
+                if self._versions.get(user_id, 0) == version:
+                    self.writes += 1
+                    self._versions[user_id] = version + 1
+                    self._portfolios[user_id] = copy.deepcopy(portfolio)
+                    self._ledgers.setdefault(user_id, {})[batch_id] = {**copy.deepcopy(entry), 'at': time.time()}
+                    return portfolio, entry, True
+                self.conflicts += 1
+        raise TooMuchContention(f"Failed to commit transaction in {self.max_attempts} attempts.")
+
+    def ledger(self, user_id, limit):
+        with self._lock:
+            entries = list(self._ledgers.get(user_id, {}).values())
+        return copy.deepcopy(entries[::-1][:limit])
+
+
+class PortfolioService:
+    """
+    Portfolio reads, trades and insights on top of a repository.
+
+    Portfolios are cached per user; a trade replaces the cached copy with the state its
+    transaction committed, so the next read doesn't go back to the database. With a `shared`
+    cache, every commit also bumps the user's stamp there, and a cached copy is only served
+    while the stamp is unchanged, so a trade handled by another worker on the host is seen on
+    the next read (a stat call, no database round trip). Insights value all
+    holdings from one batched `load_quotes(symbols)` call and reuse RSI values computed earlier
+    the same day by `load_rsi(symbols)`, so users holding the same stock share one computation.
+    Both loaders are async and return {symbol: value or Exception}.
+    """
+
+    def __init__(self, repository, load_quotes, load_rsi, snapshot_ttl=SNAPSHOT_TTL, max_entries=MAX_CACHED_PORTFOLIOS,
+                 shared=None):
+        self.repository = repository
+        self.load_quotes = load_quotes
+        self.load_rsi = load_rsi
+        self.snapshot_ttl = snapshot_ttl
+        self.max_entries = max_entries
+        self.shared = shared
+        self._snapshots = OrderedDict() # user_id -> (portfolio, cached_at, shared stamp)
+        self._rsi = {} # symbol -> (day, value)
+        self._lock = threading.Lock()
+        self.snapshot_hits = 0
+        self.snapshot_misses = 0
+        self.rsi_hits = 0
+        self.rsi_misses = 0
+
+    # --- Snapshot cache ---
+    def _stamp(self, user_id):
+        return self.shared.stamp("portfolios", user_id) if self.shared is not None else None
+
+    def _cache(self, user_id, portfolio, stamp):
+        with self._lock:
+            self._snapshots[user_id] = (copy.deepcopy(portfolio), time.monotonic(), stamp)
+            self._snapshots.move_to_end(user_id)
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._snapshots.pop(user_id, None)
+
+    def get_portfolio(self, user_id, create_missing=True):
+        """The user's portfolio (a copy), creating the starting portfolio if `create_missing`."""
+        with self._lock:
+            cached = self._snapshots.get(user_id)
+        stamp = self._stamp(user_id) # Taken before the read, so a commit racing it forces a re-read next time
+        if cached is not None and time.monotonic() - cached[1] < self.snapshot_ttl and cached[2] == stamp:
+            self.snapshot_hits += 1
+            return copy.deepcopy(cached[0])
+
+        self.snapshot_misses += 1
+        portfolio = self.repository.get(user_id)
+        if portfolio is None:
+            if not create_missing:
+                return None
+            print(f"Creating new portfolio for user {user_id}")
+            portfolio = new_portfolio()
+            self.repository.create(user_id, portfolio)
+        self._cache(user_id, portfolio, stamp)
+        return portfolio
+
+    # --- Trades ---
+    def place_orders(self, user_id, orders, batch_id=None, create_missing=True):
+        """
+        Validates and applies `orders` all-or-nothing in one transaction, appending one ledger
+        entry. Raises ValueError (an OrderError naming the order) if any order is invalid or
+        can't be filled, and TooMuchContention if concurrent writes keep conflicting. Passing
+        the same `batch_id` again (e.g. a client retry) returns the first result without
+        reapplying. Without `create_missing`, a user with no portfolio gets "Portfolio not found."
+        Returns (portfolio, ledger entry, applied).
+        """
+        orders = validate_orders(orders)
+        batch_id = batch_id or uuid.uuid4().hex
+
+        def mutate(current):
+            if current is None and not create_missing:
+                raise ValueError("Portfolio not found.")
+            portfolio = apply_orders(current, orders)
+            portfolio['ledgerSeq'] = portfolio.get('ledgerSeq', 0) + 1
+            return portfolio, ledger_entry(batch_id, portfolio['ledgerSeq'], orders, portfolio['cashBalance'])
+
+        stamp = self._stamp(user_id)
+        try:
+            portfolio, entry, applied = self.repository.commit_orders(user_id, batch_id, mutate)
+        except Exception:
+            # The transaction may have partly run against stale data; re-read next time
+            self.invalidate(user_id)
+            raise
+        if applied and self.shared is not None:
+            stamp = self.shared.bump("portfolios", user_id)
+        if portfolio is not None:
+            self._cache(user_id, portfolio, stamp)
+        return portfolio, entry, applied
+
+    def _trade(self, user_id, side, symbol, quantity, price, create_missing):
+        """One order as its own batch, raising the single-trade endpoints' unprefixed messages."""
+        try:
+            portfolio, _, _ = self.place_orders(
+                user_id, [{'side': side, 'symbol': symbol, 'quantity': quantity, 'price': price}], create_missing=create_missing)
+        except OrderError as e:
+            raise ValueError(e.reason) from None
+        return portfolio['cashBalance']
+
+    def buy(self, user_id, symbol, quantity, price):
+        """Buys and returns the new cash balance. Raises ValueError for insufficient funds."""
+        return self._trade(user_id, 'buy', symbol, quantity, price, create_missing=True)
+
+    def sell(self, user_id, symbol, quantity, price):
+        """Sells and returns the new cash balance. Raises ValueError if the holding is too small or there's no portfolio."""
+        return self._trade(user_id, 'sell', symbol, quantity, price, create_missing=False)
+
+    def ledger(self, user_id, limit=50):
+        """The user's most recent committed batches, newest first."""
+        return self.repository.ledger(user_id, limit)
+
+    def stats(self):
+        return {
+            "cachedPortfolios": len(self._snapshots),
+            "snapshotHits": self.snapshot_hits,
+            "snapshotMisses": self.snapshot_misses,
+            "rsiHits": self.rsi_hits,
+            "rsiMisses": self.rsi_misses,
+        }
+
+    # --- Insights ---
+    async def rsi_for(self, symbols):
+        """{symbol: RSI or Exception}, computing each symbol at most once per day."""
+        today = date.today()
+        results, missing = {}, []
+        for symbol in symbols:
+            cached = self._rsi.get(symbol)
+            if cached is not None and cached[0] == today:
+                results[symbol] = cached[1]
+            else:
+                missing.append(symbol)
+        self.rsi_hits += len(results)
+        self.rsi_misses += len(missing)
+        if missing:
+            for symbol, value in (await self.load_rsi(missing)).items():
+                if not isinstance(value, Exception):
+                    self._rsi[symbol] = (today, value)
+                results[symbol] = value
+        return results
+
+    async def insights(self, portfolio):
+        holdings = portfolio.get('holdings', {}) if portfolio else {}
+        if not holdings:
+            return [] # Return empty if no portfolio or holdings
+
+        insights = []
+        sector_concentration = {}
+        total_portfolio_value = 0
+        quotes = await self.load_quotes(list(holdings))
+
+        for symbol, holding_data in holdings.items():
+            stock_info = quotes.get(symbol)
+            if stock_info is None or isinstance(stock_info, Exception):
+                continue
+            current_price = stock_info.get('currentPrice', holding_data['averagePrice'])
+            holding_value = holding_data['quantity'] * current_price
+            sector = stock_info.get('sector', 'Other')
+
+            total_portfolio_value += holding_value
+            sector_concentration[sector] = sector_concentration.get(sector, 0) + holding_value
+
+        # Generate Sector Concentration Insight
+        if total_portfolio_value > 0:
+            for sector, value in sector_concentration.items():
+                concentration = (value / total_portfolio_value) * 100
+                if concentration > SECTOR_CONCENTRATION_LIMIT:
+                    insights.append(f"High concentration risk: {concentration:.0f}% of your portfolio is in the {sector} sector.")
+
+        # Individual stock insights
+        rsi_values = await self.rsi_for(list(holdings))
+        for symbol in holdings:
+            rsi = rsi_values.get(symbol)
+            if rsi is None or isinstance(rsi, Exception) or rsi != rsi: # rsi != rsi filters NaN
+                continue
+            if rsi > RSI_OVERBOUGHT:
+                insights.append(f"Potential risk for {symbol.replace('.NS','')}: RSI is {rsi:.0f}, indicating it may be overbought.")
+            elif rsi < RSI_OVERSOLD:
+                insights.append(f"Potential opportunity for {symbol.replace('.NS','')}: RSI is {rsi:.0f}, indicating it may be oversold.")
+        return insights
+
+
+# --- Contention benchmark ---
+def benchmark_contention(clients=8, orders=10, rounds=5, latency=0.005):
+    """
+    `clients` threads rebalance one portfolio at once, `rounds` times each, against the in-memory
+    fake with `latency` seconds per round trip: once placing each of the `orders` as its own
+    transaction (as /portfolio/buy and /sell do), once as a single /portfolio/orders batch.
+    Afterwards the final portfolio is replayed from the ledger to check nothing was lost.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    symbols = [f"SYM{i}.NS" for i in range(orders)]
+    start_portfolio = {'cashBalance': 1e9, 'holdings': {s: {'quantity': 10**6, 'averagePrice': 100.0} for s in symbols}}
+
+    def rebalance(client, round_):
+        # Sell one lot of half the symbols and buy the other half; sells first so buys can spend the proceeds
+        flip = (client + round_) % 2
+        sells = [{'side': 'sell', 'symbol': s, 'quantity': 10, 'price': 101.0} for i, s in enumerate(symbols) if i % 2 == flip]
+        buys = [{'side': 'buy', 'symbol': s, 'quantity': 10, 'price': 99.0} for i, s in enumerate(symbols) if i % 2 != flip]
+        return sells + buys
+
+    for mode in ("per-order", "batch"):
+        repository = InMemoryPortfolioRepository({'user': start_portfolio}, latency=latency)
+        service = PortfolioService(repository, load_quotes=None, load_rsi=None)
+        failed = []
+
+        def run_client(client):
+            for round_ in range(rounds):
+                batch = rebalance(client, round_)
+                try:
+                    if mode == "batch":
+                        service.place_orders('user', batch)
+                    else:
+                        for order in batch:
+                            service.place_orders('user', [order])
+                except TooMuchContention:
+                    failed.append(len(batch)) # Per order: the rest of the rebalance is abandoned half-done
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(run_client, range(clients)))
+        seconds = time.perf_counter() - start
+
+        # Replay every committed ledger entry onto the starting portfolio: it must reproduce the stored one
+        entries = repository.ledger('user', limit=10**9)[::-1]
+        replayed = copy.deepcopy(start_portfolio)
+        for entry in entries:
+            for side, symbol, quantity, price in zip(entry['sides'], entry['symbols'], entry['quantities'], entry['prices']):
+                (_buy if side == 'B' else _sell)(replayed, symbol, quantity, price)
+        final = repository.get('user')
+        assert abs(replayed['cashBalance'] - final['cashBalance']) < 1e-6 and replayed['holdings'] == final['holdings']
+
+        committed = sum(len(e['sides']) for e in entries)
+        print(f"{mode:<10} {seconds:>6.2f}s  {committed / seconds:>7.0f} orders/s  transactions {repository.transactions:>5}  "
+              f"conflicts {repository.conflicts:>5}  committed {committed:>4}/{clients * rounds * orders} orders  "
+              f"rebalances failed {len(failed)}/{clients * rounds}  ledger entries {len(entries)}")
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.portfolio_service
+    benchmark_contention()
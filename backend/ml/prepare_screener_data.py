@@ -1,15 +1,248 @@
 # /backend/ml/prepare_screener_data.py
 import yfinance as yf
 import pandas as pd
+import argparse
 import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import time
 
 BASE_DIR = Path(__file__).resolve().parent
-INPUT_CSV_PATH = BASE_DIR / "nse_stocks.csv" 
+INPUT_CSV_PATH = BASE_DIR / "nse_stocks.csv"
 OUTPUT_JSON_PATH = BASE_DIR / "screener_data.json"
+META_JSON_PATH = BASE_DIR / "screener_data.meta.json" # symbol -> last refresh time (unix seconds)
+CHECKPOINT_PATH = BASE_DIR / "screener_checkpoint.jsonl"
 
-def gather_data():
+DEFAULT_WORKERS = 8
+DEFAULT_MAX_AGE_DAYS = 7 # Incremental mode refreshes symbols older than this
+
+def yfinance_provider(ticker_str):
+    """Default provider: the full `.info` dict for one symbol."""
+    return yf.Ticker(ticker_str).info
+
+def is_valid_symbol(symbol):
+    # We only want to process main equity stocks, not debentures or weird tickers
+    return '-' not in symbol and len(symbol) <= 12
+
+def build_record(symbol, info):
+    """Turns a provider `.info` dict into a screener row, or None when critical data is missing."""
+    market_cap = info.get('marketCap', 0)
+    price = info.get('currentPrice', info.get('regularMarketPrice', 0))
+
+    # Skip stocks with no market cap or price data
+    if not market_cap or not price:
+        return None
+
+    return {
+        'symbol': symbol,
+        'price': price,
+        'marketCap': market_cap,
+        'peRatio': info.get('trailingPE'),
+        'pbRatio': info.get('priceToBook'),
+        'dividendYield': round((info.get('dividendYield') or 0) * 100, 2),
+        'sector': info.get('sector', 'N/A'),
+    }
+
+def is_throttle_error(error):
+    message = str(error).lower()
+    return '429' in message or 'too many requests' in message or 'rate limit' in message
+
+def write_json_atomic(path, data):
+    """Writes JSON to a temp file and renames it over `path`, so readers never see a partial file."""
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class AdaptiveRateLimiter:
+    """
+    Thread-safe request pacer with AIMD control: the rate creeps up after successes and is
+    halved when the provider throttles us, replacing the old fixed `time.sleep(0.2)`.
+    """
+
+    def __init__(self, rate=5.0, min_rate=0.5, max_rate=20.0, increase=0.1):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + 1.0 / self.rate
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            # Back off before anyone else goes out
+            self._next_slot = time.monotonic() + 1.0 / self.rate
+
+
+class Checkpoint:
+    """Append-only JSONL log of finished symbols, so an interrupted run can resume."""
+
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Returns {symbol: entry} for symbols that finished (ok or skipped) in a previous run."""
+        done = {}
+        if not self.path.exists():
+            return done
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue # A torn last line from a crash
+                if entry['status'] in ('ok', 'skipped'):
+                    done[entry['symbol']] = entry
+        return done
+
+    def append(self, entry):
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+
+    def clear(self):
+        if self.path.exists():
+            self.path.unlink()
+
+
+class ScreenerDataBuilder:
+    """Builds `screener_data.json` with a worker pool, adaptive rate limiting and checkpointing."""
+
+    def __init__(self, provider=yfinance_provider, workers=DEFAULT_WORKERS, limiter=None, retries=3,
+                 output_path=OUTPUT_JSON_PATH, meta_path=META_JSON_PATH, checkpoint_path=CHECKPOINT_PATH):
+        self.provider = provider
+        self.workers = workers
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.retries = retries
+        self.output_path = Path(output_path)
+        self.meta_path = Path(meta_path)
+        self.checkpoint = Checkpoint(checkpoint_path)
+
+    def _process(self, symbol):
+        ticker_str = f"{symbol}.NS"
+        for attempt in range(self.retries):
+            self.limiter.acquire()
+            try:
+                info = self.provider(ticker_str)
+            except Exception as e:
+                if is_throttle_error(e) and attempt < self.retries - 1:
+                    self.limiter.on_throttle()
+                    continue
+                # yfinance often throws errors for delisted or obscure tickers, which is normal.
+                return {'symbol': symbol, 'status': 'failed', 'error': str(e) or e.__class__.__name__}
+            self.limiter.on_success()
+            record = build_record(symbol, info)
+            status = 'ok' if record else 'skipped'
+            return {'symbol': symbol, 'status': status, 'record': record, 'updatedAt': time.time()}
+
+    def _load_existing(self):
+        try:
+            with open(self.output_path, 'r') as f:
+                records = {r['symbol']: r for r in json.load(f)}
+        except FileNotFoundError:
+            records = {}
+        try:
+            with open(self.meta_path, 'r') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            meta = {}
+        return records, meta
+
+    def run(self, symbols, incremental=False, max_age_days=DEFAULT_MAX_AGE_DAYS, resume=True):
+        """Processes `symbols` and writes the screener JSON. Returns a report dict."""
+        symbols = [s for s in dict.fromkeys(symbols) if is_valid_symbol(s)]
+        existing, meta = self._load_existing()
+
+        # Incremental mode keeps fresh rows as they are and only refreshes stale or unknown symbols
+        if incremental:
+            cutoff = time.time() - max_age_days * 86400
+            todo = [s for s in symbols if meta.get(s, 0) < cutoff]
+        else:
+            todo = symbols
+
+        finished = self.checkpoint.load() if resume else {}
+        if not resume:
+            self.checkpoint.clear()
+        pending = [s for s in todo if s not in finished]
+        print(f"✅ {len(symbols)} symbols, {len(todo)} to refresh, {len(todo) - len(pending)} already done in a previous run.")
+
+        results = dict(finished)
+        failures = {}
+        start_time = time.time()
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            futures = {executor.submit(self._process, s): s for s in pending}
+            for i, future in enumerate(as_completed(futures), start=1):
+                entry = future.result()
+                self.checkpoint.append(entry)
+                if entry['status'] == 'failed':
+                    failures[entry['symbol']] = entry['error']
+                else:
+                    results[entry['symbol']] = entry
+                if i % 100 == 0 or i == len(pending):
+                    elapsed = time.time() - start_time
+                    print(f"Processed {i}/{len(pending)} ({i / elapsed:.1f} symbols/s, {self.limiter.rate:.1f} req/s allowed)")
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            print(f"\n⏸️ Interrupted. Progress is saved to {self.checkpoint.path.name}; run again to resume.")
+            raise
+        executor.shutdown()
+        elapsed = time.time() - start_time
+
+        # Merge: freshly processed rows win, untouched symbols keep their previous row
+        records, new_meta = [], {}
+        for symbol in symbols:
+            entry = results.get(symbol)
+            if entry is not None:
+                if entry['record']:
+                    records.append(entry['record'])
+                new_meta[symbol] = entry['updatedAt']
+            elif symbol in existing and (incremental or symbol in failures):
+                records.append(existing[symbol])
+                if symbol in meta:
+                    new_meta[symbol] = meta[symbol]
+
+        write_json_atomic(self.output_path, records)
+        write_json_atomic(self.meta_path, new_meta)
+        self.checkpoint.clear()
+
+        report = {
+            'symbols': len(symbols),
+            'refreshed': len(pending),
+            'written': len(records),
+            'failed': len(failures),
+            'elapsedSeconds': round(elapsed, 2),
+            'symbolsPerSecond': round(len(pending) / elapsed, 2) if elapsed > 0 else None,
+            'failures': failures,
+        }
+        print(f"\n✅ Wrote {len(records)} stocks in {elapsed / 60:.2f} minutes "
+              f"({report['symbolsPerSecond']} symbols/s, {len(failures)} failures).")
+        for symbol, error in sorted(failures.items()):
+            print(f" -> {symbol}: {error}")
+        return report
+
+
+def gather_data(workers=DEFAULT_WORKERS, incremental=False, max_age_days=DEFAULT_MAX_AGE_DAYS, resume=True, provider=yfinance_provider):
     try:
         all_symbols_df = pd.read_csv(INPUT_CSV_PATH)
         symbols = all_symbols_df['SYMBOL'].tolist()
@@ -18,55 +251,16 @@ def gather_data():
         print(f"❌ ERROR: nse_stocks.csv not found in /backend/ml/. Please complete Step 1.A first.")
         return
 
-    all_stock_data = []
-    total_symbols = len(symbols)
-    start_time = time.time()
-
-    for i, symbol in enumerate(symbols):
-        # We only want to process main equity stocks, not debentures or weird tickers
-        if '-' in symbol or len(symbol) > 12:
-            print(f"-> Skipping invalid-looking symbol: {symbol}")
-            continue
-            
-        ticker_str = f"{symbol}.NS"
-        print(f"Processing ({i+1}/{total_symbols}): {ticker_str}...")
-        
-        try:
-            stock = yf.Ticker(ticker_str)
-            info = stock.info
-
-            market_cap = info.get('marketCap', 0)
-            price = info.get('currentPrice', info.get('regularMarketPrice', 0))
-
-            # Skip stocks with no market cap or price data
-            if not market_cap or not price:
-                print(f" -> Skipping {ticker_str} (missing critical data).")
-                continue
-
-            all_stock_data.append({
-                'symbol': symbol,
-                'price': price,
-                'marketCap': market_cap,
-                'peRatio': info.get('trailingPE'),
-                'pbRatio': info.get('priceToBook'),
-                'dividendYield': round(info.get('dividendYield', 0) * 100, 2),
-                'sector': info.get('sector', 'N/A'),
-            })
-            # Add a small delay to be respectful to the data provider's servers
-            time.sleep(0.2) 
-
-        except Exception as e:
-            # yfinance often throws errors for delisted or obscure tickers, which is normal.
-            print(f" -> ERROR processing {ticker_str}. Skipping.")
-            continue
-
-    end_time = time.time()
-    print(f"\n✅ Successfully processed {len(all_stock_data)} stocks in {((end_time - start_time) / 60):.2f} minutes.")
-    
-    with open(OUTPUT_JSON_PATH, 'w') as f:
-        json.dump(all_stock_data, f)
-        
+    builder = ScreenerDataBuilder(provider=provider, workers=workers)
+    report = builder.run(symbols, incremental=incremental, max_age_days=max_age_days, resume=resume)
     print(f"✅ Data saved to screener_data.json!")
+    return report
 
 if __name__ == '__main__':
-    gather_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build screener_data.json from nse_stocks.csv")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--incremental', action='store_true', help="Only refresh symbols older than --max-age-days")
+    parser.add_argument('--max-age-days', type=float, default=DEFAULT_MAX_AGE_DAYS)
+    parser.add_argument('--fresh', action='store_true', help="Ignore the checkpoint from an interrupted run")
+    args = parser.parse_args()
+    gather_data(workers=args.workers, incremental=args.incremental, max_age_days=args.max_age_days, resume=not args.fresh)
@@ -0,0 +1,293 @@
+import asyncio
+import random
+import time
+from collections import Counter
+
+import numpy as np
+
+from .shared_cache import decode_string, encode_strings
+
+# --- Configuration ---
+POLL_INTERVAL = 5 # Seconds between upstream price ticks
+SHARED_QUOTES = "quotes" # SharedCache entry holding the host-wide quotes panel
+DEMAND_WINDOW = 120 # Seconds a symbol stays in this worker's declared demand after it was last asked for
+
+
+def quote_from_history(hist):
+    """Price, change and percent change from the last two closes of a recent history frame."""
+    if hist.empty:
+        return None
+    # Always take the last 2 available closes
+    last_two = hist['Close'].tail(2).tolist()
+    if len(last_two) == 2:
+        prev_close, price = last_two
+    else:
+        price = last_two[-1]
+        prev_close = price
+
+    change = price - prev_close
+    percent_change = ((change / prev_close) * 100) if prev_close != 0 else 0
+    return {
+        "price": round(price, 2),
+        "change": round(change, 2),
+        "percent_change": round(percent_change, 2)
+    }
+
+
+class Subscription:
+    """One client's view of the stream: its symbols plus the updates it hasn't consumed yet."""
+
+    def __init__(self):
+        self.symbols = set()
+        self.closed = False
+        self._pending = {}
+        self._ready = asyncio.Event()
+
+    def push(self, quotes):
+        # Updates a slow client hasn't read yet are merged, so it only ever gets the latest quote
+        self._pending.update(quotes)
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def next(self):
+        """Waits for the next batch of {symbol: quote} changes; returns None once closed."""
+        await self._ready.wait()
+        self._ready.clear()
+        if self.closed:
+            return None
+        pending, self._pending = self._pending, {}
+        return pending
+
+
+class PriceStreamHub:
+    """
+    Fans one upstream price poller out to any number of subscribers.
+
+    `fetch_quotes(symbols)` is an async callable returning {symbol: quote or Exception}. Each
+    tick fetches every symbol that at least one client watches exactly once, and subscribers
+    are only sent the symbols whose quote changed since the previous tick.
+    """
+
+    def __init__(self, fetch_quotes, interval=POLL_INTERVAL):
+        self.fetch_quotes = fetch_quotes
+        self.interval = interval
+        self._subscriptions = set()
+        self._refcounts = Counter()
+        self._quotes = {} # symbol -> last quote pushed
+        self._wake = asyncio.Event()
+        self.ticks = 0
+        self.upstream_fetches = 0
+
+    @property
+    def symbols(self):
+        return set(self._refcounts)
+
+    def subscribe(self, symbols=()):
+        subscription = Subscription()
+        self._subscriptions.add(subscription)
+        self.update(subscription, add=symbols)
+        return subscription
+
+    def update(self, subscription, add=(), remove=()):
+        """Changes a subscription's symbols. Known quotes for added symbols are sent right away."""
+        added = set(add) - subscription.symbols
+        removed = set(remove) & subscription.symbols
+        subscription.symbols |= added
+        subscription.symbols -= removed
+        self._refcounts.update(added)
+        self._release(removed)
+
+        known = {symbol: self._quotes[symbol] for symbol in added if symbol in self._quotes}
+        if known:
+            subscription.push(known)
+        if len(known) < len(added):
+            self._wake.set() # Don't make a new symbol wait a full interval for its first quote
+
+    def unsubscribe(self, subscription):
+        self._subscriptions.discard(subscription)
+        self._release(subscription.symbols)
+        subscription.symbols = set()
+        subscription.close()
+
+    def _release(self, symbols):
+        for symbol in symbols:
+            self._refcounts[symbol] -= 1
+            if self._refcounts[symbol] <= 0:
+                del self._refcounts[symbol]
+                self._quotes.pop(symbol, None)
+
+    async def tick(self):
+        """Fetches every watched symbol once and pushes the changed quotes. Returns the changes."""
+        symbols = sorted(self._refcounts)
+        if not symbols:
+            return {}
+        results = await self.fetch_quotes(symbols)
+        self.ticks += 1
+        self.upstream_fetches += len(symbols)
+
+        changes = {}
+        for symbol in symbols:
+            quote = results.get(symbol)
+            if quote is None or isinstance(quote, Exception):
+                continue
+            # The symbol may have been dropped by every client while the fetch was in flight
+            if symbol in self._refcounts and self._quotes.get(symbol) != quote:
+                self._quotes[symbol] = quote
+                changes[symbol] = quote
+
+        if changes:
+            for subscription in self._subscriptions:
+                delta = {symbol: changes[symbol] for symbol in subscription.symbols if symbol in changes}
+                if delta:
+                    subscription.push(delta)
+        return changes
+
+    async def run(self):
+        """Background poller: ticks every `interval` seconds (or sooner when woken) until cancelled."""
+        while True:
+            self._wake.clear()
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"⚠️ Price stream tick failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscriptions),
+            "symbols": len(self._refcounts),
+            "ticks": self.ticks,
+            "upstreamFetches": self.upstream_fetches,
+        }
+
+
+class SharedQuoteFeed:
+    """
+    A `fetch_quotes` that answers from the host-wide quotes panel in a SharedCache.
+
+    Every worker declares the symbols it is asked for; the elected refresher (`run`) fetches
+    the union of all workers' symbols upstream once per interval and publishes one panel, so
+    upstream traffic stays the same however many workers there are. Symbols not yet in the
+    panel, or a panel older than `max_age` (no live refresher), are fetched directly.
+    """
+
+    def __init__(self, fetch_quotes, shared, interval=POLL_INTERVAL, max_age=3 * POLL_INTERVAL):
+        self.fetch_quotes = fetch_quotes
+        self.shared = shared
+        self.interval = interval
+        self.max_age = max_age
+        self._requested = {} # symbol -> when this worker was last asked for it
+        self._declared = (frozenset(), 0.0) # (symbols, when) last written to the demand file
+        self._panel = (None, {}) # (generation, {symbol: quote or None})
+        self.shared_hits = 0
+        self.direct_fetches = 0
+        self.refreshed = 0
+
+    def _read_panel(self):
+        published = self.shared.read(SHARED_QUOTES)
+        if published is None or time.time() - published.meta["publishedAt"] > self.max_age:
+            return {}
+        if self._panel[0] != published.generation:
+            data, offsets, values = published["symbols"], published["offsets"], published["values"]
+            quotes = {}
+            for row, (price, change, percent_change) in enumerate(values.tolist()):
+                quote = None if price != price else {"price": price, "change": change, "percent_change": percent_change}
+                quotes[decode_string(data, offsets, row)] = quote # NaN: the refresher got no quote either
+            self._panel = (published.generation, quotes)
+        return self._panel[1]
+
+    def _wanted(self, symbols):
+        """This worker's current demand, or None if the demand file is already up to date."""
+        now = time.time()
+        for symbol in symbols:
+            self._requested[symbol] = now
+        self._requested = {s: t for s, t in self._requested.items() if now - t < DEMAND_WINDOW}
+        wanted = frozenset(self._requested)
+        declared, declared_at = self._declared
+        if wanted == declared and now - declared_at < DEMAND_WINDOW / 4: # Rewrites also keep the file's mtime fresh
+            return None
+        self._declared = (wanted, now)
+        return wanted
+
+    async def __call__(self, symbols):
+        wanted = self._wanted(symbols)
+        if wanted is not None:
+            await asyncio.to_thread(self.shared.declare_demand, SHARED_QUOTES, wanted)
+        panel = self._read_panel()
+        quotes = {symbol: panel[symbol] for symbol in symbols if symbol in panel}
+        self.shared_hits += len(quotes)
+        missing = [symbol for symbol in symbols if symbol not in quotes]
+        if missing:
+            self.direct_fetches += len(missing)
+            quotes.update(await self.fetch_quotes(missing))
+        return quotes
+
+    def _publish(self, quotes):
+        symbols = sorted(quotes)
+        values = np.full((len(symbols), 3), np.nan)
+        for row, symbol in enumerate(symbols):
+            quote = quotes[symbol]
+            if isinstance(quote, dict):
+                values[row] = (quote["price"], quote["change"], quote["percent_change"])
+        data, offsets = encode_strings(symbols)
+        self.shared.publish(SHARED_QUOTES, {"symbols": data, "offsets": offsets, "values": values})
+
+    async def refresh(self):
+        """Fetches every symbol any worker wants and publishes the panel. Returns the number of symbols."""
+        symbols = sorted(await asyncio.to_thread(self.shared.demand, SHARED_QUOTES))
+        if not symbols:
+            return 0
+        quotes = await self.fetch_quotes(symbols)
+        await asyncio.to_thread(self._publish, quotes)
+        self.refreshed += len(symbols)
+        return len(symbols)
+
+    async def run(self):
+        """Background loop: the elected refresher keeps the panel fresh; other workers just stand by."""
+        while True:
+            if self.shared.lead():
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    print(f"⚠️ Shared quote refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self):
+        return {"sharedHits": self.shared_hits, "directFetches": self.direct_fetches, "refreshed": self.refreshed}
+
+
+class SimulatedPriceFeed:
+    """Offline stand-in for the upstream feed: a seeded random walk per symbol."""
+
+    def __init__(self, seed=0, volatility=0.002, start_price=100.0, change_probability=0.5):
+        self.random = random.Random(seed)
+        self.volatility = volatility
+        self.start_price = start_price
+        self.change_probability = change_probability
+        self.prev_closes = {}
+        self.prices = {}
+        self.calls = Counter()
+
+    async def __call__(self, symbols):
+        quotes = {}
+        for symbol in symbols:
+            self.calls[symbol] += 1
+            prev_close = self.prev_closes.setdefault(symbol, self.start_price * self.random.uniform(0.5, 2))
+            price = self.prices.get(symbol, prev_close)
+            # Some ticks leave a price unchanged, which exercises the delta filtering
+            if self.random.random() < self.change_probability:
+                price *= 1 + self.random.gauss(0, self.volatility)
+            self.prices[symbol] = price
+            change = price - prev_close
+            quotes[symbol] = {
+                "price": round(price, 2),
+                "change": round(change, 2),
+                "percent_change": round(change / prev_close * 100, 2)
+            }
+        return quotes
@@ -0,0 +1,223 @@
+import asyncio
+import gzip
+from collections import OrderedDict
+from datetime import date, datetime
+
+import numpy as np
+import orjson
+from fastapi import Response
+
+try:
+    import brotli
+except ImportError: # Without it responses are only gzip-compressed
+    brotli = None
+
+try:
+    import pyarrow as pa
+except ImportError: # Without it Arrow isn't offered and such requests get JSON
+    pa = None
+
+# --- Configuration ---
+JSON_TYPE = "application/json"
+COLUMNS_TYPE = "application/vnd.stockwise.columns+json" # {"field": [values, ...], ...}: each key once, not once per row
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+MIN_COMPRESS_BYTES = 1024 # Smaller bodies fit in one packet anyway
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4 # Per-request bodies: about gzip -6's CPU for ~5% smaller output; higher qualities cost 2-3x more
+OFFLOAD_BYTES = 64 * 1024 # Bodies at least this large are converted/compressed in a worker thread, off the event loop
+VARIANT_CACHE_SIZE = 64 # Encoded/compressed bodies kept per ETag'd payload (e.g. heatmap snapshots)
+
+
+def _default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value):
+    """Compact UTF-8 JSON. NumPy scalars and arrays are written directly; NaN and Infinity become null."""
+    return orjson.dumps(value, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def loads(body):
+    return orjson.loads(body)
+
+
+def to_columns(rows, key_field=None):
+    """
+    Row dicts as {field: [values]}, fields in first-seen order and None where a row lacks one.
+
+    A {key: row} mapping (e.g. quotes by symbol) becomes rows with the key under `key_field`.
+    """
+    if isinstance(rows, dict):
+        rows = [{key_field: key, **row} for key, row in rows.items()]
+    fields = dict.fromkeys(field for row in rows for field in row)
+    return {field: [row.get(field) for row in rows] for field in fields}
+
+
+def to_arrow(columns):
+    """Arrow IPC stream bytes for {field: [values]}."""
+    arrays = {}
+    for field, values in columns.items():
+        try:
+            arrays[field] = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError): # Mixed types, e.g. "Infinity" strings among peRatio floats
+            arrays[field] = pa.array([None if v is None else str(v) for v in values])
+    table = pa.table(arrays)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+# --- Negotiation ---
+def _qualities(header):
+    """[(token, q)] in header order for an Accept / Accept-Encoding value."""
+    result = []
+    for part in (header or "").split(","):
+        token, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if token:
+            result.append((token.lower(), q))
+    return result
+
+
+def choose_format(accept):
+    """The media type to send for an Accept header: the client's most preferred one we support, else JSON."""
+    supported = (JSON_TYPE, COLUMNS_TYPE, ARROW_TYPE) if pa is not None else (JSON_TYPE, COLUMNS_TYPE)
+    best, best_q = JSON_TYPE, 0.0
+    for token, q in _qualities(accept):
+        if token in supported and q > best_q: # Ties keep the earlier entry
+            best, best_q = token, q
+    return best
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header; on equal preference brotli wins (smaller output)."""
+    qualities = dict(_qualities(accept_encoding))
+    wildcard = qualities.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        q = qualities.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode(media_type, payload=None, body=None, key_field=None):
+    """Bytes of the payload in `media_type`. `body` is its JSON, if already encoded (then `payload` may be omitted)."""
+    if media_type == JSON_TYPE:
+        return body if body is not None else dumps(payload)
+    columns = to_columns(payload if payload is not None else loads(body), key_field)
+    return to_arrow(columns) if media_type == ARROW_TYPE else dumps(columns)
+
+
+# --- Responses ---
+_variants = OrderedDict() # (etag, media type, encoding) -> (body, encoding used), least recently used first
+
+
+async def negotiated_response(request, payload=None, body=None, key_field=None, etag=None, headers=None):
+    """
+    A Response with the payload in the format (JSON, columnar JSON or Arrow) and compression
+    (brotli, gzip or none) the request's Accept / Accept-Encoding headers prefer.
+
+    Pass the data as `payload` or, if it's already JSON-encoded, as `body`. With an `etag`
+    (which must change whenever the payload does) encoded variants are cached, each variant
+    gets its own ETag, and a matching If-None-Match is answered with 304. Large bodies are
+    converted and compressed in a worker thread so brotli doesn't stall the event loop.
+    """
+    media_type = choose_format(request.headers.get("accept"))
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    headers = {**(headers or {}), "Vary": "Accept, Accept-Encoding"}
+
+    if etag is not None:
+        variant = "-".join(filter(None, ({COLUMNS_TYPE: "columns", ARROW_TYPE: "arrow"}.get(media_type), encoding)))
+        headers["ETag"] = f'{etag[:-1]}-{variant}"' if variant else etag
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or headers["ETag"] in [t.strip() for t in if_none_match.split(",")]):
+            return Response(status_code=304, headers=headers)
+        cached = _variants.get((etag, media_type, encoding))
+        if cached is not None:
+            _variants.move_to_end((etag, media_type, encoding))
+            content, used = cached
+            return _response(content, media_type, used, headers)
+
+    if media_type != JSON_TYPE and body is not None and len(body) >= OFFLOAD_BYTES:
+        content = await asyncio.to_thread(encode, media_type, payload, body, key_field)
+    else:
+        content = encode(media_type, payload, body, key_field)
+    used = encoding if encoding is not None and len(content) >= MIN_COMPRESS_BYTES else None
+    if used is not None:
+        if len(content) >= OFFLOAD_BYTES:
+            content = await asyncio.to_thread(compress, content, used)
+        else:
+            content = compress(content, used)
+    if etag is not None:
+        _variants[(etag, media_type, encoding)] = (content, used)
+        while len(_variants) > VARIANT_CACHE_SIZE:
+            _variants.popitem(last=False)
+    return _response(content, media_type, used, headers)
+
+
+def _response(content, media_type, encoding, headers):
+    if encoding is not None:
+        headers = {**headers, "Content-Encoding": encoding}
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+# --- Benchmark ---
+def benchmark(iterations=200):
+    """Serialization CPU and payload size of the screener's largest result, old path vs new, per format and encoding."""
+    import time
+
+    from fastapi.encoders import jsonable_encoder
+    from starlette.responses import JSONResponse
+
+    from .screener_index import ScreenerIndex
+
+    index = ScreenerIndex()
+    records = index.query({})
+    columns = index.columns()
+    timings = {
+        "jsonable_encoder + JSONResponse (before)": lambda: JSONResponse(jsonable_encoder(records)).body,
+        "dumps(records)": lambda: dumps(records),
+        "pre-encoded rows (screener JSON)": lambda: index.query_json({}),
+        "columnar JSON": lambda: encode(COLUMNS_TYPE, records),
+    }
+    if pa is not None:
+        timings["Arrow IPC"] = lambda: encode(ARROW_TYPE, records)
+    print(f"Screener result: {len(records)} of {columns.size} rows, {len(records[0])} fields, "
+          f"brotli={'yes' if brotli else 'no'}, pyarrow={'yes' if pa else 'no'}")
+    for name, fn in timings.items():
+        body = fn()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        micros = (time.perf_counter() - start) / iterations * 1e6
+        sizes = f"{len(body):>7} B"
+        for encoding in ("gzip", "br") if brotli is not None else ("gzip",):
+            start = time.perf_counter()
+            compressed = compress(body, encoding)
+            sizes += f"   {encoding} {len(compressed):>6} B ({(time.perf_counter() - start) * 1e6:>6.0f} µs)"
+        print(f"{name:<42} {micros:>8.1f} µs  {sizes}")
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.responses
+    benchmark()
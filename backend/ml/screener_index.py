@@ -0,0 +1,336 @@
+import asyncio
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from .responses import dumps, loads
+from .shared_cache import blob_at, cache as shared_cache, encode_blobs
+
+# --- Configuration ---
+BASE_DIR = Path(__file__).resolve().parent
+SCREENER_JSON_PATH = BASE_DIR / "screener_data.json"
+TECHNICAL_JSON_PATH = BASE_DIR / "technical_data.json" # Written nightly by technical_scan.py
+RESULT_LIMIT = 100
+# Technical scan fields usable as filters: range filters (min<Name>/max<Name>) and categorical ones
+TECHNICAL_RANGES = {"rsi": "Rsi", "bollingerPosition": "BollingerPosition", "volumeRatio": "VolumeRatio", "atrPercent": "AtrPercent"}
+TECHNICAL_CATEGORIES = ("emaTrend", "crossover", "macdTrend")
+SHARED_SCREENER = "screener" # SharedCache entry holding the published columns
+RELOAD_INTERVAL = 30 # Seconds between the refresher's checks for new data files
+
+
+def _to_float(value):
+    # A few peRatio values are the string "Infinity"; float() parses those, anything else is missing
+    try:
+        return np.nan if value is None else float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _float_column(records, key):
+    return np.array([_to_float(r.get(key)) for r in records], dtype=np.float64)
+
+
+class _RangeIndex:
+    """Values sorted ascending (NaN last) with the row ids that produced them."""
+
+    def __init__(self, values):
+        self.order = np.argsort(values, kind="stable")
+        self.sorted = values[self.order]
+        self.valid = int(np.count_nonzero(~np.isnan(values)))
+
+    @classmethod
+    def from_arrays(cls, order, sorted_values):
+        index = cls.__new__(cls)
+        index.order, index.sorted = order, sorted_values
+        index.valid = int(np.count_nonzero(~np.isnan(sorted_values)))
+        return index
+
+    def bitmap(self, size, low=None, high=None, low_inclusive=True):
+        """Boolean mask of rows whose value lies in [low, high] (or (low, high] if not `low_inclusive`)."""
+        start = 0 if low is None else np.searchsorted(self.sorted[:self.valid], low, side="left" if low_inclusive else "right")
+        stop = self.valid if high is None else np.searchsorted(self.sorted[:self.valid], high, side="right")
+        mask = np.zeros(size, dtype=bool)
+        mask[self.order[start:stop]] = True
+        return mask
+
+
+def _dictionary_encode(values):
+    """(labels, int32 codes) for a column of strings (or None)."""
+    lookup = {}
+    codes = np.array([lookup.setdefault(v, len(lookup)) for v in values], dtype=np.int32)
+    return list(lookup), codes
+
+
+class _SharedBlobs:
+    """Row i's JSON bytes, sliced from the mapped arrays of published columns."""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return blob_at(self.data, self.offsets, i)
+
+
+class _SharedRecords:
+    """The records of published columns, decoded from their JSON bytes only when a row is returned."""
+
+    def __init__(self, encoded):
+        self.encoded = encoded
+        self._decoded = {}
+
+    def __len__(self):
+        return len(self.encoded)
+
+    def __getitem__(self, i):
+        record = self._decoded.get(i)
+        if record is None:
+            record = self._decoded[i] = loads(self.encoded[i])
+        return record
+
+
+class _ScreenerColumns:
+    """
+    Immutable columnar snapshot of `screener_data.json`, rows pre-sorted by marketCap (desc).
+
+    Technical scan readings, when present, are joined onto the records by symbol. Each record
+    is also kept JSON-encoded, so a response is its rows' bytes joined, not a re-serialization.
+    """
+
+    RANGES = ("pe_ratio", "pb_ratio", "dividend_yield")
+
+    def __init__(self, records, mtime_ns, technical=()):
+        self.mtime_ns = mtime_ns
+        readings = {r["symbol"]: r for r in technical}
+        records = [{**r, **readings[r["symbol"]]} if r.get("symbol") in readings else r for r in records]
+        market_cap = _float_column(records, "marketCap")
+        order = np.argsort(-np.nan_to_num(market_cap, nan=-np.inf), kind="stable")
+        self.records = [records[i] for i in order]
+        self.encoded = [dumps(r) for r in self.records]
+        self.size = len(self.records)
+
+        self.market_cap = market_cap[order]
+        self.pe_ratio = _RangeIndex(_float_column(self.records, "peRatio"))
+        self.pb_ratio = _RangeIndex(_float_column(self.records, "pbRatio"))
+        self.dividend_yield = _RangeIndex(_float_column(self.records, "dividendYield"))
+
+        # Dictionary-encode sector: small int codes instead of strings
+        self.sectors, codes = np.unique(np.array([str(r.get("sector")) for r in self.records], dtype=object), return_inverse=True)
+        self.sector_codes = codes.astype(np.int32)
+        self.sector_lookup = {sector: code for code, sector in enumerate(self.sectors)}
+
+        self.technical_ranges = {field: _RangeIndex(_float_column(self.records, field)) for field in TECHNICAL_RANGES}
+        self.technical_categories = {}
+        for field in TECHNICAL_CATEGORIES:
+            labels, codes = _dictionary_encode([r.get(field) for r in self.records])
+            self.technical_categories[field] = ({label: code for code, label in enumerate(labels)}, codes)
+
+    def _range_indexes(self):
+        return {**{name: getattr(self, name) for name in self.RANGES}, **self.technical_ranges}
+
+    def to_shared(self):
+        """(arrays, meta) for `SharedCache.publish`: every column, the sorted indexes and the records as JSON bytes."""
+        data, offsets = encode_blobs(self.encoded)
+        arrays = {"records": data, "recordOffsets": offsets, "marketCap": self.market_cap, "sectorCodes": self.sector_codes}
+        for name, index in self._range_indexes().items():
+            arrays[f"{name}-order"], arrays[f"{name}-sorted"] = index.order, index.sorted
+        categories = {}
+        for field, (lookup, codes) in self.technical_categories.items():
+            arrays[f"{field}-codes"] = codes
+            categories[field] = list(lookup)
+        meta = {"source": list(self.mtime_ns), "sectors": list(self.sectors), "categories": categories}
+        return arrays, meta
+
+    @classmethod
+    def from_shared(cls, snapshot):
+        """Columns over a published snapshot's memory-mapped arrays; nothing is parsed or copied up front."""
+        columns = cls.__new__(cls)
+        columns.mtime_ns = tuple(snapshot.meta["source"])
+        columns.encoded = _SharedBlobs(snapshot["records"], snapshot["recordOffsets"])
+        columns.records = _SharedRecords(columns.encoded)
+        columns.size = len(columns.records)
+        columns.market_cap = snapshot["marketCap"]
+        indexes = {name: _RangeIndex.from_arrays(snapshot[f"{name}-order"], snapshot[f"{name}-sorted"])
+                   for name in cls.RANGES + tuple(TECHNICAL_RANGES)}
+        for name in cls.RANGES:
+            setattr(columns, name, indexes[name])
+        columns.technical_ranges = {field: indexes[field] for field in TECHNICAL_RANGES}
+        columns.sectors = np.array(snapshot.meta["sectors"], dtype=object)
+        columns.sector_codes = snapshot["sectorCodes"]
+        columns.sector_lookup = {sector: code for code, sector in enumerate(columns.sectors)}
+        columns.technical_categories = {
+            field: ({label: code for code, label in enumerate(labels)}, snapshot[f"{field}-codes"])
+            for field, labels in snapshot.meta["categories"].items()
+        }
+        return columns
+
+
+class ScreenerIndex:
+    """
+    In-memory screener over `screener_data.json`.
+
+    The file (plus the nightly `technical_data.json`, if any) is parsed once into typed NumPy
+    columns and reloaded when either mtime changes. Because rows are kept in marketCap order, `minMarketCap` is a prefix slice, the other
+    range filters are bitmaps built from sorted indexes, and the top results come straight
+    from the first matching rows with no per-query sort.
+
+    With a `shared` SharedCache the elected refresher publishes the columns, and every worker
+    maps that one copy instead of parsing the files itself.
+    """
+
+    def __init__(self, path=SCREENER_JSON_PATH, technical_path=TECHNICAL_JSON_PATH, shared=None):
+        self.path = Path(path)
+        self.technical_path = Path(technical_path)
+        self.shared = shared
+        self._columns = None
+        self._lock = threading.Lock()
+
+    def _load_technical(self):
+        try:
+            with open(self.technical_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def columns(self):
+        technical_mtime = self.technical_path.stat().st_mtime_ns if self.technical_path.exists() else None
+        mtime_ns = (os.stat(self.path).st_mtime_ns, technical_mtime)
+        columns = self._columns
+        if columns is None or columns.mtime_ns != mtime_ns:
+            with self._lock:
+                if self._columns is None or self._columns.mtime_ns != mtime_ns:
+                    self._columns = self._load(mtime_ns)
+                columns = self._columns
+        return columns
+
+    def _load(self, mtime_ns):
+        if self.shared is not None:
+            published = self.shared.read(SHARED_SCREENER)
+            if published is not None and tuple(published.meta["source"]) == mtime_ns:
+                return _ScreenerColumns.from_shared(published)
+        with open(self.path, 'r') as f:
+            columns = _ScreenerColumns(json.load(f), mtime_ns, self._load_technical())
+        print(f"✅ Loaded {columns.size} stocks into the screener index.")
+        if self.shared is not None and self.shared.is_leader:
+            self.shared.publish(SHARED_SCREENER, *columns.to_shared())
+        return columns
+
+    async def run(self, interval=RELOAD_INTERVAL):
+        """Background loop: on the elected refresher, reloads and publishes the columns whenever the files change."""
+        while True:
+            if self.shared is not None and self.shared.lead():
+                try:
+                    await asyncio.to_thread(self.columns)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    print(f"⚠️ Screener reload failed: {e}")
+            await asyncio.sleep(interval)
+
+    def query(self, filters, limit=RESULT_LIMIT):
+        """Applies the screener filters and returns up to `limit` records, largest marketCap first."""
+        cols = self.columns()
+        return [cols.records[i] for i in self._match(cols, filters, limit)]
+
+    def query_json(self, filters, limit=RESULT_LIMIT):
+        """`query`'s result as a JSON array, joined from the pre-encoded rows."""
+        cols = self.columns()
+        return b"[" + b",".join([cols.encoded[i] for i in self._match(cols, filters, limit)]) + b"]"
+
+    def _match(self, cols, filters, limit):
+        """Row ids of the first `limit` rows matching `filters`."""
+        # marketCap is sorted descending, so the filter is just the length of the matching prefix
+        upper = cols.size
+        if filters.get('minMarketCap'):
+            upper = int(np.searchsorted(-cols.market_cap, -int(filters['minMarketCap']), side="right"))
+
+        mask = np.ones(cols.size, dtype=bool)
+        if filters.get('maxPeRatio'):
+            mask &= cols.pe_ratio.bitmap(cols.size, low=0, high=int(filters['maxPeRatio']), low_inclusive=False)
+        if filters.get('maxPbRatio'):
+            mask &= cols.pb_ratio.bitmap(cols.size, low=0, high=float(filters['maxPbRatio']), low_inclusive=False)
+        if filters.get('minDividendYield'):
+            mask &= cols.dividend_yield.bitmap(cols.size, low=float(filters['minDividendYield']))
+        if filters.get('sector'):
+            code = cols.sector_lookup.get(filters['sector'])
+            if code is None:
+                return ()
+            mask &= cols.sector_codes == code
+
+        # Technical filters, e.g. maxRsi=30, crossover="golden", minVolumeRatio=2
+        for field, suffix in TECHNICAL_RANGES.items():
+            low, high = filters.get(f'min{suffix}'), filters.get(f'max{suffix}')
+            if low not in (None, "") or high not in (None, ""):
+                mask &= cols.technical_ranges[field].bitmap(cols.size, low=None if low in (None, "") else float(low),
+                                                            high=None if high in (None, "") else float(high))
+        for field in TECHNICAL_CATEGORIES:
+            if filters.get(field):
+                lookup, codes = cols.technical_categories[field]
+                if filters[field] not in lookup:
+                    return ()
+                mask &= codes == lookup[filters[field]]
+
+        return np.flatnonzero(mask[:upper])[:limit]
+
+
+# Shared index used by the /screener endpoint
+screener_index = ScreenerIndex(shared=shared_cache)
+
+
+def _pandas_screener(filters, path=SCREENER_JSON_PATH):
+    """The previous per-request implementation, kept as the benchmark baseline."""
+    import pandas as pd
+
+    with open(path, 'r') as f:
+        data = json.load(f)
+    df = pd.DataFrame(data)
+    # Without this the maxPeRatio comparison fails on the "Infinity" strings in the file
+    df['peRatio'] = pd.to_numeric(df['peRatio'], errors='coerce')
+    if filters.get('minMarketCap'):
+        df = df[df['marketCap'] >= int(filters['minMarketCap'])]
+    if filters.get('maxPeRatio'):
+        df = df[(df['peRatio'].notna()) & (df['peRatio'] > 0) & (df['peRatio'] <= int(filters['maxPeRatio']))]
+    if filters.get('minDividendYield'):
+        df = df[df['dividendYield'] >= float(filters['minDividendYield'])]
+    if filters.get('sector'):
+        df = df[df['sector'] == filters['sector']]
+    results = df.sort_values(by='marketCap', ascending=False).head(100)
+    return json.loads(results.to_json(orient='records'))
+
+
+def benchmark(iterations=200):
+    """Micro-benchmark of the columnar index against the pandas path on a few typical queries."""
+    import time
+
+    queries = [
+        {},
+        {'minMarketCap': 100_000_000_000},
+        {'maxPeRatio': 25, 'minDividendYield': 1},
+        {'sector': 'Technology', 'minMarketCap': 10_000_000_000},
+    ]
+    index = ScreenerIndex()
+    index.columns()
+    for filters in queries:
+        expected = [r['symbol'] for r in _pandas_screener(filters)]
+        actual = [r['symbol'] for r in index.query(filters)]
+        assert sorted(expected) == sorted(actual), f"Result mismatch for {filters}"
+
+        timings = {}
+        for name, fn in (("pandas", _pandas_screener), ("index", index.query)):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn(filters)
+            timings[name] = (time.perf_counter() - start) / iterations * 1e6
+        print(f"{json.dumps(filters):<60} pandas {timings['pandas']:>10.1f} µs  index {timings['index']:>8.1f} µs  "
+              f"({timings['pandas'] / timings['index']:.0f}x)")
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.screener_index
+    benchmark()
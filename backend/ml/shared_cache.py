@@ -0,0 +1,220 @@
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError: # Windows: no flock, so every process acts as its own refresher
+    fcntl = None
+
+# --- Configuration ---
+BASE_DIR = Path(__file__).resolve().parent
+SHARED_DIR = Path(os.getenv("SHARED_CACHE_DIR", BASE_DIR / "data" / "shared"))
+KEEP_GENERATIONS = 3 # Older generations are deleted; readers still mapping them keep working (POSIX unlink)
+POINTER = "CURRENT"
+META_FILENAME = "meta.json"
+DEMAND_MAX_AGE = 10 * 60 # Seconds before a worker's demand file is ignored (the worker is gone)
+
+
+def encode_blobs(blobs):
+    """Packs byte strings into (bytes, offsets) arrays, so variable-length values can be memory-mapped."""
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in blobs], out=offsets[1:])
+    return np.frombuffer(b"".join(blobs), dtype=np.uint8), offsets
+
+
+def encode_strings(strings):
+    return encode_blobs([s.encode() for s in strings])
+
+
+def blob_at(data, offsets, i):
+    return bytes(data[offsets[i]:offsets[i + 1]])
+
+
+def decode_string(data, offsets, i):
+    return blob_at(data, offsets, i).decode()
+
+
+class SharedSnapshot:
+    """One published generation: read-only memory-mapped arrays plus its JSON metadata."""
+
+    def __init__(self, name, generation, arrays, meta):
+        self.name = name
+        self.generation = generation
+        self.arrays = arrays
+        self.meta = meta
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def __contains__(self, key):
+        return key in self.arrays
+
+
+class SharedCache:
+    """
+    A cache tier shared by every worker process on the host, backed by memory-mapped files.
+
+    `publish(name, arrays, meta)` writes each array as an `.npy` file in a new generation
+    directory and then atomically repoints `<name>/CURRENT` at it; `read(name)` maps the current
+    generation read-only. The kernel keeps one copy of the pages however many workers map
+    them, so memory stays flat as workers are added, and readers never see a half-written
+    generation. `lead()` elects a single refresher per host with a non-blocking `flock`:
+    the lease is held until the process exits, then the next worker to ask takes over.
+    """
+
+    def __init__(self, root=SHARED_DIR, keep=KEEP_GENERATIONS):
+        self.root = Path(root)
+        self.keep = keep
+        self._snapshots = {} # name -> (pointer stat key, SharedSnapshot)
+        self._lease = None
+        self._lock = threading.Lock()
+        self.publishes = 0
+        self.loads = 0
+
+    # --- Writer side ---
+    def lead(self):
+        """True if this process is (or just became) the host's single refresher."""
+        if self._lease is not None:
+            return True
+        if fcntl is None:
+            return True
+        self.root.mkdir(parents=True, exist_ok=True)
+        lease = open(self.root / "refresher.lock", "a+")
+        try:
+            fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lease.close()
+            return False
+        lease.seek(0)
+        lease.truncate()
+        lease.write(str(os.getpid()))
+        lease.flush()
+        self._lease = lease
+        print(f"👑 Worker {os.getpid()} is the shared cache refresher.")
+        return True
+
+    @property
+    def is_leader(self):
+        return self._lease is not None or fcntl is None
+
+    def publish(self, name, arrays, meta=None):
+        """Writes a new generation of `name` and makes it current. Returns the generation id."""
+        directory = self.root / name
+        generation = f"{time.time_ns():020d}-{os.getpid()}"
+        tmp_dir = directory / f".{generation}.tmp"
+        tmp_dir.mkdir(parents=True)
+        try:
+            for key, values in arrays.items():
+                np.save(tmp_dir / f"{key}.npy", np.ascontiguousarray(values))
+            with open(tmp_dir / META_FILENAME, "w") as f:
+                json.dump({**(meta or {}), "publishedAt": time.time()}, f)
+            os.rename(tmp_dir, directory / generation)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        tmp_pointer = directory / f"{POINTER}.{os.getpid()}.tmp"
+        tmp_pointer.write_text(generation)
+        os.replace(tmp_pointer, directory / POINTER)
+        self.publishes += 1
+
+        for old in sorted(p for p in directory.iterdir() if p.is_dir() and not p.name.startswith("."))[:-self.keep]:
+            shutil.rmtree(old, ignore_errors=True)
+        return generation
+
+    def publish_json(self, name, payload, meta=None):
+        """Publishes a JSON-serializable value (small payloads that every worker needs whole)."""
+        body = json.dumps(payload).encode()
+        return self.publish(name, {"json": np.frombuffer(body, dtype=np.uint8)}, meta)
+
+    # --- Reader side ---
+    def read(self, name):
+        """The current SharedSnapshot of `name`, or None if nothing has been published yet."""
+        pointer = self.root / name / POINTER
+        try:
+            stat = os.stat(pointer)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns)
+        cached = self._snapshots.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        with self._lock:
+            generation = pointer.read_text().strip()
+            directory = self.root / name / generation
+            try:
+                with open(directory / META_FILENAME, "r") as f:
+                    meta = json.load(f)
+                arrays = {p.stem: np.load(p, mmap_mode="r") for p in directory.glob("*.npy")}
+            except FileNotFoundError: # Superseded and cleaned up between reading the pointer and the files
+                return cached[1] if cached is not None else None
+            snapshot = SharedSnapshot(name, generation, arrays, meta)
+            self._snapshots[name] = (key, snapshot)
+            self.loads += 1
+            return snapshot
+
+    def read_json(self, name):
+        """(value, snapshot) for a `publish_json` entry, decoded once per generation; (None, None) if absent."""
+        snapshot = self.read(name)
+        if snapshot is None:
+            return None, None
+        if not hasattr(snapshot, "value"):
+            snapshot.value = json.loads(bytes(snapshot["json"]))
+        return snapshot.value, snapshot
+
+    # --- Demand: what followers want the refresher to keep fresh ---
+    def declare_demand(self, role, symbols):
+        """Records the symbols this worker needs for `role`; the refresher polls the union of all workers."""
+        directory = self.root / "demand" / role
+        directory.mkdir(parents=True, exist_ok=True)
+        tmp = directory / f"{os.getpid()}.{threading.get_ident()}.tmp" # Unique per thread: requests declare concurrently
+        tmp.write_text(json.dumps(sorted(symbols)))
+        os.replace(tmp, directory / f"{os.getpid()}.json")
+
+    def demand(self, role, max_age=DEMAND_MAX_AGE):
+        """Union of every live worker's declared symbols for `role`."""
+        symbols = set()
+        cutoff = time.time() - max_age
+        for path in (self.root / "demand" / role).glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+                    continue
+                symbols.update(json.loads(path.read_text()))
+            except (FileNotFoundError, ValueError):
+                continue
+        return symbols
+
+    # --- Change stamps: cheap "has anyone on this host changed it?" checks ---
+    def bump(self, name, key):
+        """Marks `key` of `name` as changed by any worker. Returns its new stamp."""
+        directory = self.root / "stamps" / name
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / key.replace(os.sep, "_")
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(str(time.time_ns()))
+        stat = os.stat(tmp) # A rename keeps the inode and mtime
+        os.replace(tmp, path)
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def stamp(self, name, key):
+        """The current stamp of `key` (one stat call), or None if it was never bumped."""
+        try:
+            stat = os.stat(self.root / "stamps" / name / key.replace(os.sep, "_"))
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def stats(self):
+        return {"leader": int(self.is_leader), "publishes": self.publishes, "loads": self.loads,
+                "mapped": len(self._snapshots)}
+
+
+# Shared instance used by the API workers
+cache = SharedCache()
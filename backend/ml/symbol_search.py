@@ -0,0 +1,233 @@
+import bisect
+import heapq
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+# --- Configuration ---
+BASE_DIR = Path(__file__).resolve().parent
+NSE_STOCKS_CSV = BASE_DIR / "nse_stocks.csv"
+SCREENER_JSON_PATH = BASE_DIR / "screener_data.json"
+SEARCH_TTL = 24 * 60 * 60 # Symbol search results barely change within a day
+MAX_CACHED_QUERIES = 5000
+
+
+def matches(result, query):
+    """True if a lowercased `query` appears in a result's symbol or name."""
+    return query in (result.get("symbol") or "").lower() or query in (result.get("name") or "").lower()
+
+
+class PrefixSearchCache:
+    """
+    Caches search results per query and answers longer queries from a shorter cached one.
+
+    An entry is `complete` when the upstream returned fewer results than it was asked for,
+    i.e. it sent everything that matched. Any extension of that query can only match a subset,
+    so it is answered by filtering the cached list locally: typing "relia" after "rel" costs
+    no network call.
+    """
+
+    def __init__(self, ttl=SEARCH_TTL, max_entries=MAX_CACHED_QUERIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # query -> (results, complete, stored_at)
+        self.hits = 0
+        self.prefix_hits = 0
+        self.misses = 0
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[2] > self.ttl:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def lookup(self, query):
+        key = query.strip().lower()
+        entry = self._fresh(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+        for end in range(len(key) - 1, 0, -1):
+            entry = self._fresh(key[:end])
+            if entry is not None and entry[1]:
+                self.prefix_hits += 1
+                return [r for r in entry[0] if matches(r, key)]
+        self.misses += 1
+        return None
+
+    def store(self, query, results, complete):
+        key = query.strip().lower()
+        self._entries[key] = (results, complete, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "prefixHits": self.prefix_hits, "misses": self.misses}
+
+
+_NAME_STOPWORDS = {"limited", "ltd", "the", "of", "and", "&", "india", "co", "company"}
+_EDIT_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+_EXCHANGE_SUFFIXES = (".ns", ".bo")
+
+
+def normalize_tokens(text):
+    """Lowercased alphanumeric tokens, e.g. "Bajaj-Auto Ltd." -> ["bajaj", "auto", "ltd"]."""
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _edits1(word):
+    """Every string one delete, transpose, substitution or insert away from `word`."""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    deletes = [a + b[1:] for a, b in splits if b]
+    transposes = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+    replaces = [a + c + b[1:] for a, b in splits if b for c in _EDIT_ALPHABET if c != b[0]]
+    inserts = [a + c + b for a, b in splits for c in _EDIT_ALPHABET]
+    return set(deletes + transposes + replaces + inserts)
+
+
+class _PrefixArray:
+    """Sorted (key, row) pairs: all rows whose key starts with a prefix form one contiguous slice."""
+
+    def __init__(self, pairs):
+        pairs = sorted(pairs)
+        self.keys = [key for key, _ in pairs]
+        self.rows = [row for _, row in pairs]
+
+    def lookup(self, prefix):
+        start = bisect.bisect_left(self.keys, prefix)
+        stop = bisect.bisect_left(self.keys, prefix + "\uffff", lo=start)
+        return self.rows[start:stop]
+
+    def has_prefix(self, prefix):
+        start = bisect.bisect_left(self.keys, prefix)
+        return start < len(self.keys) and self.keys[start].startswith(prefix)
+
+
+class _AutocompleteData:
+    """Immutable snapshot of the symbol list, market caps and prefix arrays."""
+
+    def __init__(self, symbols, names, market_caps, mtimes):
+        self.mtimes = mtimes
+        self.symbols = symbols
+        self.names = names
+        self.market_caps = market_caps
+        self.by_symbol = _PrefixArray((symbol.lower(), row) for row, symbol in enumerate(symbols))
+        tokens = []
+        self.first_token = []
+        for row, name in enumerate(names):
+            name_tokens = [t for t in normalize_tokens(name) if t not in _NAME_STOPWORDS] or normalize_tokens(name)
+            self.first_token.append(name_tokens[0] if name_tokens else "")
+            tokens.extend((token, row) for token in set(name_tokens))
+        self.by_token = _PrefixArray(tokens)
+
+
+class SymbolAutocomplete:
+    """
+    In-process symbol autocomplete over `nse_stocks.csv`, ranked by market cap from `screener_data.json`.
+
+    Symbols and normalized company-name tokens are kept in sorted arrays, so every prefix is a
+    binary search. Each query token must prefix-match the symbol or a name token; results rank
+    exact symbol > symbol prefix > first name word > any name word, then by market cap. When
+    nothing matches, queries of 3+ characters are retried allowing one typo (delete, swap,
+    substitute or insert) per token. Both files are reloaded when their mtime changes.
+    """
+
+    def __init__(self, path=NSE_STOCKS_CSV, screener_path=SCREENER_JSON_PATH, suffix=".NS"):
+        self.path = Path(path)
+        self.screener_path = Path(screener_path)
+        self.suffix = suffix
+        self._data = None
+        self._lock = threading.Lock()
+
+    def _mtimes(self):
+        return tuple(p.stat().st_mtime_ns if p.exists() else None for p in (self.path, self.screener_path))
+
+    def data(self):
+        mtimes = self._mtimes()
+        data = self._data
+        if data is None or data.mtimes != mtimes:
+            with self._lock:
+                if self._data is None or self._data.mtimes != mtimes:
+                    self._data = self._build(mtimes)
+                data = self._data
+        return data
+
+    def _build(self, mtimes):
+        try:
+            df = pd.read_csv(self.path, usecols=[0, 1])
+        except FileNotFoundError:
+            df = pd.DataFrame(columns=["SYMBOL", "NAME OF COMPANY"])
+        df.columns = ["symbol", "name"]
+        df = df.dropna().drop_duplicates("symbol")
+        try:
+            with open(self.screener_path, "r") as f:
+                caps = {r["symbol"]: r.get("marketCap") or 0 for r in json.load(f)}
+        except FileNotFoundError:
+            caps = {}
+        symbols = df["symbol"].str.upper().tolist()
+        return _AutocompleteData(symbols, df["name"].tolist(), [caps.get(s, 0) for s in symbols], mtimes)
+
+    def _token_rows(self, data, token, fuzzy):
+        """{row: rank} where `token` is the symbol (0), prefixes it (1), the first name word (2) or another word (3)."""
+        variants = _edits1(token) if fuzzy else (token,)
+        rows = {}
+        for variant in variants:
+            if not variant or not (data.by_symbol.has_prefix(variant) or data.by_token.has_prefix(variant)):
+                continue
+            for row in data.by_token.lookup(variant):
+                rows[row] = min(rows.get(row, 3), 2 if data.first_token[row].startswith(variant) else 3)
+            for row in data.by_symbol.lookup(variant):
+                rows[row] = min(rows.get(row, 1), 0 if data.symbols[row].lower() == variant else 1)
+        return rows
+
+    def _search(self, data, tokens, fuzzy):
+        ranks = None
+        for token in tokens:
+            rows = self._token_rows(data, token, fuzzy)
+            ranks = rows if ranks is None else {row: max(rank, rows[row]) for row, rank in ranks.items() if row in rows}
+            if not ranks:
+                return {}
+        return ranks
+
+    def search(self, query, limit=7):
+        """Up to `limit` {symbol, name} matches for `query`, best first."""
+        query = query.strip().lower()
+        if query.endswith(_EXCHANGE_SUFFIXES):
+            query = query[:-3]
+        tokens = normalize_tokens(query)
+        if not tokens:
+            return []
+        data = self.data()
+        # A symbol typed with punctuation ("bajaj-auto") should still match the symbol itself
+        whole_symbol = len(tokens) > 1 and data.by_symbol.has_prefix(query)
+
+        ranks = self._search(data, [query] if whole_symbol else tokens, fuzzy=False)
+        if not ranks and len(query) >= 3:
+            # Nothing matches as typed: allow one typo per token, ranked by the same rules
+            ranks = self._search(data, tokens, fuzzy=True)
+        best = heapq.nsmallest(limit, ranks, key=lambda row: (ranks[row], -data.market_caps[row], data.symbols[row]))
+        return [{"symbol": f"{data.symbols[row]}{self.suffix}", "name": data.names[row]} for row in best]
+
+
+def benchmark(iterations=2000):
+    """Micro-benchmark of typical autocomplete queries (warm index)."""
+    index = SymbolAutocomplete()
+    index.data()
+    for query in ["r", "rel", "reliance", "tata con", "infy", "hdfc bank", "relaince", "bajaj-auto", "zzzz"]:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            results = index.search(query)
+        elapsed = (time.perf_counter() - start) / iterations * 1e6
+        print(f"{query!r:<14} {elapsed:>8.1f} µs  {[r['symbol'] for r in results[:4]]}")
+
+
+if __name__ == '__main__':
+    # Run from /backend with: python -m ml.symbol_search
+    benchmark()
@@ -0,0 +1,280 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .indicators import ATR_LENGTH, BB_LENGTH, BB_STD, MACD_FAST, MACD_SLOW, IndicatorState
+from .model import EMA_LONG, EMA_SHORT, RSI_PERIOD
+from .ohlcv_store import period_to_days, store as ohlcv_store
+from .prepare_screener_data import INPUT_CSV_PATH, AdaptiveRateLimiter, is_throttle_error, is_valid_symbol, write_json_atomic
+from .screener_index import TECHNICAL_JSON_PATH
+
+# --- Configuration ---
+BASE_DIR = Path(__file__).resolve().parent
+SCAN_PERIOD = "3y" # Same window as /predict, so EMA 200 values agree with the per-ticker features
+MACD_SIGNAL = 9
+VOLUME_LOOKBACK = 20
+CROSSOVER_LOOKBACK = 5 # Sessions within which an EMA 50/200 cross is reported
+DEFAULT_WORKERS = 8
+
+
+# --- Panel ---
+def load_panel(symbols, store=ohlcv_store, period=SCAN_PERIOD):
+    """
+    Right-aligns each symbol's stored bars into (symbols × days) High/Low/Close/Volume arrays.
+
+    Symbols with a shorter history are padded with NaN on the left, so column -1 is always a
+    symbol's latest session. Reads the memory-mapped store only; symbols with no bars are dropped.
+    """
+    start = np.datetime64(date.today() - timedelta(days=period_to_days(period)), "D")
+    histories = {}
+    for symbol in symbols:
+        bars, _ = store.load(symbol)
+        if bars is not None:
+            bars = bars[bars["date"] >= start]
+            if len(bars):
+                histories[symbol] = bars
+    scanned = list(histories)
+    days = max((len(b) for b in histories.values()), default=0)
+    panel = {field: np.full((len(scanned), days), np.nan) for field in ("High", "Low", "Close", "Volume")}
+    as_of = []
+    for row, symbol in enumerate(scanned):
+        bars = histories[symbol]
+        for field, values in panel.items():
+            values[row, days - len(bars):] = bars[field]
+        as_of.append(str(bars["date"][-1]))
+    return scanned, panel, as_of
+
+
+# --- Vectorized indicators (one pass over days, all symbols at once) ---
+def ema_panel(values, length):
+    """SMA-seeded EMA along axis 1, like `indicators._EMA`; each row starts at its first non-NaN value."""
+    alpha = 2.0 / (length + 1)
+    valid = ~np.isnan(values)
+    count = np.cumsum(valid, axis=1)
+    running = np.cumsum(np.where(valid, values, 0.0), axis=1)
+    out = np.full(values.shape, np.nan)
+    ema = np.full(len(values), np.nan)
+    for t in range(values.shape[1]):
+        seeded = count[:, t] == length
+        ema = np.where(count[:, t] > length, alpha * values[:, t] + (1.0 - alpha) * ema, ema)
+        ema = np.where(seeded, running[:, t] / length, ema)
+        out[:, t] = ema
+    return out
+
+
+def rma_panel(values, length):
+    """Wilder average along axis 1, like `indicators._RMA` (NaN until `length` values are in)."""
+    decay = 1.0 - 1.0 / length
+    valid = ~np.isnan(values)
+    count = np.cumsum(valid, axis=1)
+    out = np.full(values.shape, np.nan)
+    numerator = np.zeros(len(values))
+    denominator = np.zeros(len(values))
+    for t in range(values.shape[1]):
+        x = values[:, t]
+        numerator = np.where(valid[:, t], x + decay * numerator, numerator)
+        denominator = np.where(valid[:, t], 1.0 + decay * denominator, denominator)
+        out[:, t] = np.where(count[:, t] >= length, numerator / np.where(denominator > 0, denominator, 1.0), np.nan)
+    return out
+
+
+def _last(values):
+    return values[:, -1]
+
+
+def scan_panel(panel):
+    """Latest technical readings for every row of a `load_panel` panel, as a dict of 1-D arrays."""
+    high, low, close, volume = panel["High"], panel["Low"], panel["Close"], panel["Volume"]
+    prev_close = np.concatenate([np.full((len(close), 1), np.nan), close[:, :-1]], axis=1)
+    change = close - prev_close
+
+    # --- Momentum ---
+    gain = rma_panel(np.where(np.isnan(change), np.nan, np.maximum(change, 0.0)), RSI_PERIOD)
+    loss = rma_panel(np.where(np.isnan(change), np.nan, np.maximum(-change, 0.0)), RSI_PERIOD)
+    total = _last(gain) + _last(loss)
+    rsi = np.where(total > 0, 100.0 * _last(gain) / np.where(total > 0, total, 1.0), np.nan)
+
+    macd = ema_panel(close, MACD_FAST) - ema_panel(close, MACD_SLOW)
+    signal = ema_panel(macd, MACD_SIGNAL)
+
+    # --- Trend: EMA 50/200 and recent crossovers ---
+    ema_short, ema_long = ema_panel(close, EMA_SHORT), ema_panel(close, EMA_LONG)
+    above = ema_short > ema_long
+    known = ~np.isnan(ema_short) & ~np.isnan(ema_long)
+    recent = slice(-(CROSSOVER_LOOKBACK + 1), None)
+    window_above, window_known = above[:, recent], known[:, recent].all(axis=1)
+    golden = window_known & window_above[:, -1] & ~window_above.all(axis=1)
+    death = window_known & ~window_above[:, -1] & window_above.any(axis=1)
+
+    # --- Volatility: Bollinger position and ATR (only the latest window is needed) ---
+    window = close[:, -BB_LENGTH:]
+    middle = window.mean(axis=1)
+    std = window.std(axis=1)
+    band = 2 * BB_STD * std
+    bollinger_position = np.where(band > 0, (_last(close) - (middle - BB_STD * std)) / np.where(band > 0, band, 1.0), np.nan)
+
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(prev_close - low)))
+    true_range[:, 0] = np.nan # pandas_ta/IndicatorState start ATR from the second bar
+    true_range = np.where(np.isnan(prev_close), np.nan, true_range)
+    atr = _last(rma_panel(true_range, ATR_LENGTH))
+
+    # --- Volume spike: today vs the average of the sessions before it ---
+    previous = volume[:, -(VOLUME_LOOKBACK + 1):-1]
+    counts = np.count_nonzero(~np.isnan(previous), axis=1)
+    average = np.nansum(previous, axis=1) / np.maximum(counts, 1)
+    volume_ratio = np.where((counts > 0) & (average > 0), _last(volume) / np.where(average > 0, average, 1.0), np.nan)
+
+    return {
+        "rsi": rsi,
+        "ema50": _last(ema_short),
+        "ema200": _last(ema_long),
+        "emaTrend": np.where(known[:, -1], np.where(above[:, -1], "bullish", "bearish"), None),
+        "crossover": np.where(golden, "golden", np.where(death, "death", None)),
+        "macd": _last(macd),
+        "macdSignal": _last(signal),
+        "macdTrend": np.where(np.isnan(_last(signal)), None, np.where(_last(macd) > _last(signal), "bullish", "bearish")),
+        "bollingerPosition": bollinger_position,
+        "atr": atr,
+        "atrPercent": 100.0 * atr / _last(close),
+        "volumeRatio": volume_ratio,
+    }
+
+
+def _json_value(value, digits=4):
+    if value is None or isinstance(value, str):
+        return value
+    value = float(value)
+    return None if np.isnan(value) or np.isinf(value) else round(value, digits)
+
+
+def scan_records(symbols, readings, as_of):
+    """One screener record per symbol, keyed by the bare NSE symbol like `screener_data.json`."""
+    return [
+        {"symbol": symbol.replace(".NS", ""), "technicalAsOf": as_of[row],
+         **{field: _json_value(values[row]) for field, values in readings.items()}}
+        for row, symbol in enumerate(symbols)
+    ]
+
+
+# --- Nightly job ---
+class TechnicalScanner:
+    """
+    Nightly whole-market technical scan feeding the screener.
+
+    `refresh` brings every symbol's bars in the OHLCV store up to date (the only upstream
+    traffic: a thread pool paced by the screener builder's AdaptiveRateLimiter, which backs
+    off when Yahoo throttles); the scan then reads the memory-mapped store into one
+    (symbols × days) panel and computes every indicator for all symbols in a single pass over
+    days. Results go to `technical_data.json`, which the screener index joins on symbol.
+    """
+
+    def __init__(self, store=ohlcv_store, output_path=TECHNICAL_JSON_PATH, workers=DEFAULT_WORKERS, period=SCAN_PERIOD,
+                 limiter=None, retries=3):
+        self.store = store
+        self.output_path = Path(output_path)
+        self.workers = workers
+        self.period = period
+        self.limiter = limiter or AdaptiveRateLimiter()
+        self.retries = retries
+
+    def refresh(self, symbols):
+        """Updates the stored bars of every symbol; returns {symbol: error} for the ones that failed."""
+        def fetch(symbol):
+            for attempt in range(self.retries):
+                self.limiter.acquire()
+                try:
+                    self.store.get_history(symbol, period=self.period)
+                except Exception as e:
+                    if is_throttle_error(e) and attempt < self.retries - 1:
+                        self.limiter.on_throttle()
+                        continue
+                    return symbol, str(e) or e.__class__.__name__
+                self.limiter.on_success()
+                return symbol, None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return {symbol: error for symbol, error in executor.map(fetch, symbols) if error}
+
+    def run(self, symbols, refresh=True):
+        """Refreshes (optionally) and scans `symbols` (`.NS` tickers), writes the JSON and returns a report."""
+        symbols = list(dict.fromkeys(symbols))
+        start = time.perf_counter()
+        failures = self.refresh(symbols) if refresh else {}
+        fetched = time.perf_counter()
+        scanned, panel, as_of = load_panel(symbols, self.store, self.period)
+        loaded = time.perf_counter()
+        records = scan_records(scanned, scan_panel(panel), as_of)
+        write_json_atomic(self.output_path, records)
+        done = time.perf_counter()
+
+        report = {
+            "symbols": len(symbols),
+            "scanned": len(scanned),
+            "failed": len(failures),
+            "days": panel["Close"].shape[1],
+            "refreshSeconds": round(fetched - start, 2),
+            "loadSeconds": round(loaded - fetched, 3),
+            "scanSeconds": round(done - loaded, 3),
+        }
+        print(f"✅ Scanned {len(scanned)}/{len(symbols)} symbols over {report['days']} sessions: "
+              f"refresh {report['refreshSeconds']}s, load {report['loadSeconds']}s, scan {report['scanSeconds']}s.")
+        return report
+
+
+def nse_tickers():
+    symbols = pd.read_csv(INPUT_CSV_PATH)["SYMBOL"].tolist()
+    return [f"{s}.NS" for s in symbols if is_valid_symbol(s)]
+
+
+def check_parity(panel, readings, rows=(0,)):
+    """Largest relative difference between the scan and `IndicatorState` replaying the same bars."""
+    worst = 0.0
+    fields = {"rsi": 0, "ema50": 1, "ema200": 2, "macd": 3, "atr": 7}
+    for row in rows:
+        state, latest = IndicatorState(), None
+        for high, low, close, volume in zip(*(panel[f][row] for f in ("High", "Low", "Close", "Volume"))):
+            if not np.isnan(close):
+                latest = state.update(None, high, low, close, volume)
+        for field, index in fields.items():
+            expected, actual = latest[index], readings[field][row]
+            if not (np.isnan(expected) and np.isnan(actual)):
+                worst = max(worst, abs(actual - expected) / max(abs(expected), 1e-12))
+    return worst
+
+
+def benchmark(symbols=2150, days=750, seed=0):
+    """Times the scan on a synthetic full-market panel and checks it against IndicatorState."""
+    rng = np.random.default_rng(seed)
+    close = rng.uniform(50, 3000, (symbols, 1)) * np.exp(np.cumsum(rng.normal(0.0003, 0.018, (symbols, days)), axis=1))
+    spread = close * rng.uniform(0.002, 0.03, close.shape)
+    panel = {"High": close + spread, "Low": close - spread, "Close": close,
+             "Volume": rng.lognormal(12, 1, close.shape)}
+    listed = rng.integers(0, days - 30, symbols // 10) # Some symbols listed recently: NaN-padded on the left
+    for field in panel:
+        for row, first in enumerate(listed):
+            panel[field][row, :first] = np.nan
+    start = time.perf_counter()
+    readings = scan_panel(panel)
+    elapsed = time.perf_counter() - start
+    parity = check_parity(panel, readings, rows=range(0, symbols, max(1, symbols // 20)))
+    print(f"Scanned {symbols} symbols × {days} days in {elapsed * 1000:.0f} ms; "
+          f"max relative difference vs IndicatorState {parity:.2e}")
+
+
+if __name__ == '__main__':
+    # Run nightly from /backend with: python -m ml.technical_scan
+    parser = argparse.ArgumentParser(description="Whole-market technical scan for the screener")
+    parser.add_argument('--offline', action='store_true', help="Scan the stored bars without refreshing them upstream")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--benchmark', action='store_true', help="Time the scan on a synthetic panel instead")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    else:
+        TechnicalScanner(workers=args.workers).run(nse_tickers(), refresh=not args.offline)
@@ -8,7 +8,10 @@ const ScreenerPage = () => {
         minMarketCap: "50000000000",
         maxPeRatio: "",
         minDividendYield: "",
-        sector: ""
+        sector: "",
+        maxRsi: "",
+        emaTrend: "",
+        crossover: ""
     });
     const [results, setResults] = useState([]);
     const [loading, setLoading] = useState(false);
@@ -50,7 +53,7 @@ const ScreenerPage = () => {
             <h1 className="text-3xl font-bold text-gray-800 mb-4">Stock Screener</h1>
             
             <div className="p-4 bg-white rounded-lg shadow-sm border border-gray-200 mb-6">
-                <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-5 gap-4 items-end">
+                <div className="grid grid-cols-1 md:grid-cols-4 lg:grid-cols-8 gap-4 items-end">
                     <div>
                         <label className="text-sm font-medium text-gray-700">Market Cap (Min)</label>
                         <select name="minMarketCap" value={filters.minMarketCap} onChange={handleFilterChange} className="w-full mt-1 p-2 border rounded-md bg-white">
@@ -75,6 +78,26 @@ const ScreenerPage = () => {
                             {indianSectors.map(s => <option key={s} value={s}>{s}</option>)}
                         </select>
                     </div>
+                    <div>
+                        <label className="text-sm font-medium text-gray-700">RSI (Max)</label>
+                        <input type="number" name="maxRsi" value={filters.maxRsi} onChange={handleFilterChange} placeholder="e.g., 30" className="w-full mt-1 p-2 border rounded-md" />
+                    </div>
+                    <div>
+                        <label className="text-sm font-medium text-gray-700">Trend (EMA 50/200)</label>
+                        <select name="emaTrend" value={filters.emaTrend} onChange={handleFilterChange} className="w-full mt-1 p-2 border rounded-md bg-white">
+                            <option value="">Any Trend</option>
+                            <option value="bullish">Bullish</option>
+                            <option value="bearish">Bearish</option>
+                        </select>
+                    </div>
+                    <div>
+                        <label className="text-sm font-medium text-gray-700">Recent Crossover</label>
+                        <select name="crossover" value={filters.crossover} onChange={handleFilterChange} className="w-full mt-1 p-2 border rounded-md bg-white">
+                            <option value="">Any</option>
+                            <option value="golden">Golden Cross</option>
+                            <option value="death">Death Cross</option>
+                        </select>
+                    </div>
                     <button onClick={runScreen} disabled={loading} className="w-full flex items-center justify-center gap-2 p-2 bg-blue-600 text-white font-bold rounded-lg hover:bg-blue-700 disabled:bg-gray-400">
                         <FiFilter /> {loading ? 'Screening...' : 'Run Screen'}
                     </button>
@@ -89,6 +112,8 @@ const ScreenerPage = () => {
                             <th className="px-6 py-3 text-right text-xs font-medium text-gray-500 uppercase">Price (₹)</th>
                             <th className="px-6 py-3 text-right text-xs font-medium text-gray-500 uppercase">Market Cap</th>
                             <th className="px-6 py-3 text-right text-xs font-medium text-gray-500 uppercase">P/E Ratio</th>
+                            <th className="px-6 py-3 text-right text-xs font-medium text-gray-500 uppercase">RSI</th>
+                            <th className="px-6 py-3 text-right text-xs font-medium text-gray-500 uppercase">Trend</th>
                         </tr>
                     </thead>
                     <tbody className="bg-white divide-y divide-gray-200">
@@ -102,6 +127,8 @@ const ScreenerPage = () => {
                                 <td className="px-6 py-4 text-right font-mono text-gray-700">{stock.price.toFixed(2)}</td>
                                 <td className="px-6 py-4 text-right font-mono text-gray-700">{formatMarketCap(stock.marketCap)}</td>
                                 <td className="px-6 py-4 text-right font-mono text-gray-700">{stock.peRatio ? stock.peRatio.toFixed(2) : 'N/A'}</td>
+                                <td className="px-6 py-4 text-right font-mono text-gray-700">{stock.rsi != null ? stock.rsi.toFixed(1) : 'N/A'}</td>
+                                <td className={`px-6 py-4 text-right capitalize ${stock.emaTrend === 'bullish' ? 'text-green-600' : stock.emaTrend === 'bearish' ? 'text-red-600' : 'text-gray-500'}`}>{stock.emaTrend || 'N/A'}</td>
                             </tr>
                         ))}
                     </tbody>